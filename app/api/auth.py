@@ -1,46 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Annotated
-
-from app.database import get_db
-from app.schemas.auth import Token, UserCreate, UserOut
-from app.services.auth import (
-    authenticate_user,
-    create_access_token,
-    create_user,
-)
-from app.utils.exceptions import UnauthorizedException
-from app.dependencies.auth import get_current_active_user
-
-
-router = APIRouter(
-    prefix="/auth",
-    tags=["auth"],
-)
-
-@router.post("/token", response_model=Token)
-async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Annotated[AsyncSession, Depends(get_db)],
-):
-    user = await authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise UnauthorizedException("Incorrect email or password")
-    
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
-
-@router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-async def register_user(
-    user_data: UserCreate,
-    db: Annotated[AsyncSession, Depends(get_db)],
-):
-    user = await create_user(db, user_data)
-    return user
-
-@router.get("/me", response_model=UserOut)
-async def read_users_me(
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-):
-    return current_user
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+import math
+
+from app.config import settings
+from app.database import get_db
+from app.schemas.auth import Token, UserCreate, UserOut
+from app.services.auth import (
+    authenticate_user,
+    create_access_token,
+    create_user,
+)
+from app.utils.exceptions import UnauthorizedException
+from app.utils.ratelimit import rate_limiter
+from app.dependencies.auth import get_current_active_user
+
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["auth"],
+)
+
+login_limiter = rate_limiter(
+    settings.RATE_LIMIT_LOGIN_PER_SECOND, settings.RATE_LIMIT_LOGIN_BURST, "ratelimit:login"
+)
+
+@router.post("/token", response_model=Token)
+async def login_for_access_token(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    # Counted before the password is checked, so a storm never reaches bcrypt
+    if login_limiter is not None:
+        wait = await login_limiter.acquire(form_data.username.strip().lower())
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise UnauthorizedException("Incorrect email or password")
+    
+    access_token = create_access_token(data={"sub": user.email})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
+async def register_user(
+    user_data: UserCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    user = await create_user(db, user_data)
+    return user
+
+@router.get("/me", response_model=UserOut)
+async def read_users_me(
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    return current_user
@@ -1,109 +1,316 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Annotated, List, Optional
-
-from app.database import get_db
-from app.schemas.event import EventCreate, EventUpdate, EventOut
-from app.services.event import (
-    create_event,
-    get_event,
-    get_events,
-    update_event,
-    delete_event,
-    check_event_conflict,
-)
-from app.dependencies.auth import get_current_active_user
-from app.schemas.auth import UserOut
-
-router = APIRouter()
-
-@router.post("/", response_model=EventOut, status_code=status.HTTP_201_CREATED)
-async def create_new_event(
-    event_data: EventCreate,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-):
-    conflict = await check_event_conflict(
-        db, 
-        current_user.id, 
-        event_data.start_time, 
-        event_data.end_time
-    )
-    if conflict:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Event time conflicts with existing event",
-        )
-    return await create_event(db, event_data, current_user.id)
-
-@router.get("/", response_model=List[EventOut])
-async def read_events(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-    skip: int = 0,
-    limit: int = 100,
-):
-    return await get_events(db, current_user.id, skip, limit)
-
-@router.get("/{event_id}", response_model=EventOut)
-async def read_event(
-    event_id: Annotated[int, Path(title="The ID of the event to retrieve")],
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-):
-    event = await get_event(db, event_id, current_user.id)
-    if event is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Event not found",
-        )
-    return event
-
-@router.put("/{event_id}", response_model=EventOut)
-async def update_existing_event(
-    event_id: int,
-    event_data: EventUpdate,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-):
-    event = await get_event(db, event_id, current_user.id)
-    if event is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Event not found",
-        )
-    
-    # Use existing times if not updated
-    start_time = event_data.start_time or event.start_time
-    end_time = event_data.end_time or event.end_time
-
-    conflict = await check_event_conflict(
-        db,
-        current_user.id,
-        start_time,
-        end_time,
-        exclude_event_id=event_id
-    )
-    if conflict:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Event time conflicts with existing event",
-        )
-
-    return await update_event(db, event_id, event_data)
-
-@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_existing_event(
-    event_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[UserOut, Depends(get_current_active_user)],
-):
-    event = await get_event(db, event_id, current_user.id)
-    if event is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Event not found",
-        )
-    
-    await delete_event(db, event_id)
-    return None
+from datetime import datetime
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    status,
+    Path,
+    Query,
+    Response,
+    UploadFile,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Annotated, List, Literal, Optional
+
+from app.config import settings
+from app.database import get_db
+from app.schemas.event import (
+    EventCreate,
+    EventUpdate,
+    EventOut,
+    EventBatchResult,
+    EventChanges,
+    EventImportStatus,
+    EventExceptionCreate,
+    EventExceptionOut,
+)
+from app.services.event import (
+    create_event,
+    create_events_batch,
+    get_event_changes,
+    get_event_response,
+    get_events_page_response,
+    get_accessible_events_page,
+    get_events_in_range,
+    search_events,
+    update_event,
+    delete_event,
+    set_event_exception,
+    delete_event_exception,
+)
+from app.services.auth import issue_feed_token, revoke_feed_token
+from app.services.export import EXPORTERS, EXPORT_MEDIA_TYPES
+from app.services.feed import get_feed
+from app.services.stream import open_event_stream
+from app.services.importer import (
+    cancel_import,
+    detect_import_format,
+    get_import_job,
+    spool_upload,
+    start_import,
+)
+from app.dependencies.auth import get_current_active_user, get_feed_user
+from app.schemas.auth import FeedTokenOut, UserOut
+from app.utils.cache import CachedResponse
+from app.utils.http import etag_matches
+
+router = APIRouter()
+
+def _cached_json(cached: CachedResponse, if_none_match: Optional[str]) -> Response:
+    headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+@router.post("/", response_model=EventOut, status_code=status.HTTP_201_CREATED)
+async def create_new_event(
+    event_data: EventCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Conflicts are rejected atomically by the insert itself
+    return await create_event(db, event_data, current_user.id)
+
+@router.post("/batch", response_model=EventBatchResult)
+async def create_new_events_batch(
+    events_data: List[EventCreate],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Each item is reported as created, conflict or invalid
+    return await create_events_batch(db, events_data, current_user.id)
+
+@router.get("/", response_model=List[EventOut])
+async def read_events(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=settings.EVENT_PAGE_MAX_LIMIT)] = 100,
+    cursor: Optional[str] = None,
+    include_shared: bool = False,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    # Pass the returned X-Next-Cursor back as ?cursor= for stable, constant-cost
+    # paging; skip/limit offset paging is kept for older clients
+    if include_shared:
+        # Also events shared with the caller, each tagged with its permissions.
+        # Other owners' writes don't reach this caller's cache version, so
+        # these pages aren't cached.
+        events, next_cursor = await get_accessible_events_page(
+            db, current_user.id, skip, limit, cursor
+        )
+        # Rows are already EventOut-shaped, so skip response_model validation
+        # and hand them straight to orjson
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return ORJSONResponse(events, headers=headers)
+    # Serialized once, then served from the response cache until the owner writes
+    cached = await get_events_page_response(db, current_user.id, skip, limit, cursor)
+    return _cached_json(cached, if_none_match)
+
+@router.get("/range", response_model=List[EventOut])
+async def read_events_in_range(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    range_start: Annotated[datetime, Query(alias="from")],
+    range_end: Annotated[datetime, Query(alias="to")],
+):
+    # Events overlapping [from, to), e.g. a day, week or month view
+    return await get_events_in_range(db, current_user.id, range_start, range_end)
+
+@router.get("/search", response_model=List[EventOut])
+async def search_accessible_events(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=settings.EVENT_PAGE_MAX_LIMIT)] = 20,
+    cursor: Optional[str] = None,
+):
+    # Ranked matches on title, location and description across owned and
+    # shared events; page with X-Next-Cursor like GET /
+    events, next_cursor = await search_events(db, current_user.id, q, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(events, headers=headers)
+
+@router.get("/changes", response_model=EventChanges)
+async def read_event_changes(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    since: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=settings.EVENT_PAGE_MAX_LIMIT)] = 1000,
+):
+    # Delta sync: start without ?since= for a full snapshot, then pass each
+    # next_token back; keep going while has_more is set
+    return ORJSONResponse(
+        await get_event_changes(db, current_user.id, since, limit)
+    )
+
+@router.get("/stream")
+async def stream_event_changes(
+    current_user: Annotated[UserOut, Depends(get_feed_user)],
+):
+    # Server-Sent Events; EventSource can't send headers, so this takes the
+    # feed token, in ?token= or the Authorization header.
+    # Notices only name the event and what happened to it, and any missed
+    # while disconnected are gone: catch up through /changes on connect.
+    return StreamingResponse(
+        open_event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/export")
+async def export_events(
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    export_format: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+):
+    return StreamingResponse(
+        EXPORTERS[export_format](current_user.id),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="events.{export_format}"'
+        },
+    )
+
+@router.post("/feed/token", response_model=FeedTokenOut, status_code=status.HTTP_201_CREATED)
+async def issue_events_feed_token(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Long-lived and good only for the feed and the stream; issuing another
+    # replaces it
+    return FeedTokenOut(token=await issue_feed_token(db, current_user.id))
+
+@router.delete("/feed/token", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_events_feed_token(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    if not await revoke_feed_token(db, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No feed token issued",
+        )
+    return None
+
+@router.get("/feed.ics")
+async def read_events_feed(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_feed_user)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    # Served from the rendered-feed cache until the owner writes again
+    etag, body = await get_feed(db, current_user.id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=body,
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
+@router.post(
+    "/import",
+    response_model=EventImportStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def import_events(
+    file: UploadFile,
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    import_format: Annotated[Optional[Literal["ics", "csv"]], Query(alias="format")] = None,
+):
+    import_format = import_format or detect_import_format(file.filename)
+    path = await spool_upload(file)
+    return start_import(current_user.id, import_format, path).to_status()
+
+@router.get("/import/{job_id}", response_model=EventImportStatus)
+async def read_import_status(
+    job_id: str,
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    return get_import_job(job_id, current_user.id).to_status()
+
+@router.delete("/import/{job_id}", response_model=EventImportStatus)
+async def cancel_import_job(
+    job_id: str,
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    return cancel_import(job_id, current_user.id).to_status()
+
+@router.get("/{event_id}", response_model=EventOut)
+async def read_event(
+    event_id: Annotated[int, Path(title="The ID of the event to retrieve")],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    cached = await get_event_response(db, event_id, current_user.id)
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return _cached_json(cached, if_none_match)
+
+@router.put("/{event_id}", response_model=EventOut)
+async def update_existing_event(
+    event_id: int,
+    event_data: EventUpdate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    event = await update_event(db, event_id, current_user.id, event_data)
+    if event is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return event
+
+@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_existing_event(
+    event_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+    version: Optional[int] = None,
+):
+    # A single DELETE ... RETURNING; pass ?version= to refuse stale deletes
+    if not await delete_event(db, event_id, current_user.id, version):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return None
+
+@router.post("/{event_id}/exceptions", response_model=EventExceptionOut)
+async def set_occurrence_exception(
+    event_id: int,
+    exception_data: EventExceptionCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Cancels or moves/edits a single occurrence of a recurring event
+    exception = await set_event_exception(db, event_id, current_user.id, exception_data)
+    if exception is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return exception
+
+@router.delete("/{event_id}/exceptions", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_occurrence_exception(
+    event_id: int,
+    original_start: datetime,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Restores the occurrence as the rule generates it
+    if not await delete_event_exception(db, event_id, current_user.id, original_start):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exception not found",
+        )
+    return None
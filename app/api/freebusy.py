@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+
+from app.database import get_db
+from app.schemas.auth import UserOut
+from app.schemas.freebusy import FreeBusyOut, FreeBusyRequest
+from app.services.freebusy import get_free_busy
+from app.dependencies.auth import get_current_active_user
+
+router = APIRouter()
+
+@router.post("/", response_model=FreeBusyOut)
+async def read_free_busy(
+    request: FreeBusyRequest,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[UserOut, Depends(get_current_active_user)],
+):
+    # Busy blocks reveal only times, never titles or other event details, and
+    # only for users the caller shares events with
+    return await get_free_busy(db, request, current_user.id)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from app.database import pool_status
+from app.dependencies.roles import require_operator
+from app.schemas.internal import PoolStatus
+
+router = APIRouter(dependencies=[Depends(require_operator)])
+
+@router.get("/pool", response_model=PoolStatus)
+async def read_pool_status():
+    # Live connection counts plus how long checkouts have waited
+    return pool_status()
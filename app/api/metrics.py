@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.dependencies.roles import require_operator
+from app.services.auth import principal_cache
+from app.services.event import range_cache
+from app.services.feed import feed_cache
+from app.services.permission import acl_cache
+from app.utils.metrics import render_metrics
+
+router = APIRouter(dependencies=[Depends(require_operator)])
+
+# Per-worker caches whose hit rates are worth watching
+CACHES = {
+    "principal": principal_cache,
+    "acl": acl_cache,
+    "range": range_cache,
+    "feed": feed_cache,
+}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(
+        render_metrics({name: cache.stats() for name, cache in CACHES.items()}),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,20 +1,131 @@
-from pydantic_settings import BaseSettings
-from pydantic import PostgresDsn
-from typing import List, Optional
-
-class Settings(BaseSettings):
-    DATABASE_URL: str
-    SECRET_KEY: str
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    ALLOWED_ORIGINS: List[str] = ["*"]
-
-    ADMIN_EMAIL: Optional[str] = None
-    ADMIN_PASSWORD: Optional[str] = None
-
-    model_config = {
-        "env_file": ".env",
-        "case_sensitive": True,
-    }
-
-settings = Settings()
+from pydantic_settings import BaseSettings
+from pydantic import PostgresDsn
+from typing import Dict, List, Optional
+
+class Settings(BaseSettings):
+    DATABASE_URL: str
+    # Optional read replica; GET requests use it outside the read-your-writes window
+    READ_DATABASE_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    SECRET_KEY: str
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ALLOWED_ORIGINS: List[str] = ["*"]
+
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg prepared-statement cache; set 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_POOL_PREWARM: int = 10
+
+    # Bearer secret for the operator endpoints, /metrics and /internal; they
+    # answer 404 while it is unset
+    OPERATOR_TOKEN: Optional[str] = None
+
+    ADMIN_EMAIL: Optional[str] = None
+    ADMIN_PASSWORD: Optional[str] = None
+
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 5.0
+
+    # Per worker; writes made by other workers show once entries expire
+    RANGE_CACHE_SIZE: int = 50000
+    RANGE_CACHE_TTL_SECONDS: int = 300
+    RANGE_QUERY_MAX_DAYS: int = 366
+    SEARCH_MAX_TERMS: int = 8
+
+    EVENT_BATCH_MAX_ITEMS: int = 10000
+    IMPORT_CHUNK_SIZE: int = 5000
+    # Import jobs running at once per worker; later ones wait as pending
+    IMPORT_MAX_RUNNING_JOBS: int = 4
+    # Longest span two series are expanded over to check them for conflicts
+    RECURRENCE_CONFLICT_HORIZON_DAYS: int = 3660
+
+    # Serialized GET /events and /events/{id} bodies, plus the owner versions
+    # that also validate cached feeds. Per worker unless RESPONSE_CACHE_URL
+    # names a Redis server (needs the redis package); set it whenever more
+    # than one worker runs, or workers serve bodies older than other workers'
+    # writes.
+    RESPONSE_CACHE_SIZE: int = 10000
+    RESPONSE_CACHE_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_URL: Optional[str] = None
+
+    FEED_CACHE_SIZE: int = 1000
+    FEED_CACHE_TTL_SECONDS: int = 300
+
+    FREEBUSY_MAX_USERS: int = 1000
+
+    ACL_CACHE_SIZE: int = 100000
+    ACL_CACHE_TTL_SECONDS: int = 300
+    SHARE_BULK_MAX_ITEMS: int = 5000
+
+    # "local" pushes changes to streams in this process only; "postgres"
+    # shares them between workers through LISTEN/NOTIFY
+    EVENT_STREAM_BACKEND: str = "local"
+    EVENT_STREAM_QUEUE_SIZE: int = 100
+    EVENT_STREAM_MAX_PER_USER: int = 5
+    EVENT_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    # Streams end after this long and clients reconnect, so a worker that is
+    # shutting down isn't held open by them
+    EVENT_STREAM_MAX_SECONDS: float = 300.0
+
+    # Token buckets per authenticated user and per client IP; 0 turns one off.
+    # Costs weigh expensive routes, keyed like SQL_QUERY_BUDGETS below. The IP
+    # buckets key on the connecting peer, so they are off by default: behind a
+    # proxy every client would share one. Run uvicorn with --proxy-headers and
+    # --forwarded-allow-ips set to the proxies before turning them on.
+    RATE_LIMIT_USER_PER_SECOND: float = 20.0
+    RATE_LIMIT_USER_BURST: float = 100.0
+    RATE_LIMIT_IP_PER_SECOND: float = 0.0
+    RATE_LIMIT_IP_BURST: float = 200.0
+    # Login attempts per submitted email. A login has no token for the user
+    # buckets and the IP buckets are usually off, so this is what slows
+    # password guessing.
+    RATE_LIMIT_LOGIN_PER_SECOND: float = 0.2
+    RATE_LIMIT_LOGIN_BURST: float = 10.0
+    RATE_LIMIT_COSTS: Dict[str, float] = {
+        "POST /auth/auth/token": 10.0,
+        "POST /auth/auth/register": 10.0,
+        "POST /events/import": 20.0,
+    }
+    RATE_LIMIT_MAX_CLIENTS: int = 100000
+    # Shares the buckets between workers through Redis (needs the redis package)
+    RATE_LIMIT_URL: Optional[str] = None
+
+    # Requests handled at once, overall (0 for no cap) and per expensive route.
+    # Past that they queue, and are shed with a 503 once the queue is full or
+    # the wait passes the timeout; a route queues as many as it runs. A slot
+    # is held until the response body has been sent.
+    ADMISSION_MAX_CONCURRENCY: int = 200
+    ADMISSION_MAX_WAITING: int = 200
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 1.0
+    ROUTE_CONCURRENCY_LIMITS: Dict[str, int] = {
+        "POST /auth/auth/token": 16,
+        "POST /auth/auth/register": 16,
+        "POST /events/batch": 4,
+        "POST /events/import": 4,
+        "GET /events/export": 4,
+        "GET /events/feed.ics": 8,
+        "POST /freebusy/": 8,
+    }
+
+    # Largest page GET /events, /events/search and /events/changes serve
+    EVENT_PAGE_MAX_LIMIT: int = 1000
+
+    # SQL statements a request may run before it is logged as a likely N+1;
+    # per-route overrides are keyed like "GET /events/{event_id}"
+    SQL_QUERY_BUDGET: int = 10
+    SQL_QUERY_BUDGETS: Dict[str, int] = {}
+
+    model_config = {
+        "env_file": ".env",
+        "case_sensitive": True,
+    }
+
+settings = Settings()
@@ -1,22 +1,159 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import settings
-
-# Use the URL directly from settings
-DATABASE_URL = settings.DATABASE_URL
-
-# Create async engine
-engine = create_async_engine(DATABASE_URL, echo=False)
-
-# Create session factory
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
-
-# Declare the Base
-Base = declarative_base()
-
-# Dependency for DB session
-async def get_db():
-    async with async_session() as session:
-        yield session
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.metrics import POOL_WAIT, instrument_engine
+
+# Use the URL directly from settings
+DATABASE_URL = settings.DATABASE_URL
+
+# Time requests spend waiting for a pooled connection
+pool_wait_histogram = POOL_WAIT.labels()
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_histogram.observe(time.perf_counter() - started)
+
+def _engine_options(database_url: str) -> dict:
+    url = make_url(database_url)
+    options = {
+        "echo": False,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    # SQLite keeps SQLAlchemy's default pool; the sizing knobs are for servers
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+    # SQLite ignores foreign keys, ON DELETE CASCADE included, unless each
+    # connection asks for them
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def _configure_engine(target) -> None:
+    if target.dialect.name == "sqlite":
+        event.listen(target.sync_engine, "connect", _enable_foreign_keys)
+    instrument_engine(target)
+
+# Create async engine
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+_configure_engine(engine)
+
+# Create session factory
+async_session = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False
+)
+
+# Optional replica for GET traffic
+read_engine = (
+    create_async_engine(
+        settings.READ_DATABASE_URL, **_engine_options(settings.READ_DATABASE_URL)
+    )
+    if settings.READ_DATABASE_URL
+    else None
+)
+if read_engine is not None:
+    _configure_engine(read_engine)
+read_session = (
+    sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    if read_engine is not None
+    else None
+)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Principals that wrote within the read-your-writes window; the entry's
+# expiry is the window itself. Per process, like the other caches.
+_recent_writers = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+def record_write(principal: Optional[str]) -> None:
+    if principal is not None and read_engine is not None:
+        _recent_writers.set(principal, True)
+
+def wrote_recently(principal: Optional[str]) -> bool:
+    return principal is not None and _recent_writers.get(principal) is not None
+
+# Declare the Base
+Base = declarative_base()
+
+# Dependency for DB session
+async def get_db(request: Request):
+    factory = async_session
+    # Reads go to the replica unless this principal just wrote something it
+    # may be about to read back
+    if (
+        read_session is not None
+        and request.method in SAFE_METHODS
+        and not wrote_recently(getattr(request.state, "principal", None))
+    ):
+        factory = read_session
+    async with factory() as session:
+        yield session
+
+async def prewarm_pool(count: int) -> int:
+    """Open up to `count` connections per engine up front so the first
+    requests don't pay for connection setup. Returns how many were opened."""
+    opened = 0
+    for target in (engine, read_engine):
+        pool = target.sync_engine.pool if target is not None else None
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            continue
+        connections = [target.connect() for _ in range(min(count, pool.size()))]
+        try:
+            await asyncio.gather(*(connection.start() for connection in connections))
+        finally:
+            # Back to the pool, where they stay open and idle
+            for connection in connections:
+                await connection.close()
+        opened += len(connections)
+    return opened
+
+def pool_status() -> dict:
+    pool = engine.sync_engine.pool
+    status = {
+        "pool": type(pool).__name__,
+        "size": None,
+        "checked_out": None,
+        "idle": None,
+        "overflow": None,
+        "max_overflow": None,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # Negative while the pool hasn't opened all of pool_size yet
+            overflow=max(0, pool.overflow()),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    status["wait_seconds"] = pool_wait_histogram.snapshot()
+    return status
@@ -1,23 +1,40 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Annotated
-
-from app.database import get_db
-from app.schemas.auth import UserOut
-from app.services.auth import get_current_user
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
-
-async def get_current_active_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)],
-) -> UserOut:
-    current_user = await get_current_user(db, token)
-    if not current_user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Inactive user",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return current_user
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, Optional
+
+from app.database import get_db
+from app.schemas.auth import UserOut
+from app.services.auth import get_current_user, get_feed_token_user
+from app.utils.exceptions import UnauthorizedException
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
+
+def _require_active(user: UserOut) -> UserOut:
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_current_active_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> UserOut:
+    return _require_active(await get_current_user(db, token))
+
+async def get_feed_user(
+    header_token: Annotated[Optional[str], Depends(optional_oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    token: Annotated[Optional[str], Query()] = None,
+) -> UserOut:
+    # Calendar clients subscribe by URL and often can't send headers. Only
+    # the feed token from POST /events/feed/token is accepted; an access
+    # token in a URL would hand out everything the account can do.
+    token = header_token or token
+    if not token:
+        raise UnauthorizedException("Not authenticated")
+    return _require_active(await get_feed_token_user(db, token))
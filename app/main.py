@@ -1,60 +1,281 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer
-from dotenv import load_dotenv
-import os
-
-from .database import engine, Base
-from .config import Settings
-from .utils.exceptions import (
-    http_exception_handler,
-    validation_exception_handler,
-)
-from fastapi.exceptions import RequestValidationError
-from starlette.exceptions import HTTPException as StarletteHTTPException
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi import Depends, HTTPException, status
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
-# Load environment variables
-load_dotenv()
-
-# Initialize settings
-settings = Settings()
-
-# Create FastAPI app
-app = FastAPI(
-    title="Event Manager API",
-    description="API for managing events with user authentication",
-    version="1.0.0",
-)
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Exception handlers
-app.add_exception_handler(StarletteHTTPException, http_exception_handler)
-app.add_exception_handler(RequestValidationError, validation_exception_handler)
-
-# Database initialization
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-@app.on_event("startup")
-async def on_startup():
-    await init_db()
-
-# Import routers after app creation to avoid circular imports
-from app.api import auth, events, shares
-
-app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(events.router, prefix="/events", tags=["events"])
-app.include_router(shares.router, prefix="/events/{event_id}/share", tags=["sharing"])
\ No newline at end of file
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.routing import Match
+from dotenv import load_dotenv
+import math
+import os
+import time
+import weakref
+from typing import Optional
+
+from .database import (
+    engine,
+    Base,
+    async_session,
+    prewarm_pool,
+    read_engine,
+    record_write,
+    SAFE_METHODS,
+)
+from .config import Settings
+from .services.auth import shutdown_password_hashing, token_subject
+from .services.event import build_search_index, delete_orphaned_event_rows
+from .services.permission import intern_permissions
+from .services.stream import event_hub
+from .utils.metrics import (
+    RequestStats,
+    current_request_stats,
+    observe_request,
+    server_timing,
+)
+from .utils.ratelimit import ConcurrencyGate, rate_limiter
+from .utils.exceptions import (
+    http_exception_handler,
+    validation_exception_handler,
+)
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import Depends, HTTPException, status
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Load environment variables
+load_dotenv()
+
+# Initialize settings
+settings = Settings()
+
+# Create FastAPI app
+app = FastAPI(
+    title="Event Manager API",
+    description="API for managing events with user authentication",
+    version="1.0.0",
+)
+
+def request_principal(request: Request) -> Optional[str]:
+    # Who the token names, decoded once per request and without the database
+    if not hasattr(request.state, "principal"):
+        scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+        if scheme.lower() != "bearer":
+            token = None
+        request.state.principal = token_subject(token or request.query_params.get("token"))
+    return request.state.principal
+
+# Replica routing: remember who wrote, so their next reads use the primary
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    if read_engine is None:
+        return await call_next(request)
+    principal = request_principal(request)
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS:
+        record_write(principal)
+    return response
+
+user_limiter = rate_limiter(
+    settings.RATE_LIMIT_USER_PER_SECOND, settings.RATE_LIMIT_USER_BURST, "ratelimit:user"
+)
+ip_limiter = rate_limiter(
+    settings.RATE_LIMIT_IP_PER_SECOND, settings.RATE_LIMIT_IP_BURST, "ratelimit:ip"
+)
+admission_gate = (
+    ConcurrencyGate(settings.ADMISSION_MAX_CONCURRENCY, settings.ADMISSION_MAX_WAITING)
+    if settings.ADMISSION_MAX_CONCURRENCY > 0
+    else None
+)
+route_gates = {
+    endpoint: ConcurrencyGate(limit, limit)
+    for endpoint, limit in settings.ROUTE_CONCURRENCY_LIMITS.items()
+}
+# Scrapes and operator endpoints are never limited
+ADMISSION_EXEMPT_PREFIXES = ("/metrics", "/internal/")
+# Open for minutes and capped per user already, so these give their slots
+# back once the response starts instead of when the body ends
+ADMISSION_RELEASE_AT_START = {"GET /events/stream"}
+_limited_routes = None
+
+def _limited_route_index():
+    # Only routes with a cost or a cap need identifying, and most of them have
+    # no path parameters, so an exact-path lookup finds them without walking
+    # the route table; the few templated ones are matched in turn
+    keys = set(settings.RATE_LIMIT_COSTS) | set(route_gates) | ADMISSION_RELEASE_AT_START
+    static, templated = {}, []
+    for route in app.router.routes:
+        for method in getattr(route, "methods", None) or ():
+            endpoint = f"{method} {route.path}"
+            if endpoint not in keys:
+                continue
+            if "{" in route.path:
+                templated.append((route, endpoint))
+            else:
+                static[(method, route.path)] = endpoint
+    return static, templated
+
+def _limited_endpoint(request: Request) -> Optional[str]:
+    global _limited_routes
+    if _limited_routes is None:
+        _limited_routes = _limited_route_index()
+    static, templated = _limited_routes
+    endpoint = static.get((request.method, request.url.path))
+    if endpoint is None:
+        for route, key in templated:
+            if route.matches(request.scope)[0] == Match.FULL:
+                return key
+    return endpoint
+
+def _release_with_body(response, gates) -> None:
+    # A streamed body keeps its slots until the last chunk is sent. One the
+    # server never starts sending, e.g. because the client left first, gives
+    # them back when it is collected instead.
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            for gate in gates:
+                gate.release()
+
+    body = response.body_iterator
+
+    async def body_iterator():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            release()
+
+    response.body_iterator = body_iterator()
+    weakref.finalize(response.body_iterator, release)
+
+def _shed(
+    request: Request, status_code: int, detail: str, retry_after: float
+) -> JSONResponse:
+    # Lets the metrics label shed requests with their route
+    for route in app.router.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            request.scope["route"] = route
+            break
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+# Rate limits and concurrency caps, checked before any work is done
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    if request.url.path.startswith(ADMISSION_EXEMPT_PREFIXES):
+        return await call_next(request)
+    endpoint = _limited_endpoint(request)
+    cost = settings.RATE_LIMIT_COSTS.get(endpoint, 1.0)
+
+    client = request.client.host if request.client else None
+    if ip_limiter is not None and client is not None:
+        wait = await ip_limiter.acquire(client, cost)
+        if wait:
+            return _shed(request, status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+    principal = request_principal(request) if user_limiter is not None else None
+    if principal is not None:
+        wait = await user_limiter.acquire(principal, cost)
+        if wait:
+            return _shed(request, status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+
+    # The route's own cap first, so a request queued on it isn't also
+    # holding one of the server-wide slots
+    gates = [gate for gate in (route_gates.get(endpoint), admission_gate) if gate is not None]
+    held = []
+    try:
+        for gate in gates:
+            if not await gate.acquire(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS):
+                return _shed(
+                    request,
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Server busy, try again later",
+                    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                )
+            held.append(gate)
+        response = await call_next(request)
+    except BaseException:
+        for gate in held:
+            gate.release()
+        raise
+    if endpoint in ADMISSION_RELEASE_AT_START:
+        for gate in held:
+            gate.release()
+    elif held:
+        _release_with_body(response, held)
+    return response
+
+# Per-route latency and SQL accounting; registered after the middleware above
+# so it wraps them
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_request_stats.reset(token)
+    elapsed = time.perf_counter() - started
+    # The route template keeps label cardinality bounded
+    route = request.scope.get("route")
+    observe_request(
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code,
+        elapsed,
+        stats,
+    )
+    response.headers["Server-Timing"] = server_timing(elapsed, stats)
+    return response
+
+# CORS middleware, registered last so it is outermost and shed responses
+# carry CORS headers too
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.ALLOWED_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
+)
+
+# Exception handlers
+app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+app.add_exception_handler(RequestValidationError, validation_exception_handler)
+
+# Database initialization
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("startup")
+async def on_startup():
+    await init_db()
+    async with async_session() as db:
+        await intern_permissions(db)
+        await delete_orphaned_event_rows(db)
+        await build_search_index(db)
+    await prewarm_pool(settings.DB_POOL_PREWARM)
+    await event_hub.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_password_hashing()
+    await event_hub.stop()
+
+# Import routers after app creation to avoid circular imports
+from app.api import auth, events, shares, freebusy, internal, metrics
+
+app.include_router(auth.router, prefix="/auth", tags=["auth"])
+app.include_router(events.router, prefix="/events", tags=["events"])
+app.include_router(shares.router, prefix="/events/{event_id}/share", tags=["sharing"])
+app.include_router(freebusy.router, prefix="/freebusy", tags=["freebusy"])
+app.include_router(internal.router, prefix="/internal", tags=["internal"], include_in_schema=False)
+app.include_router(metrics.router, tags=["internal"], include_in_schema=False)
\ No newline at end of file
@@ -1,6 +1,7 @@
-from .user import User
-from .event import Event
-from .permission import Permission, UserPermission
-from ..database import Base
-
-__all__ = ["User", "Event", "Permission", "UserPermission", "Base"]
+from .user import FeedToken, User
+from .event import Event, EventException
+from .permission import Permission, UserPermission
+from .sync import SyncTombstone
+from ..database import Base
+
+__all__ = ["User", "FeedToken", "Event", "EventException", "Permission", "UserPermission", "SyncTombstone", "Base"]
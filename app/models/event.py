@@ -1,20 +1,136 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from app.database import Base
-
-class Event(Base):
-    __tablename__ = "events"
-
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True, nullable=False)
-    description = Column(String, nullable=True)
-    start_time = Column(DateTime, nullable=False)
-    end_time = Column(DateTime, nullable=False)
-    location = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-
-    owner = relationship("User", back_populates="events")
-
-    def __repr__(self):
-        return f"<Event {self.title}>"
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    DDL,
+    event,
+    literal_column,
+)
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.database import Base
+from app.models.sync import next_change_version
+
+# Full-text document for Postgres: title, location and description weighted
+# A, B and C for ts_rank. Literals rather than bound parameters, so queries
+# render the exact expression the GIN index on events was built on.
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+def search_document(title, location, description):
+    parts = [
+        func.setweight(
+            func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, literal_column("''"))),
+            literal_column(f"'{weight}'"),
+        )
+        for column, weight in ((title, "A"), (location, "B"), (description, "C"))
+    ]
+    return parts[0].op("||")(parts[1]).op("||")(parts[2])
+
+class Event(Base):
+    __tablename__ = "events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, index=True, nullable=False)
+    description = Column(String, nullable=True)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    location = Column(String, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # RRULE for a series; start_time/end_time hold the first occurrence
+    recurrence_rule = Column(String, nullable=True)
+    # End of the last occurrence, NULL while the series is unbounded
+    recurrence_end = Column(DateTime, nullable=True)
+    # Bumped by every write; clients echo it back for optimistic concurrency
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Orders this row among all event, grant and tombstone writes for delta sync
+    change_version = Column(
+        BigInteger,
+        nullable=False,
+        default=next_change_version(),
+        onupdate=next_change_version(),
+    )
+
+    owner = relationship("User", back_populates="events")
+    exceptions = relationship(
+        "EventException", back_populates="event", cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # Serves keyset pagination and the sorted-interval conflict seek
+        Index("ix_events_owner_start_id", "owner_id", "start_time", "id"),
+        # Window queries across owners bound end_time from below, so they only
+        # walk events that haven't finished yet rather than the whole history
+        Index("ix_events_owner_end", "owner_id", "end_time"),
+        # Delta sync: an owner's changes, and changes to events shared with them
+        Index("ix_events_owner_change", "owner_id", "change_version"),
+        Index("ix_events_change_version", "change_version"),
+        # Series are few per owner; keep their lookup off the single-event rows
+        Index(
+            "ix_events_owner_series",
+            "owner_id",
+            "start_time",
+            postgresql_where=recurrence_rule.isnot(None),
+            sqlite_where=recurrence_rule.isnot(None),
+        ),
+        # Inverted index behind /events/search; other backends use the
+        # in-process index in app.services.event
+        Index(
+            "ix_events_search",
+            search_document(title, location, description),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        # On Postgres the database itself rejects overlapping single events per
+        # owner; a series row only holds its first occurrence, which may have
+        # been cancelled or moved, so series are checked by the application
+        ExcludeConstraint(
+            (owner_id, "="),
+            (func.tsrange(start_time, end_time, literal_column("'[)'")), "&&"),
+            name="ex_events_owner_timespan",
+            using="gist",
+            where=literal_column("recurrence_rule IS NULL"),
+        ).ddl_if(dialect="postgresql"),
+    )
+    # ORM flushes check and bump it too; the Core write paths do so by hand
+    __mapper_args__ = {"version_id_col": version}
+
+    def __repr__(self):
+        return f"<Event {self.title}>"
+
+class EventException(Base):
+    __tablename__ = "event_exceptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(
+        Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False
+    )
+    # Start of the occurrence as generated by the rule
+    original_start = Column(DateTime, nullable=False)
+    is_cancelled = Column(Boolean, default=False, nullable=False)
+    # Overrides; NULL keeps the series value
+    start_time = Column(DateTime, nullable=True)
+    end_time = Column(DateTime, nullable=True)
+    title = Column(String, nullable=True)
+    description = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+
+    event = relationship("Event", back_populates="exceptions")
+
+    __table_args__ = (
+        UniqueConstraint("event_id", "original_start", name="uq_event_exceptions_occurrence"),
+    )
+
+# btree_gist lets the exclusion constraint combine owner equality with range overlap
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
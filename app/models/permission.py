@@ -1,22 +1,44 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
-from app.database import Base
-
-class Permission(Base):
-    __tablename__ = "permissions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False)
-    description = Column(String, nullable=True)
-
-    users = relationship("UserPermission", back_populates="permission")
-
-class UserPermission(Base):
-    __tablename__ = "user_permissions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    permission_id = Column(Integer, ForeignKey("permissions.id"), nullable=False)
-
-    user = relationship("User", back_populates="permissions")
-    permission = relationship("Permission", back_populates="users")
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+from app.models.sync import next_change_version
+
+class Permission(Base):
+    __tablename__ = "permissions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    description = Column(String, nullable=True)
+
+    users = relationship("UserPermission", back_populates="permission")
+
+class UserPermission(Base):
+    __tablename__ = "user_permissions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    permission_id = Column(Integer, ForeignKey("permissions.id"), nullable=False)
+    event_id = Column(
+        Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False
+    )
+    # Bumped when a sibling grant is revoked, so the grantee's sync sees it
+    change_version = Column(BigInteger, nullable=False, default=next_change_version())
+
+    user = relationship("User", back_populates="permissions")
+    permission = relationship("Permission", back_populates="users")
+
+    __table_args__ = (
+        # One row per grant; bulk shares rely on it to skip existing ones
+        UniqueConstraint(
+            "user_id", "permission_id", "event_id", name="uq_user_permissions_grant"
+        ),
+        # "Shared with me" walks a user's grants; ACL checks probe one pair
+        Index("ix_user_permissions_user_event", "user_id", "event_id"),
+        # Listing and cleaning up the grants of one event
+        Index("ix_user_permissions_event_user", "event_id", "user_id"),
+        # Delta sync: grants a user gained or had changed
+        Index("ix_user_permissions_user_change", "user_id", "change_version"),
+        Index(
+            "ix_user_permissions_change_version", "change_version"
+        ).ddl_if(dialect="sqlite"),
+    )
@@ -0,0 +1,60 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
+from app.database import Base
+
+class next_change_version(FunctionElement):
+    """Change version stamped on a row as it is written.
+
+    Events, grants and tombstones share one ordering, which
+    GET /events/changes pages through.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+class change_horizon(FunctionElement):
+    """Lowest change version a reader can't be sure it has seen."""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(next_change_version)
+@compiles(change_horizon)
+def _compile_single_writer(element, compiler, **kw):
+    # SQLite has one writer at a time, so the next version is one past the
+    # highest stored, and nothing below it can still be in flight
+    return (
+        "(SELECT coalesce(max(v), 0) + 1 FROM ("
+        "SELECT max(change_version) AS v FROM events "
+        "UNION ALL SELECT max(change_version) FROM user_permissions "
+        "UNION ALL SELECT max(change_version) FROM sync_tombstones))"
+    )
+
+@compiles(next_change_version, "postgresql")
+def _compile_transaction_id(element, compiler, **kw):
+    # Concurrent writers never wait on a shared counter; the writing
+    # transaction's id orders its rows
+    return "pg_current_xact_id()::text::bigint"
+
+@compiles(change_horizon, "postgresql")
+def _compile_snapshot_xmin(element, compiler, **kw):
+    # Every transaction below the snapshot's xmin has finished, so later rows
+    # can only carry versions from here up
+    return "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    # Whose sync sees the removal: the owner or a grantee
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # No foreign key, the event is usually gone
+    event_id = Column(Integer, nullable=False)
+    change_version = Column(BigInteger, nullable=False, default=next_change_version())
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_version", "user_id", "change_version"),
+        # Only the SQLite version stamp needs max(change_version) per table
+        Index("ix_sync_tombstones_version", "change_version").ddl_if(dialect="sqlite"),
+    )
@@ -1,9 +1,22 @@
-from .auth import Token, TokenData, UserCreate, UserInDB, UserOut
-from .event import EventCreate, EventUpdate, EventOut
-from .permission import PermissionCreate, PermissionOut
-
-__all__ = [
-    "Token", "TokenData", "UserCreate", "UserInDB", "UserOut",
-    "EventCreate", "EventUpdate", "EventOut",
-    "PermissionCreate", "PermissionOut"
+from .auth import FeedTokenOut, Token, TokenData, UserCreate, UserInDB, UserOut
+from .event import (
+    EventCreate, EventUpdate, EventOut, EventBatchItemResult, EventBatchResult,
+    EventImportStatus, EventExceptionCreate, EventExceptionOut,
+    EventChange, EventChanges,
+)
+from .permission import (
+    PermissionCreate, PermissionOut, ShareGrant, BulkShareRequest, BulkShareResult,
+)
+from .freebusy import TimeInterval, FreeBusyRequest, FreeBusyOut
+from .internal import HistogramOut, PoolStatus
+
+__all__ = [
+    "FeedTokenOut", "Token", "TokenData", "UserCreate", "UserInDB", "UserOut",
+    "EventCreate", "EventUpdate", "EventOut",
+    "EventBatchItemResult", "EventBatchResult", "EventImportStatus",
+    "EventExceptionCreate", "EventExceptionOut", "EventChange", "EventChanges",
+    "PermissionCreate", "PermissionOut",
+    "ShareGrant", "BulkShareRequest", "BulkShareResult",
+    "TimeInterval", "FreeBusyRequest", "FreeBusyOut",
+    "HistogramOut", "PoolStatus",
 ]
\ No newline at end of file
@@ -1,29 +1,32 @@
-from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, EmailStr, Field
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TokenData(BaseModel):
-    email: Optional[EmailStr] = None
-
-class UserBase(BaseModel):
-    email: EmailStr
-    full_name: Optional[str] = None
-
-class UserCreate(UserBase):
-    password: str = Field(..., min_length=8)
-
-class UserInDB(UserBase):
-    id: int
-    is_active: bool
-    created_at: datetime
-    updated_at: Optional[datetime] = None
-
-    class Config:
-        orm_mode = True
-
-class UserOut(UserInDB):
-    pass
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class FeedTokenOut(BaseModel):
+    # Subscribe with /events/feed.ics?token=<token>
+    token: str
+
+class TokenData(BaseModel):
+    email: Optional[EmailStr] = None
+
+class UserBase(BaseModel):
+    email: EmailStr
+    full_name: Optional[str] = None
+
+class UserCreate(UserBase):
+    password: str = Field(..., min_length=8)
+
+class UserInDB(UserBase):
+    id: int
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UserOut(UserInDB):
+    pass
@@ -1,29 +1,93 @@
-from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field
-
-class EventBase(BaseModel):
-    title: str = Field(..., max_length=100)
-    description: Optional[str] = Field(None, max_length=500)
-    start_time: datetime
-    end_time: datetime
-    location: Optional[str] = Field(None, max_length=100)
-
-class EventCreate(EventBase):
-    pass
-
-class EventUpdate(BaseModel):
-    title: Optional[str] = Field(None, max_length=100)
-    description: Optional[str] = Field(None, max_length=500)
-    start_time: Optional[datetime] = None
-    end_time: Optional[datetime] = None
-    location: Optional[str] = Field(None, max_length=100)
-
-class EventOut(EventBase):
-    id: int
-    owner_id: int
-    created_at: datetime
-    updated_at: Optional[datetime] = None
-
-    class Config:
-        orm_mode = True
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from app.utils.dates import UTCDateTime
+
+class EventBase(BaseModel):
+    title: str = Field(..., max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    start_time: UTCDateTime
+    end_time: UTCDateTime
+    location: Optional[str] = Field(None, max_length=100)
+    # RFC 5545 RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10"
+    recurrence_rule: Optional[str] = Field(None, max_length=200)
+
+class EventCreate(EventBase):
+    pass
+
+class EventUpdate(BaseModel):
+    title: Optional[str] = Field(None, max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    start_time: Optional[UTCDateTime] = None
+    end_time: Optional[UTCDateTime] = None
+    location: Optional[str] = Field(None, max_length=100)
+    recurrence_rule: Optional[str] = Field(None, max_length=200)
+    # The version last read; a mismatch is rejected with 409
+    version: Optional[int] = None
+
+class EventOut(EventBase):
+    id: int
+    owner_id: int
+    version: int
+    recurrence_end: Optional[datetime] = None
+    # Set on expanded occurrences of a series: the start the rule generated
+    occurrence_start: Optional[datetime] = None
+    # The caller's access, set when listing shared events
+    permissions: Optional[List[str]] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class EventChange(BaseModel):
+    kind: Literal["upsert", "delete"]
+    id: int
+    change_version: int
+    # The event as the caller now sees it; null for deletes
+    event: Optional[EventOut] = None
+
+class EventChanges(BaseModel):
+    changes: List[EventChange]
+    # Pass back as ?since= for the next sync
+    next_token: str
+    has_more: bool
+
+class EventExceptionCreate(BaseModel):
+    original_start: UTCDateTime
+    is_cancelled: bool = False
+    start_time: Optional[UTCDateTime] = None
+    end_time: Optional[UTCDateTime] = None
+    title: Optional[str] = Field(None, max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    location: Optional[str] = Field(None, max_length=100)
+
+class EventExceptionOut(EventExceptionCreate):
+    id: int
+    event_id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+class EventBatchItemResult(BaseModel):
+    index: int
+    status: Literal["created", "conflict", "invalid"]
+    id: Optional[int] = None
+    conflicting_event_ids: List[int] = []
+    conflicting_indexes: List[int] = []
+    detail: Optional[str] = None
+
+class EventBatchResult(BaseModel):
+    created: int
+    rejected: int
+    results: List[EventBatchItemResult]
+
+class EventImportStatus(BaseModel):
+    id: str
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    format: Literal["ics", "csv"]
+    bytes_read: int
+    total_bytes: int
+    processed: int
+    created: int
+    conflicts: int
+    invalid: int
+    errors: List[str] = []
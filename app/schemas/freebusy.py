@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel, Field
+
+from app.utils.dates import UTCDateTime
+
+class TimeInterval(BaseModel):
+    start: datetime
+    end: datetime
+
+class FreeBusyRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1)
+    start: UTCDateTime
+    end: UTCDateTime
+    min_duration_minutes: int = Field(30, gt=0)
+
+class FreeBusyOut(BaseModel):
+    busy: List[TimeInterval]
+    free: List[TimeInterval]
@@ -0,0 +1,17 @@
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+class HistogramOut(BaseModel):
+    count: int
+    sum: float
+    # Cumulative counts keyed by upper bound
+    buckets: Dict[str, int]
+
+class PoolStatus(BaseModel):
+    pool: str
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    idle: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    wait_seconds: HistogramOut
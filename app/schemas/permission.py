@@ -1,14 +1,27 @@
-from pydantic import BaseModel
-
-class PermissionBase(BaseModel):
-    name: str
-    description: str | None = None
-
-class PermissionCreate(PermissionBase):
-    pass
-
-class PermissionOut(PermissionBase):
-    id: int
-
-    class Config:
-        orm_mode = True
+from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+
+class PermissionBase(BaseModel):
+    name: str
+    description: str | None = None
+
+class PermissionCreate(PermissionBase):
+    pass
+
+class PermissionOut(PermissionBase):
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ShareGrant(BaseModel):
+    user_id: int
+    permission: str
+
+class BulkShareRequest(BaseModel):
+    grants: List[ShareGrant] = Field(..., min_length=1)
+
+class BulkShareResult(BaseModel):
+    requested: int
+    # Rows actually inserted or deleted; already-present grants aren't counted
+    changed: int
@@ -1,81 +1,240 @@
-from datetime import datetime, timedelta
-from typing import Optional
-
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-
-from fastapi import HTTPException, status
-
-from app.config import settings
-from app.models.user import User
-from app.schemas.auth import UserCreate, UserOut, TokenData
-from app.utils.exceptions import UnauthorizedException
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-async def authenticate_user(
-    db: AsyncSession, email: str, password: str
-) -> Optional[User]:
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
-    
-    if not user:
-        return None
-    if not verify_password(password, user.hashed_password):
-        return None
-    return user
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(db: AsyncSession, token: str) -> UserOut:
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise UnauthorizedException("Could not validate credentials")
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise UnauthorizedException("Could not validate credentials")
-    
-    result = await db.execute(select(User).where(User.email == token_data.email))
-    user = result.scalars().first()
-    
-    if user is None:
-        raise UnauthorizedException("User not found")
-    
-    # Convert ORM user model to Pydantic UserOut schema
-    return UserOut.from_orm(user)
-
-async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
-    # Check if user already exists
-    result = await db.execute(select(User).where(User.email == user_data.email))
-    if result.scalars().first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-    
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        email=user_data.email,
-        hashed_password=hashed_password,
-        full_name=user_data.full_name,
-    )
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
-    return db_user
+import asyncio
+import hashlib
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Optional
+
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.database import record_write
+from app.models.user import FeedToken, User
+from app.schemas.auth import UserCreate, UserOut, TokenData
+from app.utils.cache import TTLCache
+from app.utils.exceptions import UnauthorizedException
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Validated principals keyed by token hash, tagged by user id for invalidation
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalidate_user_principal(user_id: int) -> None:
+    principal_cache.invalidate_tag(user_id)
+
+# Changed users are collected as the session flushes and only dropped from
+# the cache once the transaction commits; dropping them at flush would let a
+# request in between cache the old row again. Changes made through a Session,
+# including update(User) and delete(User) statements, are covered.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = session.info.setdefault("changed_user_ids", set())
+    for instance in chain(session.dirty, session.deleted):
+        if isinstance(instance, User):
+            changed.add(instance.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state) -> None:
+    # Which rows a statement touches isn't known, so every principal goes
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is User for mapper in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info["changed_all_users"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    if session.info.pop("changed_all_users", False):
+        principal_cache.clear()
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user_principal(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop("changed_all_users", None)
+    session.info.pop("changed_user_ids", None)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+# bcrypt is CPU bound, so it runs on a dedicated pool with a bounded queue
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+_dummy_hash: Optional[str] = None
+
+async def _run_hashing(func, *args):
+    try:
+        await asyncio.wait_for(
+            _hash_slots.acquire(),
+            timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_slots.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+async def _get_dummy_hash() -> str:
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await get_password_hash_async(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+def shutdown_password_hashing() -> None:
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
+async def authenticate_user(
+    db: AsyncSession, email: str, password: str
+) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    
+    if not user:
+        # Burn the same bcrypt cost so unknown emails aren't distinguishable by timing
+        await verify_password_async(password, await _get_dummy_hash())
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=15))
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return encoded_jwt
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    # Identifies the caller without a database round trip. A token already
+    # validated is named by its cached principal, so it isn't decoded twice.
+    if not token:
+        return None
+    cached = principal_cache.peek(_token_key(token))
+    if cached is not None:
+        return cached.email
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+async def get_current_user(db: AsyncSession, token: str) -> UserOut:
+    key = _token_key(token)
+    cached = principal_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            raise UnauthorizedException("Could not validate credentials")
+        token_data = TokenData(email=email)
+    except JWTError:
+        raise UnauthorizedException("Could not validate credentials")
+    
+    result = await db.execute(select(User).where(User.email == token_data.email))
+    user = result.scalars().first()
+    
+    if user is None:
+        raise UnauthorizedException("User not found")
+    
+    # Convert ORM user model to Pydantic UserOut schema
+    user_out = UserOut.from_orm(user)
+    # Never cache a principal past its token's own expiry
+    exp = payload.get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    principal_cache.set(key, user_out, ttl=ttl, tags=(user_out.id,))
+    return user_out
+
+async def issue_feed_token(db: AsyncSession, user_id: int) -> str:
+    """A new secret for the user's feed URL; the previous one stops working."""
+    token = secrets.token_urlsafe(32)
+    await db.execute(delete(FeedToken).where(FeedToken.user_id == user_id))
+    db.add(FeedToken(user_id=user_id, token_hash=_token_key(token)))
+    await db.commit()
+    invalidate_user_principal(user_id)
+    return token
+
+async def revoke_feed_token(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(
+        delete(FeedToken).where(FeedToken.user_id == user_id).returning(FeedToken.id)
+    )
+    revoked = result.first() is not None
+    await db.commit()
+    invalidate_user_principal(user_id)
+    return revoked
+
+async def get_feed_token_user(db: AsyncSession, token: str) -> UserOut:
+    # Feed tokens never pass for access tokens, so they get their own keys
+    key = ("feed", _token_key(token))
+    cached = principal_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = await db.execute(
+        select(User)
+        .join(FeedToken, FeedToken.user_id == User.id)
+        .where(FeedToken.token_hash == key[1])
+    )
+    user = result.scalars().first()
+    if user is None:
+        raise UnauthorizedException("Could not validate credentials")
+    user_out = UserOut.from_orm(user)
+    principal_cache.set(key, user_out, tags=(user_out.id,))
+    return user_out
+
+async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
+    # Check if user already exists
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    if result.scalars().first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
+    
+    hashed_password = await get_password_hash_async(user_data.password)
+    db_user = User(
+        email=user_data.email,
+        hashed_password=hashed_password,
+        full_name=user_data.full_name,
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    # Registration is anonymous, so the middleware can't attribute it
+    record_write(db_user.email)
+    return db_user
@@ -1,95 +1,1524 @@
-from datetime import datetime
-from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import and_, or_
-
-from app.models.event import Event
-from app.schemas.event import EventCreate, EventUpdate, EventOut
-
-async def create_event(
-    db: AsyncSession, event_data: EventCreate, owner_id: int
-) -> Event:
-    db_event = Event(**event_data.dict(), owner_id=owner_id)
-    db.add(db_event)
-    await db.commit()
-    await db.refresh(db_event)
-    return db_event
-
-async def get_events(
-    db: AsyncSession, owner_id: int, skip: int = 0, limit: int = 100
-) -> List[Event]:
-    result = await db.execute(
-        select(Event)
-        .where(Event.owner_id == owner_id)
-        .offset(skip)
-        .limit(limit)
-    )
-    return result.scalars().all()
-
-async def get_event(
-    db: AsyncSession, event_id: int, owner_id: int
-) -> Optional[Event]:
-    result = await db.execute(
-        select(Event)
-        .where(and_(Event.id == event_id, Event.owner_id == owner_id))
-    )
-    return result.scalars().first()
-
-async def update_event(
-    db: AsyncSession, event_id: int, owner_id: int, event_data: EventUpdate
-) -> Optional[Event]:
-    result = await db.execute(
-        select(Event).where(and_(Event.id == event_id, Event.owner_id == owner_id))
-    )
-    db_event = result.scalars().first()
-    
-    if db_event:
-        update_data = event_data.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_event, key, value)
-        
-        await db.commit()
-        await db.refresh(db_event)
-    
-    return db_event
-
-async def delete_event(db: AsyncSession, event_id: int, owner_id: int) -> None:
-    result = await db.execute(
-        select(Event).where(and_(Event.id == event_id, Event.owner_id == owner_id))
-    )
-    db_event = result.scalars().first()
-    
-    if db_event:
-        await db.delete(db_event)
-        await db.commit()
-
-async def check_event_conflict(
-    db: AsyncSession,
-    owner_id: int,
-    start_time: datetime,
-    end_time: datetime,
-    exclude_event_id: Optional[int] = None,
-) -> bool:
-    if start_time >= end_time:
-        return True
-    
-    query = select(Event).where(
-        and_(
-            Event.owner_id == owner_id,
-            or_(
-                and_(
-                    Event.start_time < end_time,
-                    Event.end_time > start_time
-                ),
-                Event.start_time == start_time,
-                Event.end_time == end_time
-            )
-        )
-    )
-    
-    if exclude_event_id:
-        query = query.where(Event.id != exclude_event_id)
-    
-    result = await db.execute(query)
-    return result.scalars().first() is not None
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import (
+    and_,
+    or_,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    null,
+    true,
+    tuple_,
+    union,
+    union_all,
+    update,
+)
+
+from app.config import settings
+from app.models.event import Event, EventException, SEARCH_CONFIG, search_document
+from app.models.permission import UserPermission
+from app.models.sync import SyncTombstone, change_horizon, next_change_version
+from app.schemas.event import (
+    EventCreate,
+    EventUpdate,
+    EventOut,
+    EventBatchItemResult,
+    EventBatchResult,
+    EventExceptionCreate,
+)
+from app.services.permission import (
+    OWNER_MASK,
+    grant_mask_column,
+    invalidate_event_acl,
+    permission_names,
+    revoke_all_event_permissions,
+)
+from app.services.recurrence import (
+    SERIES_HORIZON,
+    common_period,
+    expand,
+    occurrence_starts_between,
+    occurs_between,
+    parse_rule,
+    series_last_start,
+)
+from app.services.stream import event_hub, publish_event_change
+from app.utils.cache import (
+    CachedResponse,
+    LocalResponseStore,
+    RedisResponseStore,
+    ResponseCache,
+    TTLCache,
+)
+from app.utils.dates import naive_utc
+from app.utils.exceptions import EventConflictException, EventVersionConflictException
+from app.utils.pagination import (
+    decode_change_token,
+    decode_cursor,
+    decode_rank_cursor,
+    encode_change_token,
+    encode_cursor,
+    encode_rank_cursor,
+)
+from app.utils.search import TokenIndex, tokenize
+
+# Calendar-view results cached per (owner_id, ISO week start)
+range_cache = TTLCache(
+    maxsize=settings.RANGE_CACHE_SIZE,
+    ttl=settings.RANGE_CACHE_TTL_SECONDS,
+)
+BUCKET_SPAN = timedelta(weeks=1)
+
+# Owner-scoped read responses, invalidated by bumping the owner's version
+response_cache = ResponseCache(
+    RedisResponseStore(settings.RESPONSE_CACHE_URL, settings.RESPONSE_CACHE_TTL_SECONDS)
+    if settings.RESPONSE_CACHE_URL
+    else LocalResponseStore(
+        settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS
+    )
+)
+
+# Full-text fallback for backends without one; Postgres searches the GIN
+# index on events instead. Weights mirror ts_rank's defaults for the A/B/C
+# labels in search_document. Like the caches above, it only sees writes
+# made through this process.
+search_index = TokenIndex({"title": 1.0, "location": 0.4, "description": 0.2})
+SEARCH_INDEX_BATCH_SIZE = 5000
+
+# List and detail reads select these columns straight into EventOut-shaped
+# dicts, skipping ORM hydration and response-model validation. Fields without
+# a column, such as occurrence_start and permissions, are rendered as null.
+EVENT_ROW_FIELDS = list(EventOut.model_fields)
+EVENT_ROW_COLUMNS = [
+    Event.__table__.c[name] for name in EVENT_ROW_FIELDS if name in Event.__table__.c
+]
+_EVENT_ROW_KEYS = [column.key for column in EVENT_ROW_COLUMNS]
+_EVENT_ROW_TEMPLATE = dict.fromkeys(EVENT_ROW_FIELDS)
+
+def event_row(row: Iterable) -> dict:
+    event = _EVENT_ROW_TEMPLATE.copy()
+    event.update(zip(_EVENT_ROW_KEYS, row))
+    return event
+
+def _index_event(event_id: int, owner_id: int, source) -> None:
+    search_index.add(
+        event_id,
+        owner_id,
+        {field: getattr(source, field) for field in search_index.weights},
+    )
+
+async def _publish_change(
+    db: AsyncSession, kind: str, event_id: int, owner_id: int
+) -> None:
+    # Grantees are only looked up when a stream may be listening
+    if not event_hub.listening:
+        return
+    result = await db.execute(
+        select(UserPermission.user_id)
+        .where(UserPermission.event_id == event_id)
+        .distinct()
+    )
+    publish_event_change(kind, event_id, [owner_id, *result.scalars()], owner_id)
+
+def _bucket_start(moment: datetime) -> datetime:
+    monday = moment.date() - timedelta(days=moment.weekday())
+    return datetime.combine(monday, time.min, tzinfo=moment.tzinfo)
+
+def _buckets(start_time: datetime, end_time: datetime) -> Iterator[datetime]:
+    bucket = _bucket_start(start_time)
+    while bucket < end_time:
+        yield bucket
+        bucket += BUCKET_SPAN
+
+def _invalidate_range(owner_id: int, start_time: datetime, end_time: datetime) -> None:
+    for bucket in _buckets(start_time, end_time):
+        range_cache.pop((owner_id, bucket))
+
+async def _record_write(
+    owner_id: int, *ranges: Tuple[datetime, datetime], series: bool = False
+) -> None:
+    # Always after the commit, so a reader that sees the new version also
+    # sees the write
+    await response_cache.bump(owner_id)
+    if series:
+        # A series may reach any week, so drop every bucket the owner has
+        range_cache.invalidate_tag(owner_id)
+    for start_time, end_time in ranges:
+        _invalidate_range(owner_id, start_time, end_time)
+
+def _overlap_filter(
+    owner_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_event_id: Optional[int] = None,
+):
+    # An owner's single events never overlap each other, so ordered by start
+    # time the only earlier one that can reach into [start_time, end_time) is
+    # the immediate predecessor. That makes the check two seeks on
+    # ix_events_owner_start_id rather than a scan of the whole calendar.
+    # Series rows are left out: their first occurrence may be cancelled or
+    # moved, so they are checked through expand_series instead.
+    scope = [Event.owner_id == owner_id, Event.recurrence_rule.is_(None)]
+    if exclude_event_id:
+        scope.append(Event.id != exclude_event_id)
+
+    predecessor = (
+        select(Event.id)
+        .where(*scope, Event.start_time < start_time)
+        .order_by(Event.start_time.desc())
+        .limit(1)
+        .correlate(None)
+        .scalar_subquery()
+    )
+    return and_(
+        *scope,
+        or_(
+            and_(Event.start_time >= start_time, Event.start_time < end_time),
+            and_(Event.id == predecessor, Event.end_time > start_time),
+        ),
+    )
+
+def _validate_time_range(start_time: datetime, end_time: datetime) -> None:
+    if start_time >= end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Event end time must be after its start time",
+        )
+
+def _series_end(
+    recurrence_rule: str, start_time: datetime, end_time: datetime
+) -> Optional[datetime]:
+    rule = parse_rule(recurrence_rule)
+    if rule.until is not None and rule.until < start_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Recurrence UNTIL must not be before the first occurrence",
+        )
+    last_start = series_last_start(rule, start_time)
+    return last_start + (end_time - start_time) if last_start else None
+
+class Occurrence(NamedTuple):
+    event: Event
+    original_start: datetime
+    start_time: datetime
+    end_time: datetime
+    exception: Optional[EventException] = None
+
+def _series_filter(
+    owner_ids: Iterable[int],
+    window_start: datetime,
+    window_end: datetime,
+    exclude_event_id: Optional[int] = None,
+):
+    conditions = [
+        Event.owner_id.in_(list(owner_ids)),
+        Event.recurrence_rule.isnot(None),
+        Event.start_time < window_end,
+        or_(Event.recurrence_end.is_(None), Event.recurrence_end > window_start),
+    ]
+    if exclude_event_id:
+        conditions.append(Event.id != exclude_event_id)
+    return and_(*conditions)
+
+async def load_series(
+    db: AsyncSession,
+    owner_ids: Iterable[int],
+    window_start: datetime,
+    window_end: datetime,
+    exclude_event_id: Optional[int] = None,
+) -> List[Event]:
+    result = await db.execute(
+        select(Event).where(
+            _series_filter(owner_ids, window_start, window_end, exclude_event_id)
+        )
+    )
+    return result.scalars().all()
+
+async def expand_series(
+    db: AsyncSession,
+    series: List[Event],
+    window_start: datetime,
+    window_end: datetime,
+) -> List[Occurrence]:
+    """Occurrences of the given series overlapping [window_start, window_end),
+    with exceptions applied. Only the window is ever generated."""
+    if not series:
+        return []
+
+    longest = max(event.end_time - event.start_time for event in series)
+    result = await db.execute(
+        select(EventException).where(
+            EventException.event_id.in_([event.id for event in series]),
+            or_(
+                and_(
+                    EventException.original_start > window_start - longest,
+                    EventException.original_start < window_end,
+                ),
+                and_(
+                    EventException.start_time < window_end,
+                    EventException.end_time > window_start,
+                ),
+            ),
+        )
+    )
+    exceptions: Dict[int, Dict[datetime, EventException]] = {}
+    for exception in result.scalars().all():
+        exceptions.setdefault(exception.event_id, {})[exception.original_start] = exception
+
+    occurrences = []
+    for event in series:
+        rule = parse_rule(event.recurrence_rule)
+        duration = event.end_time - event.start_time
+        last_start = event.recurrence_end - duration if event.recurrence_end else None
+        overrides = exceptions.get(event.id, {})
+
+        candidates = [
+            (start_time, end_time)
+            for start_time, end_time in expand(
+                rule, event.start_time, duration, window_start, window_end, last_start
+            )
+        ]
+        # Occurrences moved into the window from outside it
+        generated = {start_time for start_time, _ in candidates}
+        candidates += [
+            (original_start, original_start + duration)
+            for original_start in overrides
+            if original_start not in generated
+        ]
+
+        for original_start, original_end in candidates:
+            exception = overrides.get(original_start)
+            start_time, end_time = original_start, original_end
+            if exception is not None:
+                if exception.is_cancelled:
+                    continue
+                start_time = exception.start_time or original_start
+                end_time = exception.end_time or start_time + duration
+            if start_time < window_end and end_time > window_start:
+                occurrences.append(
+                    Occurrence(event, original_start, start_time, end_time, exception)
+                )
+
+    occurrences.sort(key=lambda occurrence: (occurrence.start_time, occurrence.event.id))
+    return occurrences
+
+def occurrence_to_out(occurrence: Occurrence) -> EventOut:
+    exception = occurrence.exception
+    overrides = {
+        "start_time": occurrence.start_time,
+        "end_time": occurrence.end_time,
+        "occurrence_start": occurrence.original_start,
+    }
+    if exception is not None:
+        for field in ("title", "description", "location"):
+            if getattr(exception, field) is not None:
+                overrides[field] = getattr(exception, field)
+    return EventOut.from_orm(occurrence.event).copy(update=overrides)
+
+async def _find_series_conflicts(
+    db: AsyncSession,
+    owner_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    recurrence_rule: str,
+    exclude_event_id: Optional[int] = None,
+) -> List[int]:
+    rule = parse_rule(recurrence_rule)
+    duration = end_time - start_time
+    series_end = _series_end(recurrence_rule, start_time, end_time)
+    last_start = series_end - duration if series_end else None
+
+    # Single events from the series start on, each tested against the rule in
+    # constant time; nothing is expanded
+    query = select(Event.id, Event.start_time, Event.end_time).where(
+        Event.owner_id == owner_id,
+        Event.recurrence_rule.is_(None),
+        Event.end_time > start_time,
+    )
+    if series_end:
+        query = query.where(Event.start_time < series_end)
+    if exclude_event_id:
+        query = query.where(Event.id != exclude_event_id)
+    result = await db.execute(query.order_by(Event.start_time))
+    conflicting_ids = [
+        event_id
+        for event_id, other_start, other_end in result.all()
+        if occurs_between(rule, start_time, duration, other_start, other_end, last_start)
+    ]
+
+    # Other series are compared exactly up to the earlier of the two ends.
+    # Past the limit, or with neither end set, the pair is compared over one
+    # common period instead, after which its occurrences only repeat; rule
+    # occurrences are then taken as generated, erring towards a conflict
+    # over one cancelled in that period, and moved ones are checked
+    # separately. A pair with no common period within the limit is refused.
+    limit = timedelta(days=settings.RECURRENCE_CONFLICT_HORIZON_DAYS)
+    others = await load_series(
+        db, [owner_id], start_time, series_end or SERIES_HORIZON, exclude_event_id
+    )
+    for other in others:
+        other_rule = parse_rule(other.recurrence_rule)
+        other_duration = other.end_time - other.start_time
+        ends = [end for end in (series_end, other.recurrence_end) if end is not None]
+        window_end = min(ends) if ends else None
+        if window_end is not None and window_end - start_time <= limit:
+            occurrences = await expand_series(db, [other], start_time, window_end)
+            intervals = [
+                (occurrence.start_time, occurrence.end_time)
+                for occurrence in occurrences
+            ]
+        else:
+            period = common_period(rule, other_rule)
+            overlap_start = max(start_time, other.start_time)
+            if period is None or period > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=(
+                        f"Can't check this series for conflicts with recurring event "
+                        f"{other.id}; end one of them with COUNT or UNTIL"
+                    ),
+                )
+            period_end = overlap_start + period + duration + other_duration
+            last_other = (
+                other.recurrence_end - other_duration if other.recurrence_end else None
+            )
+            intervals = list(
+                expand(
+                    other_rule, other.start_time, other_duration,
+                    start_time, period_end, last_other,
+                )
+            )
+            result = await db.execute(
+                select(EventException.start_time, EventException.end_time).where(
+                    EventException.event_id == other.id,
+                    EventException.is_cancelled.is_(False),
+                    EventException.start_time.isnot(None),
+                )
+            )
+            intervals += [
+                (moved_start, moved_end or moved_start + other_duration)
+                for moved_start, moved_end in result.all()
+            ]
+        if any(
+            occurs_between(rule, start_time, duration, other_start, other_end, last_start)
+            for other_start, other_end in intervals
+        ):
+            conflicting_ids.append(other.id)
+    return conflicting_ids
+
+async def find_conflicting_event_ids(
+    db: AsyncSession,
+    owner_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_event_id: Optional[int] = None,
+    recurrence_rule: Optional[str] = None,
+    occurrences: Optional[List[Occurrence]] = None,
+) -> List[int]:
+    """Ids of the owner's events overlapping the range, or the series when
+    `recurrence_rule` is given. Pass `occurrences` when the owner's series
+    were already expanded over the range, so they aren't loaded again."""
+    if recurrence_rule:
+        return await _find_series_conflicts(
+            db, owner_id, start_time, end_time, recurrence_rule, exclude_event_id
+        )
+
+    result = await db.execute(
+        select(Event.id)
+        .where(_overlap_filter(owner_id, start_time, end_time, exclude_event_id))
+        .order_by(Event.start_time)
+    )
+    conflicting_ids = list(result.scalars().all())
+    if occurrences is None:
+        series = await load_series(db, [owner_id], start_time, end_time, exclude_event_id)
+        occurrences = await expand_series(db, series, start_time, end_time)
+    for occurrence in occurrences:
+        if occurrence.event.id not in conflicting_ids:
+            conflicting_ids.append(occurrence.event.id)
+    return conflicting_ids
+
+async def _raise_conflict(
+    db: AsyncSession,
+    owner_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_event_id: Optional[int] = None,
+    recurrence_rule: Optional[str] = None,
+    occurrences: Optional[List[Occurrence]] = None,
+) -> None:
+    conflicting_ids = await find_conflicting_event_ids(
+        db, owner_id, start_time, end_time, exclude_event_id, recurrence_rule, occurrences
+    )
+    raise EventConflictException(conflicting_ids)
+
+async def _create_series(
+    db: AsyncSession, event_data: EventCreate, owner_id: int
+) -> Event:
+    recurrence_end = _series_end(
+        event_data.recurrence_rule, event_data.start_time, event_data.end_time
+    )
+    conflicting_ids = await find_conflicting_event_ids(
+        db,
+        owner_id,
+        event_data.start_time,
+        event_data.end_time,
+        recurrence_rule=event_data.recurrence_rule,
+    )
+    if conflicting_ids:
+        raise EventConflictException(conflicting_ids)
+
+    db_event = Event(
+        **event_data.dict(), owner_id=owner_id, recurrence_end=recurrence_end
+    )
+    db.add(db_event)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await _raise_conflict(
+            db,
+            owner_id,
+            event_data.start_time,
+            event_data.end_time,
+            recurrence_rule=event_data.recurrence_rule,
+        )
+    await db.refresh(db_event)
+    await _record_write(owner_id, series=True)
+    _index_event(db_event.id, owner_id, db_event)
+    publish_event_change("created", db_event.id, [owner_id], owner_id)
+    return db_event
+
+async def create_event(
+    db: AsyncSession, event_data: EventCreate, owner_id: int
+) -> Event:
+    _validate_time_range(event_data.start_time, event_data.end_time)
+    if event_data.recurrence_rule:
+        return await _create_series(db, event_data, owner_id)
+
+    # Series occurrences aren't rows, so they are checked up front; the
+    # guarded insert below covers stored events atomically
+    series = await load_series(
+        db, [owner_id], event_data.start_time, event_data.end_time
+    )
+    occurrences = await expand_series(
+        db, series, event_data.start_time, event_data.end_time
+    )
+    if occurrences:
+        await _raise_conflict(
+            db, owner_id, event_data.start_time, event_data.end_time, occurrences=occurrences
+        )
+
+    values = {**event_data.dict(), "owner_id": owner_id}
+    columns = Event.__table__.c
+
+    # Conflict check and insert in one statement: the row is only selected
+    # into the INSERT when nothing overlaps it
+    guarded_row = select(
+        *[literal(value, type_=columns[key].type) for key, value in values.items()]
+    ).where(
+        ~exists(
+            select(Event.id).where(
+                _overlap_filter(owner_id, event_data.start_time, event_data.end_time)
+            )
+        )
+    )
+    try:
+        result = await db.scalars(
+            insert(Event).from_select(list(values), guarded_row).returning(Event)
+        )
+        db_event = result.first()
+        await db.commit()
+    except IntegrityError:
+        # Lost a race against a concurrent insert; the exclusion constraint caught it
+        await db.rollback()
+        db_event = None
+
+    if db_event is None:
+        await _raise_conflict(db, owner_id, event_data.start_time, event_data.end_time)
+    await _record_write(owner_id, (db_event.start_time, db_event.end_time))
+    _index_event(db_event.id, owner_id, db_event)
+    publish_event_change("created", db_event.id, [owner_id], owner_id)
+    return db_event
+
+async def create_events_batch(
+    db: AsyncSession, events_data: List[EventCreate], owner_id: int
+) -> EventBatchResult:
+    if len(events_data) > settings.EVENT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {settings.EVENT_BATCH_MAX_ITEMS} events",
+        )
+
+    results: Dict[int, EventBatchItemResult] = {}
+    candidates = []
+    for index, event_data in enumerate(events_data):
+        if event_data.start_time >= event_data.end_time:
+            results[index] = EventBatchItemResult(
+                index=index,
+                status="invalid",
+                detail="Event end time must be after its start time",
+            )
+        elif event_data.recurrence_rule:
+            results[index] = EventBatchItemResult(
+                index=index,
+                status="invalid",
+                detail="Recurring events must be created individually",
+            )
+        else:
+            candidates.append((event_data.start_time, event_data.end_time, index))
+    candidates.sort()
+
+    # Existing events across the whole batch window in one range query. They
+    # never overlap each other, so sorted by start they are sorted by end too
+    # and the ones hitting a candidate form one contiguous slice.
+    existing_ids: List[int] = []
+    existing_starts: List[datetime] = []
+    existing_ends: List[datetime] = []
+    occurrences: List[Occurrence] = []
+    if candidates:
+        window_start = candidates[0][0]
+        window_end = max(end_time for _, end_time, _ in candidates)
+        result = await db.execute(
+            select(Event.id, Event.start_time, Event.end_time)
+            .where(_overlap_filter(owner_id, window_start, window_end))
+            .order_by(Event.start_time)
+        )
+        for event_id, start_time, end_time in result.all():
+            existing_ids.append(event_id)
+            existing_starts.append(start_time)
+            existing_ends.append(end_time)
+        series = await load_series(db, [owner_id], window_start, window_end)
+        occurrences = await expand_series(db, series, window_start, window_end)
+    occurrence_starts = [occurrence.start_time for occurrence in occurrences]
+    longest_occurrence = max(
+        (occurrence.end_time - occurrence.start_time for occurrence in occurrences),
+        default=timedelta(0),
+    )
+
+    # Sweep in start order: a candidate is accepted when it clears both the
+    # stored events and the last event accepted from this batch
+    accepted = []
+    last_accepted = None
+    for start_time, end_time, index in candidates:
+        lo = bisect_right(existing_ends, start_time)
+        hi = bisect_left(existing_starts, end_time)
+        conflicting_ids = existing_ids[lo:hi]
+        # Occurrences may overlap each other, so bound the scan by duration
+        for occurrence in occurrences[
+            bisect_right(occurrence_starts, start_time - longest_occurrence):
+            bisect_left(occurrence_starts, end_time)
+        ]:
+            if occurrence.end_time > start_time and occurrence.event.id not in conflicting_ids:
+                conflicting_ids.append(occurrence.event.id)
+        if conflicting_ids:
+            results[index] = EventBatchItemResult(
+                index=index,
+                status="conflict",
+                conflicting_event_ids=conflicting_ids,
+            )
+        elif last_accepted is not None and start_time < last_accepted[1]:
+            results[index] = EventBatchItemResult(
+                index=index,
+                status="conflict",
+                conflicting_indexes=[last_accepted[2]],
+            )
+        else:
+            accepted.append(index)
+            last_accepted = (start_time, end_time, index)
+
+    if accepted:
+        rows = [
+            {**events_data[index].dict(), "owner_id": owner_id} for index in accepted
+        ]
+        # One multi-row INSERT ... VALUES ... RETURNING. Asking for RETURNING
+        # in parameter order makes SQLite fall back to a statement per row;
+        # accepted events never overlap, so their start times key the ids.
+        try:
+            result = await db.execute(
+                insert(Event.__table__).returning(
+                    Event.__table__.c.id, Event.__table__.c.start_time
+                ),
+                rows,
+            )
+            ids_by_start = {start_time: event_id for event_id, start_time in result.all()}
+            created_ids = [ids_by_start[events_data[index].start_time] for index in accepted]
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Events changed while the batch was being applied, retry the batch",
+            )
+        for index, event_id in zip(accepted, created_ids):
+            results[index] = EventBatchItemResult(
+                index=index, status="created", id=event_id
+            )
+            _index_event(event_id, owner_id, events_data[index])
+        await _record_write(
+            owner_id,
+            *[
+                (events_data[index].start_time, events_data[index].end_time)
+                for index in accepted
+            ],
+        )
+        # One notice for the lot; streams catch up through GET /events/changes
+        event_hub.publish(
+            [owner_id], "bulk", {"owner_id": owner_id, "created": len(accepted)}
+        )
+
+    return EventBatchResult(
+        created=len(accepted),
+        rejected=len(events_data) - len(accepted),
+        results=[results[index] for index in range(len(events_data))],
+    )
+
+def _owned_page_query(
+    entities: Iterable,
+    owner_id: int,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+):
+    query = (
+        select(*entities)
+        .where(Event.owner_id == owner_id)
+        .order_by(Event.start_time, Event.id)
+        .limit(limit)
+    )
+    if cursor:
+        # Keyset seek on (owner_id, start_time, id): cost is independent of depth
+        after_start, after_id = decode_cursor(cursor)
+        return query.where(
+            tuple_(Event.start_time, Event.id) > tuple_(after_start, after_id)
+        )
+    return query.offset(skip)
+
+async def get_events(
+    db: AsyncSession,
+    owner_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> List[Event]:
+    result = await db.execute(_owned_page_query((Event,), owner_id, skip, limit, cursor))
+    return result.scalars().all()
+
+async def get_events_page(
+    db: AsyncSession,
+    owner_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(
+        _owned_page_query(EVENT_ROW_COLUMNS, owner_id, skip, limit + 1, cursor)
+    )
+    events = [event_row(row) for row in result]
+    if len(events) <= limit:
+        return events, None
+    events = events[:limit]
+    return events, encode_cursor(events[-1]["start_time"], events[-1]["id"])
+
+async def get_events_page_response(
+    db: AsyncSession,
+    owner_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> CachedResponse:
+    # skip is ignored when paging by cursor, so it stays out of those keys
+    key = ("list", limit, cursor) if cursor else ("list", limit, skip)
+    version = await response_cache.version(owner_id)
+    response = await response_cache.get(owner_id, version, key)
+    if response is not None:
+        return response
+    events, next_cursor = await get_events_page(db, owner_id, skip, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return await response_cache.set(owner_id, version, key, orjson.dumps(events), headers)
+
+def _grant_masks(user_id: int, *conditions):
+    return (
+        select(
+            UserPermission.event_id,
+            grant_mask_column(UserPermission.permission_id).label("mask"),
+        )
+        .where(UserPermission.user_id == user_id, *conditions)
+        .group_by(UserPermission.event_id)
+        .subquery()
+    )
+
+async def get_accessible_events(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> List[Tuple]:
+    """Owned and shared events as EVENT_ROW_COLUMNS plus the caller's ACL
+    mask, in one query."""
+    grants = _grant_masks(user_id)
+    owned = select(
+        Event.id, Event.start_time, literal(OWNER_MASK).label("mask")
+    ).where(Event.owner_id == user_id)
+    shared = (
+        select(Event.id, Event.start_time, grants.c.mask)
+        .join(grants, grants.c.event_id == Event.id)
+        .where(Event.owner_id != user_id)
+    )
+
+    # Each branch seeks its own index and stops after one page, so the merge
+    # never sees more than two pages regardless of how much is shared
+    branches = []
+    for branch in (owned, shared):
+        if cursor:
+            after_start, after_id = decode_cursor(cursor)
+            branch = branch.where(
+                tuple_(Event.start_time, Event.id) > tuple_(after_start, after_id)
+            )
+        branch = branch.order_by(Event.start_time, Event.id).limit(
+            limit if cursor else skip + limit
+        )
+        branches.append(select(branch.subquery()))
+    page = union_all(*branches).subquery()
+
+    query = (
+        select(*EVENT_ROW_COLUMNS, page.c.mask)
+        .join(page, page.c.id == Event.id)
+        .order_by(Event.start_time, Event.id)
+        .limit(limit)
+    )
+    if not cursor:
+        query = query.offset(skip)
+    result = await db.execute(query)
+    return result.all()
+
+async def get_accessible_events_page(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    rows = await get_accessible_events(db, user_id, skip, limit + 1, cursor)
+    events = []
+    for *columns, mask in rows[:limit]:
+        event = event_row(columns)
+        event["permissions"] = permission_names(mask)
+        events.append(event)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(events[-1]["start_time"], events[-1]["id"])
+    return events, next_cursor
+
+async def delete_orphaned_event_rows(db: AsyncSession) -> None:
+    # Databases created before grants and exceptions were deleted along with
+    # their event, or without the foreign key, may still hold rows for events
+    # that are gone; an event reusing the id would inherit them
+    for model in (UserPermission, EventException):
+        await db.execute(
+            delete(model).where(~exists().where(Event.id == model.event_id))
+        )
+    await db.commit()
+
+async def build_search_index(db: AsyncSession) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        # The database keeps its own index; don't hold a copy in memory
+        search_index.enabled = False
+        return
+    search_index.clear()
+    result = await db.stream(
+        select(Event.id, Event.owner_id, Event.title, Event.location, Event.description)
+        .execution_options(yield_per=SEARCH_INDEX_BATCH_SIZE)
+    )
+    async for rows in result.partitions():
+        for row in rows:
+            _index_event(row.id, row.owner_id, row)
+
+def _accessible_rows(user_id: int, grants):
+    mask = case((Event.owner_id == user_id, literal(OWNER_MASK)), else_=grants.c.mask)
+    return (
+        select(*EVENT_ROW_COLUMNS, mask.label("mask"))
+        .outerjoin(grants, grants.c.event_id == Event.id)
+        .where(or_(Event.owner_id == user_id, grants.c.mask.isnot(None)))
+    )
+
+async def _search_full_text(
+    db: AsyncSession,
+    user_id: int,
+    terms: List[str],
+    limit: int,
+    after: Optional[Tuple[float, int]],
+) -> List[Tuple]:
+    document = search_document(Event.title, Event.location, Event.description)
+    # Terms are plain word characters, so they can't inject tsquery syntax
+    ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+    rank = func.ts_rank(document, ts_query)
+    query = (
+        _accessible_rows(user_id, _grant_masks(user_id))
+        .add_columns(rank.label("rank"))
+        .where(document.op("@@")(ts_query))
+        .order_by(rank.desc(), Event.id)
+        .limit(limit)
+    )
+    if after is not None:
+        after_rank, after_id = after
+        query = query.where(
+            or_(rank < after_rank, and_(rank == after_rank, Event.id > after_id))
+        )
+    result = await db.execute(query)
+    return result.all()
+
+async def _search_in_process(
+    db: AsyncSession,
+    user_id: int,
+    terms: List[str],
+    limit: int,
+    after: Optional[Tuple[float, int]],
+) -> List[Tuple]:
+    scores = search_index.search(terms)
+    others = [event_id for event_id in scores if search_index.owner(event_id) != user_id]
+    if others:
+        result = await db.scalars(
+            select(UserPermission.event_id).where(UserPermission.user_id == user_id)
+        )
+        shared = set(result.all())
+        for event_id in others:
+            if event_id not in shared:
+                del scores[event_id]
+
+    # Ascending (-rank, id) is the same order the Postgres query uses
+    ranked = sorted((-score, event_id) for event_id, score in scores.items())
+    start = bisect_right(ranked, (-after[0], after[1])) if after is not None else 0
+    page = ranked[start:start + limit]
+    if not page:
+        return []
+
+    # Rows and masks come from the database, which also drops anything the
+    # index still holds but the caller can no longer see
+    page_ids = [event_id for _, event_id in page]
+    result = await db.execute(
+        _accessible_rows(
+            user_id, _grant_masks(user_id, UserPermission.event_id.in_(page_ids))
+        ).where(Event.id.in_(page_ids))
+    )
+    rows = {row.id: row for row in result}
+    return [
+        (*rows[event_id], -negative_rank)
+        for negative_rank, event_id in page
+        if event_id in rows
+    ]
+
+async def search_events(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Owned and shared events matching every word of query, best first."""
+    terms = list(dict.fromkeys(tokenize(query)))[:settings.SEARCH_MAX_TERMS]
+    if not terms:
+        return [], None
+    after = decode_rank_cursor(cursor) if cursor else None
+    if db.get_bind().dialect.name == "postgresql":
+        rows = await _search_full_text(db, user_id, terms, limit + 1, after)
+    else:
+        rows = await _search_in_process(db, user_id, terms, limit + 1, after)
+
+    events = []
+    for *columns, mask, rank in rows[:limit]:
+        event = event_row(columns)
+        event["permissions"] = permission_names(mask)
+        events.append(event)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_rank_cursor(rows[limit - 1][-1], events[-1]["id"])
+    return events, next_cursor
+
+def _change_branch(query, version, event_id, after: Tuple[int, int], limit: int):
+    # Each branch seeks its own index and stops after one page
+    return select(
+        query.where(tuple_(version, event_id) > tuple_(*after))
+        .order_by(version, event_id)
+        .limit(limit)
+        .subquery()
+    )
+
+async def get_event_changes(
+    db: AsyncSession, user_id: int, token: Optional[str] = None, limit: int = 1000
+) -> dict:
+    """Events the caller gained, saw change or lost since token, oldest first.
+
+    Without a token this is a full snapshot of owned and shared events.
+    """
+    after = decode_change_token(token) if token else (0, 0)
+    since_version = after[0]
+
+    owned = select(
+        Event.change_version.label("change_version"),
+        literal("upsert").label("kind"),
+        *EVENT_ROW_COLUMNS,
+        literal(OWNER_MASK).label("mask"),
+    ).where(Event.owner_id == user_id, Event.change_version >= since_version)
+
+    # Shared events whose grants or content changed, each side found through
+    # its own index, then masked and stamped with the later of the two
+    changed_shared = union(
+        select(UserPermission.event_id).where(
+            UserPermission.user_id == user_id,
+            UserPermission.change_version >= since_version,
+        ),
+        select(Event.id)
+        .join(
+            UserPermission,
+            and_(UserPermission.event_id == Event.id, UserPermission.user_id == user_id),
+        )
+        .where(Event.change_version >= since_version),
+    ).subquery()
+    grants = (
+        select(
+            UserPermission.event_id,
+            grant_mask_column(UserPermission.permission_id).label("mask"),
+            func.max(UserPermission.change_version).label("change_version"),
+        )
+        .where(
+            UserPermission.user_id == user_id,
+            UserPermission.event_id.in_(select(changed_shared.c.event_id)),
+        )
+        .group_by(UserPermission.event_id)
+        .subquery()
+    )
+    shared_version = case(
+        (Event.change_version > grants.c.change_version, Event.change_version),
+        else_=grants.c.change_version,
+    )
+    shared = (
+        select(
+            shared_version.label("change_version"),
+            literal("upsert").label("kind"),
+            *EVENT_ROW_COLUMNS,
+            grants.c.mask,
+        )
+        .join(grants, grants.c.event_id == Event.id)
+        .where(Event.owner_id != user_id)
+    )
+    branches = [
+        _change_branch(owned, Event.change_version, Event.id, after, limit + 1),
+        _change_branch(shared, shared_version, Event.id, after, limit + 1),
+    ]
+    if token:
+        # A first sync has nothing to forget
+        deleted = select(
+            SyncTombstone.change_version,
+            literal("delete").label("kind"),
+            *[
+                SyncTombstone.event_id if column.key == "id" else null()
+                for column in EVENT_ROW_COLUMNS
+            ],
+            literal(0).label("mask"),
+        ).where(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.change_version >= since_version,
+        )
+        branches.append(_change_branch(
+            deleted, SyncTombstone.change_version, SyncTombstone.event_id, after, limit + 1
+        ))
+    changes = union_all(*branches).subquery()
+
+    # The horizon rides along on every row (or alone on an empty result), so
+    # it comes from the same snapshot as the changes
+    clock = select(change_horizon().label("horizon")).subquery()
+    result = await db.execute(
+        select(clock.c.horizon, changes)
+        .select_from(clock.outerjoin(changes, true()))
+        .order_by(changes.c.change_version, changes.c.id)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    horizon = rows[0].horizon
+    rows = [row for row in rows if row.kind is not None]
+
+    changes_out = []
+    for row in rows[:limit]:
+        change = {
+            "kind": row.kind,
+            "id": row.id,
+            "change_version": row.change_version,
+            "event": None,
+        }
+        if row.kind == "upsert":
+            event = event_row(row[3:-1])
+            event["permissions"] = permission_names(row.mask)
+            change["event"] = event
+        changes_out.append(change)
+
+    # Writes below the horizon may not be visible yet, so the token never
+    # moves past it; rows at or above it are simply sent again next time
+    has_more = len(rows) > limit
+    next_after = (horizon, 0)
+    if has_more:
+        last = rows[limit - 1]
+        next_after = min((last.change_version, last.id), (horizon, 0))
+        if next_after <= after:
+            # A long transaction is holding the horizon back; don't serve
+            # the same page forever
+            next_after = (last.change_version, last.id)
+    return {
+        "changes": changes_out,
+        "next_token": encode_change_token(*next_after),
+        "has_more": has_more,
+    }
+
+async def get_events_in_range(
+    db: AsyncSession, owner_id: int, range_start: datetime, range_end: datetime
+) -> List[EventOut]:
+    range_start, range_end = naive_utc(range_start), naive_utc(range_end)
+    if range_start >= range_end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be before 'to'",
+        )
+    if range_end - range_start > timedelta(days=settings.RANGE_QUERY_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range may span at most {settings.RANGE_QUERY_MAX_DAYS} days",
+        )
+
+    buckets: Dict[datetime, List[EventOut]] = {}
+    missing = []
+    for bucket in _buckets(range_start, range_end):
+        cached = range_cache.get((owner_id, bucket))
+        if cached is None:
+            missing.append(bucket)
+        else:
+            buckets[bucket] = cached
+
+    if missing:
+        # One query spanning every missing week, then split into buckets
+        fetch_end = missing[-1] + BUCKET_SPAN
+        result = await db.execute(
+            select(Event)
+            .where(_overlap_filter(owner_id, missing[0], fetch_end))
+            .order_by(Event.start_time, Event.id)
+        )
+        fetched = [EventOut.from_orm(event) for event in result.scalars().all()]
+        series = await load_series(db, [owner_id], missing[0], fetch_end)
+        fetched += [
+            occurrence_to_out(occurrence)
+            for occurrence in await expand_series(db, series, missing[0], fetch_end)
+        ]
+        for bucket in missing:
+            bucket_end = bucket + BUCKET_SPAN
+            buckets[bucket] = [
+                event for event in fetched
+                if event.start_time < bucket_end and event.end_time > bucket
+            ]
+            range_cache.set((owner_id, bucket), buckets[bucket], tags=(owner_id,))
+
+    # Events spanning several weeks appear in each of their buckets
+    seen = set()
+    events = []
+    for bucket in sorted(buckets):
+        for event in buckets[bucket]:
+            key = (event.id, event.occurrence_start)
+            if key in seen:
+                continue
+            if event.start_time < range_end and event.end_time > range_start:
+                seen.add(key)
+                events.append(event)
+    events.sort(key=lambda event: (event.start_time, event.id))
+    return events
+
+async def get_event(
+    db: AsyncSession, event_id: int, owner_id: int
+) -> Optional[Event]:
+    result = await db.execute(
+        select(Event)
+        .where(and_(Event.id == event_id, Event.owner_id == owner_id))
+    )
+    return result.scalars().first()
+
+async def get_event_row(
+    db: AsyncSession, event_id: int, owner_id: int
+) -> Optional[dict]:
+    result = await db.execute(
+        select(*EVENT_ROW_COLUMNS)
+        .where(and_(Event.id == event_id, Event.owner_id == owner_id))
+    )
+    row = result.first()
+    return event_row(row) if row is not None else None
+
+async def get_event_response(
+    db: AsyncSession, event_id: int, owner_id: int
+) -> Optional[CachedResponse]:
+    key = ("event", event_id)
+    version = await response_cache.version(owner_id)
+    response = await response_cache.get(owner_id, version, key)
+    if response is not None:
+        return response
+    event = await get_event_row(db, event_id, owner_id)
+    if event is None:
+        return None
+    return await response_cache.set(owner_id, version, key, orjson.dumps(event))
+
+async def _update_event_checked(
+    db: AsyncSession,
+    event_id: int,
+    owner_id: int,
+    update_data: dict,
+    expected_version: Optional[int],
+) -> Optional[Event]:
+    # Read-check-write for series, whose conflicts can't be expressed in SQL
+    result = await db.execute(
+        select(Event)
+        .where(and_(Event.id == event_id, Event.owner_id == owner_id))
+        .execution_options(populate_existing=True)
+    )
+    db_event = result.scalars().first()
+    
+    if db_event:
+        if expected_version is not None and db_event.version != expected_version:
+            raise EventVersionConflictException(db_event.version)
+        previous_range = (db_event.start_time, db_event.end_time)
+        was_series = db_event.recurrence_rule is not None
+        # Use existing times if not updated
+        start_time = update_data.get("start_time") or db_event.start_time
+        end_time = update_data.get("end_time") or db_event.end_time
+        recurrence_rule = update_data.get("recurrence_rule", db_event.recurrence_rule)
+        _validate_time_range(start_time, end_time)
+        update_data["recurrence_end"] = (
+            _series_end(recurrence_rule, start_time, end_time) if recurrence_rule else None
+        )
+        conflicting_ids = await find_conflicting_event_ids(
+            db, owner_id, start_time, end_time, event_id, recurrence_rule
+        )
+        if conflicting_ids:
+            raise EventConflictException(conflicting_ids)
+
+        if was_series and (
+            recurrence_rule != db_event.recurrence_rule
+            or start_time != db_event.start_time
+        ):
+            # Exceptions are keyed by generated starts, which no longer exist
+            await db.execute(
+                delete(EventException).where(EventException.event_id == event_id)
+            )
+
+        for key, value in update_data.items():
+            setattr(db_event, key, value)
+        
+        try:
+            # The flush is versioned, so a write in between is caught here
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            current = await db.scalar(select(Event.version).where(Event.id == event_id))
+            if current is None:
+                return None
+            raise EventVersionConflictException(current)
+        except IntegrityError:
+            await db.rollback()
+            await _raise_conflict(
+                db, owner_id, start_time, end_time, event_id, recurrence_rule
+            )
+        await db.refresh(db_event)
+        await _record_write(
+            owner_id,
+            previous_range,
+            (db_event.start_time, db_event.end_time),
+            series=was_series or recurrence_rule is not None,
+        )
+        _index_event(db_event.id, owner_id, db_event)
+        await _publish_change(db, "updated", db_event.id, owner_id)
+    
+    return db_event
+
+async def update_event(
+    db: AsyncSession, event_id: int, owner_id: int, event_data: EventUpdate
+) -> Optional[Event]:
+    update_data = event_data.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
+    for key in ("title", "start_time", "end_time"):
+        # Required columns: an explicit null means "leave as is"
+        if update_data.get(key, ...) is None:
+            del update_data[key]
+    if "recurrence_rule" in update_data:
+        return await _update_event_checked(
+            db, event_id, owner_id, update_data, expected_version
+        )
+
+    start_time = update_data.get("start_time")
+    end_time = update_data.get("end_time")
+    if (start_time is None) != (end_time is None):
+        # Half a new range: the other bound has to be read first
+        result = await db.execute(
+            select(Event.start_time, Event.end_time).where(
+                Event.id == event_id, Event.owner_id == owner_id
+            )
+        )
+        row = result.first()
+        if row is None:
+            return None
+        start_time = start_time or row.start_time
+        end_time = end_time or row.end_time
+
+    # The previous times come back alongside the new row, for cache invalidation
+    previous = (
+        select(Event.id, Event.start_time, Event.end_time)
+        .where(Event.id == event_id)
+        .subquery("previous")
+    )
+    conditions = [
+        Event.id == previous.c.id,
+        Event.owner_id == owner_id,
+        Event.recurrence_rule.is_(None),
+    ]
+    if expected_version is not None:
+        conditions.append(Event.version == expected_version)
+    values = {**update_data, "version": Event.version + 1}
+    if start_time is not None:
+        _validate_time_range(start_time, end_time)
+        values.update(start_time=start_time, end_time=end_time)
+        # Same guard as the insert, plus a coarse one refusing whenever a
+        # series could reach the new range; those go through the full check
+        conditions += [
+            ~exists(
+                select(Event.id)
+                .where(_overlap_filter(owner_id, start_time, end_time, event_id))
+                .correlate(None)
+            ),
+            ~exists(
+                select(Event.id)
+                .where(_series_filter([owner_id], start_time, end_time, event_id))
+                .correlate(None)
+            ),
+        ]
+
+    try:
+        result = await db.execute(
+            update(Event)
+            .where(*conditions)
+            .values(**values)
+            .returning(Event, previous.c.start_time, previous.c.end_time)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        row = None
+
+    if row is not None:
+        db_event, previous_start, previous_end = row
+        await _record_write(
+            owner_id,
+            (previous_start, previous_end),
+            (db_event.start_time, db_event.end_time),
+        )
+        _index_event(db_event.id, owner_id, db_event)
+        await _publish_change(db, "updated", db_event.id, owner_id)
+        return db_event
+
+    # Nothing was written; find out which condition refused it
+    result = await db.execute(
+        select(Event.version, Event.recurrence_rule).where(
+            Event.id == event_id, Event.owner_id == owner_id
+        )
+    )
+    current = result.first()
+    if current is None:
+        return None
+    if expected_version is not None and current.version != expected_version:
+        raise EventVersionConflictException(current.version)
+    if current.recurrence_rule is None and start_time is not None:
+        conflicting_ids = await find_conflicting_event_ids(
+            db, owner_id, start_time, end_time, event_id
+        )
+        if conflicting_ids:
+            raise EventConflictException(conflicting_ids)
+    return await _update_event_checked(
+        db, event_id, owner_id, update_data, expected_version
+    )
+
+async def delete_event(
+    db: AsyncSession,
+    event_id: int,
+    owner_id: int,
+    expected_version: Optional[int] = None,
+) -> bool:
+    conditions = [Event.id == event_id, Event.owner_id == owner_id]
+    if expected_version is not None:
+        conditions.append(Event.version == expected_version)
+    # Grants are revoked, and exceptions removed, here rather than left to ON
+    # DELETE CASCADE, which databases created without the foreign key never
+    # enforce; left behind, they would attach to an event that later reuses
+    # the id. On a miss all of it is rolled back.
+    recipient_ids = await revoke_all_event_permissions(db, event_id, owner_id)
+    await db.execute(
+        delete(EventException).where(
+            EventException.event_id.in_(select(Event.id).where(*conditions))
+        )
+    )
+    result = await db.execute(
+        delete(Event)
+        .where(*conditions)
+        .returning(Event.start_time, Event.end_time, Event.recurrence_rule)
+    )
+    row = result.first()
+    if row is None:
+        await db.rollback()
+    else:
+        await db.commit()
+    
+    if row is None:
+        if expected_version is not None:
+            current = await db.scalar(
+                select(Event.version).where(*conditions[:2])
+            )
+            if current is not None:
+                raise EventVersionConflictException(current)
+        return False
+
+    invalidate_event_acl(event_id)
+    search_index.remove(event_id)
+    await _record_write(
+        owner_id,
+        (row.start_time, row.end_time),
+        series=row.recurrence_rule is not None,
+    )
+    publish_event_change("deleted", event_id, recipient_ids, owner_id)
+    return True
+
+async def check_event_conflict(
+    db: AsyncSession,
+    owner_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_event_id: Optional[int] = None,
+    recurrence_rule: Optional[str] = None,
+) -> bool:
+    if start_time >= end_time:
+        return True
+    
+    conflicting_ids = await find_conflicting_event_ids(
+        db, owner_id, start_time, end_time, exclude_event_id, recurrence_rule
+    )
+    return bool(conflicting_ids)
+
+async def _touch_event(db: AsyncSession, event_id: int) -> None:
+    # Occurrence exceptions live in their own table; restamp the series so
+    # delta sync picks them up
+    await db.execute(
+        update(Event)
+        .where(Event.id == event_id)
+        .values(change_version=next_change_version())
+        .execution_options(synchronize_session=False)
+    )
+
+async def set_event_exception(
+    db: AsyncSession,
+    event_id: int,
+    owner_id: int,
+    exception_data: EventExceptionCreate,
+) -> Optional[EventException]:
+    db_event = await get_event(db, event_id, owner_id)
+    if db_event is None:
+        return None
+    if db_event.recurrence_rule is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only recurring events have occurrence exceptions",
+        )
+
+    duration = db_event.end_time - db_event.start_time
+    last_start = db_event.recurrence_end - duration if db_event.recurrence_end else None
+    original_start = exception_data.original_start
+    occurrence_starts = occurrence_starts_between(
+        parse_rule(db_event.recurrence_rule),
+        db_event.start_time,
+        duration,
+        original_start,
+        original_start + duration,
+        last_start,
+    )
+    if original_start not in occurrence_starts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="original_start is not an occurrence of this event",
+        )
+
+    values = exception_data.dict()
+    if not exception_data.is_cancelled and (
+        exception_data.start_time or exception_data.end_time
+    ):
+        start_time = exception_data.start_time or original_start
+        end_time = exception_data.end_time or start_time + duration
+        _validate_time_range(start_time, end_time)
+        conflicting_ids = await find_conflicting_event_ids(
+            db, owner_id, start_time, end_time, exclude_event_id=event_id
+        )
+        if conflicting_ids:
+            raise EventConflictException(conflicting_ids)
+        # Store both ends so window queries can match the moved occurrence
+        values.update(start_time=start_time, end_time=end_time)
+
+    result = await db.execute(
+        select(EventException).where(
+            EventException.event_id == event_id,
+            EventException.original_start == original_start,
+        )
+    )
+    db_exception = result.scalars().first()
+    if db_exception is None:
+        db_exception = EventException(event_id=event_id)
+        db.add(db_exception)
+    for key, value in values.items():
+        setattr(db_exception, key, value)
+    await _touch_event(db, event_id)
+
+    await db.commit()
+    await db.refresh(db_exception)
+    await _record_write(owner_id, series=True)
+    await _publish_change(db, "updated", event_id, owner_id)
+    return db_exception
+
+async def delete_event_exception(
+    db: AsyncSession, event_id: int, owner_id: int, original_start: datetime
+) -> bool:
+    result = await db.execute(
+        select(EventException)
+        .join(Event, EventException.event_id == Event.id)
+        .where(
+            Event.id == event_id,
+            Event.owner_id == owner_id,
+            EventException.original_start == original_start,
+        )
+    )
+    db_exception = result.scalars().first()
+    if db_exception is None:
+        return False
+    # The restored occurrence takes back its generated slot
+    db_event = await get_event(db, event_id, owner_id)
+    end_time = original_start + (db_event.end_time - db_event.start_time)
+    conflicting_ids = await find_conflicting_event_ids(
+        db, owner_id, original_start, end_time, exclude_event_id=event_id
+    )
+    if conflicting_ids:
+        raise EventConflictException(conflicting_ids)
+    await db.delete(db_exception)
+    await _touch_event(db, event_id)
+    await db.commit()
+    await _record_write(owner_id, series=True)
+    await _publish_change(db, "updated", event_id, owner_id)
+    return True
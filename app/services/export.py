@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy.future import select
+
+from app.database import async_session
+from app.models.event import Event
+
+EXPORT_COLUMNS = (
+    Event.id,
+    Event.title,
+    Event.description,
+    Event.start_time,
+    Event.end_time,
+    Event.location,
+    Event.owner_id,
+    Event.recurrence_rule,
+)
+EXPORT_FIELDNAMES = [column.key for column in EXPORT_COLUMNS]
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def _stream_event_rows(owner_id: int) -> AsyncIterator[Sequence[tuple]]:
+    # The response body outlives request-scoped dependencies, so the export
+    # owns its session. Plain column tuples off a server-side cursor keep the
+    # identity map empty and memory flat regardless of calendar size.
+    async with async_session() as db:
+        result = await db.stream(
+            select(*EXPORT_COLUMNS)
+            .where(Event.owner_id == owner_id)
+            .order_by(Event.start_time, Event.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+async def export_events_ndjson(owner_id: int) -> AsyncIterator[bytes]:
+    async for rows in _stream_event_rows(owner_id):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDNAMES, row)), default=_json_default) + "\n"
+            for row in rows
+        ).encode()
+
+
+async def export_events_csv(owner_id: int) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDNAMES)
+    async for rows in _stream_event_rows(owner_id):
+        writer.writerows(
+            [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in row
+            ]
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+EXPORTERS = {
+    "ndjson": export_events_ndjson,
+    "csv": export_events_csv,
+}
@@ -0,0 +1,175 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.models.event import Event, EventException
+from app.services.event import get_events, response_cache
+from app.services.recurrence import parse_rule
+from app.utils.cache import TTLCache
+from app.utils.pagination import encode_cursor
+
+FEED_PAGE_SIZE = 1000
+# DTSTAMP is the event's own modification time, so re-rendered bodies (and
+# therefore ETags) stay identical across workers; rows that predate the
+# timestamp columns fall back to a fixed one
+FEED_DTSTAMP = "19700101T000000Z"
+
+# Rendered feeds keyed by owner: (owner version, etag, body). The version is
+# the response cache's, so with a Redis store writes made by any worker
+# retire the entry here too
+feed_cache = TTLCache(
+    maxsize=settings.FEED_CACHE_SIZE,
+    ttl=settings.FEED_CACHE_TTL_SECONDS,
+)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # RFC 5545: content lines are at most 75 octets, continued with a space
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts)
+
+
+def _format_datetime(value: datetime) -> str:
+    # Stored times are naive UTC, so they go out as UTC rather than floating
+    # times each client would read in its own zone
+    return value.strftime("%Y%m%dT%H%M%S") + "Z"
+
+
+def _format_dtstamp(event: Event) -> str:
+    stamp = event.updated_at or event.created_at
+    if stamp is None:
+        return FEED_DTSTAMP
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone(timezone.utc)
+    return _format_datetime(stamp)
+
+
+def _format_rule(rule: str) -> str:
+    # RFC 5545 wants UNTIL in UTC when DTSTART is; a date-only or floating
+    # UNTIL is written as the moment the series is expanded up to
+    rule = rule.upper().removeprefix("RRULE:")
+    until = parse_rule(rule).until
+    if until is None:
+        return rule
+    return re.sub(r"UNTIL=[^;]*", "UNTIL=" + _format_datetime(until), rule)
+
+
+def _render_vevent(
+    event: Event, exception: Optional[EventException] = None
+) -> List[str]:
+    start_time, end_time = event.start_time, event.end_time
+    title, description, location = event.title, event.description, event.location
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.id}@event-manager",
+        f"DTSTAMP:{_format_dtstamp(event)}",
+    ]
+    if exception is not None:
+        # An overridden occurrence shares the series UID
+        lines.append(f"RECURRENCE-ID:{_format_datetime(exception.original_start)}")
+        start_time = exception.start_time or exception.original_start
+        end_time = exception.end_time or start_time + (event.end_time - event.start_time)
+        title = exception.title or title
+        description = exception.description or description
+        location = exception.location or location
+    lines += [
+        f"DTSTART:{_format_datetime(start_time)}",
+        f"DTEND:{_format_datetime(end_time)}",
+        f"SUMMARY:{_escape(title)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    return lines
+
+
+def render_ics(
+    events: List[Event],
+    exceptions: Optional[Dict[int, List[EventException]]] = None,
+) -> str:
+    exceptions = exceptions or {}
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Event Manager API//EN",
+        "CALSCALE:GREGORIAN",
+    ]
+    for event in events:
+        lines += _render_vevent(event)
+        overrides = []
+        if event.recurrence_rule:
+            # Clients expand the rule themselves; only exceptions are listed
+            lines.append("RRULE:" + _format_rule(event.recurrence_rule))
+            for exception in exceptions.get(event.id, []):
+                if exception.is_cancelled:
+                    lines.append(f"EXDATE:{_format_datetime(exception.original_start)}")
+                else:
+                    overrides.append(exception)
+        lines.append("END:VEVENT")
+        for exception in overrides:
+            lines += _render_vevent(event, exception)
+            lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+async def get_feed(db: AsyncSession, owner_id: int) -> Tuple[str, bytes]:
+    version = await response_cache.version(owner_id)
+    entry = feed_cache.get(owner_id)
+    if entry is not None and entry[0] == version:
+        return entry[1], entry[2]
+
+    events: List[Event] = []
+    cursor = None
+    while True:
+        page = await get_events(db, owner_id, limit=FEED_PAGE_SIZE, cursor=cursor)
+        events.extend(page)
+        if len(page) < FEED_PAGE_SIZE:
+            break
+        last = page[-1]
+        cursor = encode_cursor(last.start_time, last.id)
+
+    exceptions: Dict[int, List[EventException]] = {}
+    series_ids = [event.id for event in events if event.recurrence_rule]
+    if series_ids:
+        result = await db.execute(
+            select(EventException)
+            .where(EventException.event_id.in_(series_ids))
+            .order_by(EventException.original_start)
+        )
+        for exception in result.scalars().all():
+            exceptions.setdefault(exception.event_id, []).append(exception)
+
+    body = render_ics(events, exceptions).encode()
+    # The ETag hashes the body so it stays valid across workers
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    feed_cache.set(owner_id, (version, etag, body))
+    return etag, body
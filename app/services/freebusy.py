@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.models.event import Event
+from app.models.permission import UserPermission
+from app.schemas.freebusy import FreeBusyOut, FreeBusyRequest, TimeInterval
+from app.services.event import expand_series, load_series
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    # Expects intervals sorted by start; touching intervals are merged
+    merged: List[Interval] = []
+    for start_time, end_time in intervals:
+        if merged and start_time <= merged[-1][1]:
+            if end_time > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end_time)
+        else:
+            merged.append((start_time, end_time))
+    return merged
+
+
+def free_slots(
+    busy: List[Interval],
+    window_start: datetime,
+    window_end: datetime,
+    min_duration: timedelta,
+) -> List[Interval]:
+    slots = []
+    cursor = window_start
+    for start_time, end_time in busy:
+        if start_time - cursor >= min_duration:
+            slots.append((cursor, start_time))
+        cursor = max(cursor, end_time)
+    if window_end - cursor >= min_duration:
+        slots.append((cursor, window_end))
+    return slots
+
+
+
+async def _visible_users(db: AsyncSession, user_id: int, user_ids: List[int]) -> Set[int]:
+    # The caller, plus anyone sharing an event with them in either direction
+    others = [other for other in user_ids if other != user_id]
+    if not others:
+        return {user_id}
+    result = await db.execute(
+        union(
+            select(Event.owner_id)
+            .join(UserPermission, UserPermission.event_id == Event.id)
+            .where(UserPermission.user_id == user_id, Event.owner_id.in_(others)),
+            select(UserPermission.user_id)
+            .join(Event, Event.id == UserPermission.event_id)
+            .where(Event.owner_id == user_id, UserPermission.user_id.in_(others)),
+        )
+    )
+    return {user_id, *result.scalars()}
+
+
+async def get_free_busy(
+    db: AsyncSession, request: FreeBusyRequest, user_id: int
+) -> FreeBusyOut:
+    if request.start >= request.end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'start' must be before 'end'",
+        )
+    if request.end - request.start > timedelta(days=settings.RANGE_QUERY_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Window may span at most {settings.RANGE_QUERY_MAX_DAYS} days",
+        )
+    user_ids = sorted(set(request.user_ids))
+    if len(user_ids) > settings.FREEBUSY_MAX_USERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.FREEBUSY_MAX_USERS} users per request",
+        )
+    hidden = set(user_ids) - await _visible_users(db, user_id, user_ids)
+    if hidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Free/busy is only available for yourself and users you share events with",
+        )
+
+    # Every user's single events in one query, already in sweep order; only
+    # times are selected since free/busy never exposes event details
+    result = await db.execute(
+        select(Event.start_time, Event.end_time)
+        .where(
+            and_(
+                Event.owner_id.in_(user_ids),
+                Event.end_time > request.start,
+                Event.start_time < request.end,
+                Event.recurrence_rule.is_(None),
+            )
+        )
+        .order_by(Event.start_time)
+    )
+    intervals = result.all()
+    series = await load_series(db, user_ids, request.start, request.end)
+    if series:
+        occurrences = await expand_series(db, series, request.start, request.end)
+        intervals = sorted(
+            list(intervals)
+            + [(occurrence.start_time, occurrence.end_time) for occurrence in occurrences]
+        )
+    busy = [
+        (max(start_time, request.start), min(end_time, request.end))
+        for start_time, end_time in merge_intervals(intervals)
+    ]
+    free = free_slots(
+        busy,
+        request.start,
+        request.end,
+        timedelta(minutes=request.min_duration_minutes),
+    )
+    return FreeBusyOut(
+        busy=[TimeInterval(start=start, end=end) for start, end in busy],
+        free=[TimeInterval(start=start, end=end) for start, end in free],
+    )
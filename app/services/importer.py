@@ -0,0 +1,458 @@
+import asyncio
+import csv
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+
+from app.config import settings
+from app.database import async_session
+from app.schemas.event import EventCreate, EventExceptionCreate, EventImportStatus
+from app.services.event import create_event, create_events_batch, set_event_exception
+from app.utils.exceptions import EventConflictException
+
+MAX_REPORTED_ERRORS = 100
+MAX_FINISHED_JOBS = 1000
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+_DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+_ICS_ESCAPES = {"n": "\n", "N": "\n", ",": ",", ";": ";", "\\": "\\"}
+
+
+class ImportJob:
+    def __init__(self, owner_id: int, import_format: str, path: str, total_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.format = import_format
+        self.path = path
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.status = "pending"
+        self.processed = 0
+        self.created = 0
+        self.conflicts = 0
+        self.invalid = 0
+        self.errors: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def record_error(self, message: str) -> None:
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_status(self) -> EventImportStatus:
+        return EventImportStatus(
+            id=self.id,
+            status=self.status,
+            format=self.format,
+            bytes_read=self.bytes_read,
+            total_bytes=self.total_bytes,
+            processed=self.processed,
+            created=self.created,
+            conflicts=self.conflicts,
+            invalid=self.invalid,
+            errors=self.errors,
+        )
+
+
+# Jobs live in the worker that accepted the upload, so GET and DELETE
+# /events/import/{job_id} only find them there: run a single worker, or route a
+# user's requests to the same one, when imports are used
+import_jobs: Dict[str, ImportJob] = {}
+# The upload request only spools the file; the work happens here, so this is
+# what bounds it
+_running_imports = asyncio.Semaphore(settings.IMPORT_MAX_RUNNING_JOBS)
+
+
+def _read_lines(job: ImportJob, stream: BinaryIO) -> Iterator[str]:
+    for index, raw in enumerate(stream):
+        job.bytes_read += len(raw)
+        line = raw.decode("utf-8", errors="replace")
+        if index == 0:
+            line = line.lstrip("\ufeff")
+        yield line
+
+
+def _unfold_ics(lines: Iterable[str]) -> Iterator[str]:
+    # RFC 5545 folds long lines by starting continuations with a space or tab
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split_content_line(line: str):
+    in_quotes = False
+    for position, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:position], line[position + 1:]
+            name, *raw_params = head.split(";")
+            params = {}
+            for param in raw_params:
+                key, _, param_value = param.partition("=")
+                params[key.upper()] = param_value.strip('"')
+            return name.upper(), params, value
+    return None, {}, line
+
+
+def _unescape_ics(value: str) -> str:
+    return re.sub(r"\\(.)", lambda match: _ICS_ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def _parse_ics_datetime(value: str, params: Dict[str, str]) -> datetime:
+    # Stored times are naive; UTC and TZID-qualified values are normalised to
+    # naive UTC and floating times are kept as written
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.combine(date(int(value[:4]), int(value[4:6]), int(value[6:8])), datetime.min.time())
+    moment = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return moment
+    if "TZID" in params:
+        try:
+            zone = ZoneInfo(params["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            return moment
+        return moment.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _parse_ics_duration(value: str) -> timedelta:
+    match = _DURATION.match(value)
+    if not match:
+        raise ValueError(f"Unsupported duration {value!r}")
+    parts = {key: int(amount or 0) for key, amount in match.groupdict().items() if key != "sign"}
+    duration = timedelta(**parts)
+    return -duration if match.group("sign") == "-" else duration
+
+
+def _ics_event_to_row(properties: Dict[str, tuple], exdates: List[tuple]) -> dict:
+    if "DTSTART" not in properties:
+        raise ValueError("VEVENT has no DTSTART")
+    start_params, start_value = properties["DTSTART"]
+    start_time = _parse_ics_datetime(start_value, start_params)
+    if "DTEND" in properties:
+        end_params, end_value = properties["DTEND"]
+        end_time = _parse_ics_datetime(end_value, end_params)
+    elif "DURATION" in properties:
+        end_time = start_time + _parse_ics_duration(properties["DURATION"][1])
+    elif start_params.get("VALUE") == "DATE" or len(start_value) == 8:
+        end_time = start_time + timedelta(days=1)
+    else:
+        end_time = start_time
+
+    def text(name: str, limit: int) -> Optional[str]:
+        if name not in properties:
+            return None
+        return _unescape_ics(properties[name][1])[:limit] or None
+
+    recurrence_id = None
+    if "RECURRENCE-ID" in properties:
+        # An overridden occurrence of the series sharing its UID
+        id_params, id_value = properties["RECURRENCE-ID"]
+        recurrence_id = _parse_ics_datetime(id_value, id_params)
+    return {
+        "title": text("SUMMARY", 100) or (None if recurrence_id else "Untitled event"),
+        "description": text("DESCRIPTION", 500),
+        "location": text("LOCATION", 100),
+        "start_time": start_time,
+        "end_time": end_time,
+        "recurrence_rule": properties["RRULE"][1] if "RRULE" in properties else None,
+        "uid": properties["UID"][1] if "UID" in properties else None,
+        "recurrence_id": recurrence_id,
+        "exdates": [
+            _parse_ics_datetime(value, params)
+            for params, values in exdates
+            for value in values.split(",")
+        ],
+    }
+
+
+def parse_ics(lines: Iterable[str]) -> Iterator[dict]:
+    properties: Optional[Dict[str, tuple]] = None
+    exdates: List[tuple] = []
+    nested = 0
+    for line in _unfold_ics(lines):
+        name, params, value = _split_content_line(line)
+        if name == "BEGIN":
+            if value.upper() == "VEVENT" and properties is None:
+                properties, exdates = {}, []
+            elif properties is not None:
+                # VALARM and friends carry their own SUMMARY/DESCRIPTION
+                nested += 1
+        elif name == "END":
+            if properties is None:
+                continue
+            if nested:
+                nested -= 1
+            elif value.upper() == "VEVENT":
+                try:
+                    yield _ics_event_to_row(properties, exdates)
+                except ValueError as exc:
+                    yield {"error": str(exc)}
+                properties = None
+        elif properties is not None and not nested and name:
+            # EXDATE may repeat; everything else keeps its first value
+            if name == "EXDATE":
+                exdates.append((params, value))
+            else:
+                properties.setdefault(name, (params, value))
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[dict]:
+    # Same columns as GET /events/export?format=csv; extra columns are ignored
+    for row in csv.DictReader(lines):
+        yield {
+            "title": (row.get("title") or "Untitled event")[:100],
+            "description": (row.get("description") or None),
+            "location": (row.get("location") or None),
+            "start_time": row.get("start_time"),
+            "end_time": row.get("end_time"),
+            "recurrence_rule": (row.get("recurrence_rule") or None),
+        }
+
+
+PARSERS = {
+    "ics": parse_ics,
+    "csv": parse_csv,
+}
+
+
+async def _import_chunk(
+    job: ImportJob, chunk: List[EventCreate], entry_numbers: List[int]
+) -> None:
+    async with async_session() as db:
+        try:
+            result = await create_events_batch(db, chunk, job.owner_id)
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_409_CONFLICT:
+                raise
+            # A concurrent write moved the goalposts; re-read and retry once
+            result = await create_events_batch(db, chunk, job.owner_id)
+    job.created += result.created
+    for item in result.results:
+        if item.status == "conflict":
+            job.conflicts += 1
+        elif item.status == "invalid":
+            job.invalid += 1
+            job.record_error(f"Entry {entry_numbers[item.index]}: {item.detail}")
+    job.processed += len(chunk)
+
+
+async def _import_series(
+    job: ImportJob, event_data: EventCreate, exdates: List[datetime], entry_number: int
+) -> Optional[int]:
+    # Series are conflict-checked against the rule, which the batch sweep can't do
+    async with async_session() as db:
+        try:
+            db_event = await create_event(db, event_data, job.owner_id)
+            job.created += 1
+        except EventConflictException:
+            job.conflicts += 1
+            db_event = None
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_400_BAD_REQUEST or not isinstance(exc.detail, str):
+                raise
+            job.invalid += 1
+            job.record_error(f"Entry {entry_number}: {exc.detail}")
+            db_event = None
+        job.processed += 1
+        if db_event is None:
+            return None
+        event_id = db_event.id
+        for original_start in exdates:
+            try:
+                await set_event_exception(
+                    db,
+                    event_id,
+                    job.owner_id,
+                    EventExceptionCreate(original_start=original_start, is_cancelled=True),
+                )
+            except HTTPException:
+                # An EXDATE that isn't an occurrence excludes nothing
+                await db.rollback()
+    return event_id
+
+
+async def _import_override(
+    job: ImportJob, event_id: Optional[int], exception_data: EventExceptionCreate, entry_number: int
+) -> None:
+    job.processed += 1
+    if event_id is None:
+        job.invalid += 1
+        job.record_error(f"Entry {entry_number}: RECURRENCE-ID of a series this import didn't create")
+        return
+    async with async_session() as db:
+        try:
+            await set_event_exception(db, event_id, job.owner_id, exception_data)
+        except EventConflictException:
+            job.conflicts += 1
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_400_BAD_REQUEST or not isinstance(exc.detail, str):
+                raise
+            job.invalid += 1
+            job.record_error(f"Entry {entry_number}: {exc.detail}")
+
+
+def _validate_row(row: dict) -> Tuple[Union[EventCreate, EventExceptionCreate], List[datetime]]:
+    if "error" in row:
+        raise ValueError(row["error"])
+    row.pop("uid", None)
+    exdates = row.pop("exdates", None) or []
+    recurrence_id = row.pop("recurrence_id", None)
+    if recurrence_id is not None:
+        row.pop("recurrence_rule", None)
+        return EventExceptionCreate(original_start=recurrence_id, **row), []
+    return EventCreate(**row), exdates
+
+
+def _read_entries(job: ImportJob, rows: Iterator[Tuple[int, dict]]) -> Optional[List[tuple]]:
+    # Reading, parsing and validating are blocking work, so they run in a
+    # thread a chunk at a time; None once the file is exhausted
+    entries = []
+    consumed = 0
+    for entry_number, row in rows:
+        consumed += 1
+        uid = row.get("uid")
+        try:
+            event_data, exdates = _validate_row(row)
+        except ValidationError as exc:
+            job.processed += 1
+            job.invalid += 1
+            job.record_error(f"Entry {entry_number}: {exc.errors()[0]['msg']}")
+        except ValueError as exc:
+            job.processed += 1
+            job.invalid += 1
+            job.record_error(f"Entry {entry_number}: {exc}")
+        else:
+            entries.append((entry_number, uid, event_data, exdates))
+        if consumed >= settings.IMPORT_CHUNK_SIZE:
+            break
+    return entries if consumed else None
+
+
+async def _run_import(job: ImportJob) -> None:
+    async with _running_imports:
+        await _import_file(job)
+
+
+async def _import_file(job: ImportJob) -> None:
+    job.status = "running"
+    try:
+        with open(job.path, "rb") as stream:
+            rows = enumerate(PARSERS[job.format](_read_lines(job, stream)), start=1)
+            # Series created so far by UID, for the overridden occurrences that
+            # follow them; overrides seen before their series wait for the end
+            series_ids: Dict[str, Optional[int]] = {}
+            pending_overrides = []
+            while (entries := await asyncio.to_thread(_read_entries, job, rows)) is not None:
+                chunk: List[EventCreate] = []
+                entry_numbers: List[int] = []
+                for entry_number, uid, event_data, exdates in entries:
+                    if isinstance(event_data, EventExceptionCreate):
+                        if uid in series_ids:
+                            await _import_override(job, series_ids[uid], event_data, entry_number)
+                        else:
+                            pending_overrides.append((entry_number, uid, event_data))
+                    elif event_data.recurrence_rule:
+                        event_id = await _import_series(job, event_data, exdates, entry_number)
+                        if uid is not None:
+                            series_ids[uid] = event_id
+                    else:
+                        chunk.append(event_data)
+                        entry_numbers.append(entry_number)
+                if chunk:
+                    await _import_chunk(job, chunk, entry_numbers)
+            for entry_number, uid, event_data in pending_overrides:
+                await _import_override(job, series_ids.get(uid), event_data, entry_number)
+        job.status = "completed"
+    except asyncio.CancelledError:
+        # Chunks committed before cancellation are kept
+        job.status = "cancelled"
+        raise
+    except Exception as exc:
+        job.status = "failed"
+        job.record_error(str(getattr(exc, "detail", exc)))
+
+
+def _finish_import(job: ImportJob, task: asyncio.Task) -> None:
+    # Runs even when the task is cancelled before it ever started
+    job.task = None
+    if task.cancelled() and job.status in ("pending", "running"):
+        job.status = "cancelled"
+    if os.path.exists(job.path):
+        os.unlink(job.path)
+
+
+def detect_import_format(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if extension in ("ics", "ical", "ifb", "icalendar"):
+        return "ics"
+    if extension == "csv":
+        return "csv"
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Cannot tell the file format, pass format=ics or format=csv",
+    )
+
+
+def _spool(source: BinaryIO) -> str:
+    descriptor, path = tempfile.mkstemp(prefix="event-import-")
+    with os.fdopen(descriptor, "wb") as target:
+        shutil.copyfileobj(source, target, UPLOAD_CHUNK_BYTES)
+    return path
+
+
+async def spool_upload(upload: UploadFile) -> str:
+    # The upload is closed with the request, so copy it (in bounded chunks, off
+    # the event loop) somewhere the background import can read it from
+    return await asyncio.to_thread(_spool, upload.file)
+
+
+def _prune_finished_jobs() -> None:
+    finished = [job_id for job_id, job in import_jobs.items() if job.task is None]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del import_jobs[job_id]
+
+
+def start_import(owner_id: int, import_format: str, path: str) -> ImportJob:
+    _prune_finished_jobs()
+    job = ImportJob(owner_id, import_format, path, os.path.getsize(path))
+    import_jobs[job.id] = job
+    job.task = asyncio.create_task(_run_import(job))
+    job.task.add_done_callback(lambda task: _finish_import(job, task))
+    return job
+
+
+def get_import_job(job_id: str, owner_id: int) -> ImportJob:
+    job = import_jobs.get(job_id)
+    if job is None or job.owner_id != owner_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found",
+        )
+    return job
+
+
+def cancel_import(job_id: str, owner_id: int) -> ImportJob:
+    job = get_import_job(job_id, owner_id)
+    if job.task is not None:
+        job.task.cancel()
+    return job
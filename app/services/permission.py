@@ -1,80 +1,244 @@
-from typing import List
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import and_
-
-from app.models.permission import Permission, UserPermission
-from app.schemas.permission import PermissionOut
-
-async def share_event(
-    db: AsyncSession, event_id: int, user_id: int, permission_name: str
-) -> PermissionOut:
-    # Check if permission exists
-    result = await db.execute(
-        select(Permission).where(Permission.name == permission_name)
-    )
-    permission = result.scalars().first()
-    
-    if not permission:
-        # Create permission if it doesn't exist
-        permission = Permission(name=permission_name, description=None)
-        db.add(permission)
-        await db.commit()
-        await db.refresh(permission)
-    
-    # Check if user already has this permission on this event
-    result = await db.execute(
-        select(UserPermission).where(
-            and_(
-                UserPermission.user_id == user_id,
-                UserPermission.permission_id == permission.id,
-                UserPermission.event_id == event_id,
-            )
-        )
-    )
-    existing_permission = result.scalars().first()
-    
-    if existing_permission:
-        return PermissionOut.from_orm(permission)
-    
-    # Create new permission for this user on this event
-    user_permission = UserPermission(
-        user_id=user_id,
-        permission_id=permission.id,
-        event_id=event_id,
-    )
-    db.add(user_permission)
-    await db.commit()
-    
-    return PermissionOut.from_orm(permission)
-
-async def get_event_permissions(
-    db: AsyncSession, event_id: int
-) -> List[PermissionOut]:
-    result = await db.execute(
-        select(Permission)
-        .join(UserPermission, Permission.id == UserPermission.permission_id)
-        .where(UserPermission.event_id == event_id)
-    )
-    permissions = result.scalars().all()
-    return [PermissionOut.from_orm(p) for p in permissions]
-
-async def revoke_event_permission(
-    db: AsyncSession, event_id: int, user_id: int, permission_name: str
-) -> None:
-    result = await db.execute(
-        select(UserPermission)
-        .join(Permission, UserPermission.permission_id == Permission.id)
-        .where(
-            and_(
-                UserPermission.user_id == user_id,
-                UserPermission.event_id == event_id,
-                Permission.name == permission_name
-            )
-        )
-    )
-    user_permission = result.scalars().first()
-    
-    if user_permission:
-        await db.delete(user_permission)
-        await db.commit()
+from typing import Dict, List, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import and_, case, delete, distinct, func, insert, literal, tuple_, union, update
+
+from app.config import settings
+from app.models.event import Event
+from app.models.permission import Permission, UserPermission
+from app.models.sync import SyncTombstone, next_change_version
+from app.schemas.permission import BulkShareResult, PermissionOut, ShareGrant
+from app.services.stream import publish_event_change
+from app.utils.cache import TTLCache
+
+# Each grantable permission owns one bit of an ACL mask
+PERMISSION_BITS = {"read": 1, "write": 2, "share": 4}
+OWNER_BIT = 1 << 7
+OWNER_MASK = OWNER_BIT | sum(PERMISSION_BITS.values())
+
+# Filled once at startup so requests never look permissions up by name
+interned_permissions: Dict[str, PermissionOut] = {}
+_permission_bits_by_id: Dict[int, int] = {}
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# ACL mask per (event_id, user_id)
+acl_cache = TTLCache(
+    maxsize=settings.ACL_CACHE_SIZE,
+    ttl=settings.ACL_CACHE_TTL_SECONDS,
+)
+
+async def intern_permissions(db: AsyncSession) -> None:
+    result = await db.execute(
+        select(Permission).where(Permission.name.in_(list(PERMISSION_BITS)))
+    )
+    permissions = {permission.name: permission for permission in result.scalars().all()}
+    missing = [name for name in PERMISSION_BITS if name not in permissions]
+    if missing:
+        for name in missing:
+            permissions[name] = Permission(name=name, description=None)
+            db.add(permissions[name])
+        await db.commit()
+    for name, permission in permissions.items():
+        interned_permissions[name] = PermissionOut.from_orm(permission)
+        _permission_bits_by_id[permission.id] = PERMISSION_BITS[name]
+
+def get_interned_permission(permission_name: str) -> PermissionOut:
+    permission = interned_permissions.get(permission_name)
+    if permission is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown permission, use one of: {', '.join(PERMISSION_BITS)}",
+        )
+    return permission
+
+def permission_names(mask: int) -> List[str]:
+    names = [name for name, bit in PERMISSION_BITS.items() if mask & bit]
+    return ["owner"] + names if mask & OWNER_BIT else names
+
+def grant_mask_column(permission_id_column):
+    # SQL mirror of the interned bit table, aggregated per event
+    return func.sum(
+        distinct(case(_permission_bits_by_id, value=permission_id_column, else_=0))
+    )
+
+def invalidate_event_acl(event_id: int) -> None:
+    acl_cache.invalidate_tag(event_id)
+
+async def get_access_mask(db: AsyncSession, event_id: int, user_id: int) -> int:
+    """What user_id may do on event_id; 0 when the event is missing or hidden."""
+    mask = acl_cache.get((event_id, user_id))
+    if mask is not None:
+        return mask
+
+    # Ownership and every grant in one round trip
+    result = await db.execute(
+        select(Event.owner_id, UserPermission.permission_id)
+        .outerjoin(
+            UserPermission,
+            and_(
+                UserPermission.event_id == Event.id,
+                UserPermission.user_id == user_id,
+            ),
+        )
+        .where(Event.id == event_id)
+    )
+    rows = result.all()
+    if not rows:
+        # Not cached: the id may belong to an event created later
+        return 0
+    mask = 0
+    for owner_id, permission_id in rows:
+        if owner_id == user_id:
+            mask = OWNER_MASK
+            break
+        mask |= _permission_bits_by_id.get(permission_id, 0)
+    acl_cache.set((event_id, user_id), mask, tags=(event_id,))
+    return mask
+
+def _resolve_grants(grants: List[ShareGrant]) -> List[Tuple[int, int]]:
+    if len(grants) > settings.SHARE_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.SHARE_BULK_MAX_ITEMS} grants per request",
+        )
+    # Duplicates collapse here rather than in the database
+    return sorted({
+        (grant.user_id, get_interned_permission(grant.permission).id)
+        for grant in grants
+    })
+
+def _forget_acls(event_id: int, user_ids) -> None:
+    for user_id in set(user_ids):
+        acl_cache.pop((event_id, user_id))
+
+async def _record_revocations(
+    db: AsyncSession, event_id: int, revoked=None, notify: Tuple[int, ...] = ()
+) -> List[int]:
+    # Runs before the grants matching `revoked` (all of them when None) are
+    # deleted: on SQLite the next change version is one past the highest
+    # stored, which the doomed rows may hold. Grantees left with other grants
+    # see those bumped; the rest, and anyone in `notify`, get a tombstone.
+    # Either way the change reaches their next delta sync.
+    on_event = UserPermission.event_id == event_id
+    losing_all = select(UserPermission.user_id.label("user_id")).where(on_event)
+    if revoked is not None:
+        losing_all = losing_all.group_by(UserPermission.user_id).having(
+            func.count(case((revoked, 1))) == func.count()
+        )
+    recipients = union(
+        losing_all, *(select(literal(user_id).label("user_id")) for user_id in notify)
+    ).subquery()
+    result = await db.execute(
+        insert(SyncTombstone)
+        .from_select(
+            ["user_id", "event_id"],
+            select(recipients.c.user_id, literal(event_id)),
+        )
+        .returning(SyncTombstone.user_id)
+    )
+    tombstoned = result.scalars().all()
+    if revoked is not None:
+        await db.execute(
+            update(UserPermission)
+            .where(
+                on_event,
+                ~revoked,
+                UserPermission.user_id.in_(select(UserPermission.user_id).where(on_event, revoked)),
+            )
+            .values(change_version=next_change_version())
+        )
+    return tombstoned
+
+async def share_event_bulk(
+    db: AsyncSession, event_id: int, grants: List[ShareGrant]
+) -> BulkShareResult:
+    pairs = _resolve_grants(grants)
+    insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+    # One statement; grants that already exist are skipped by the unique constraint
+    # and left out of RETURNING
+    statement = (
+        insert(UserPermission)
+        .values([
+            {"user_id": user_id, "permission_id": permission_id, "event_id": event_id}
+            for user_id, permission_id in pairs
+        ])
+        .on_conflict_do_nothing(
+            index_elements=["user_id", "permission_id", "event_id"]
+        )
+        .returning(UserPermission.user_id)
+    )
+    try:
+        result = await db.execute(statement)
+        granted = result.scalars().all()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One or more users do not exist",
+        )
+    _forget_acls(event_id, (user_id for user_id, _ in pairs))
+    publish_event_change("shared", event_id, granted)
+    return BulkShareResult(requested=len(grants), changed=len(granted))
+
+async def revoke_event_permissions_bulk(
+    db: AsyncSession, event_id: int, grants: List[ShareGrant]
+) -> BulkShareResult:
+    pairs = _resolve_grants(grants)
+    matching = tuple_(UserPermission.user_id, UserPermission.permission_id).in_(pairs)
+    await _record_revocations(db, event_id, matching)
+    result = await db.execute(
+        delete(UserPermission)
+        .where(UserPermission.event_id == event_id, matching)
+        .returning(UserPermission.user_id)
+    )
+    revoked = result.scalars().all()
+    await db.commit()
+    _forget_acls(event_id, (user_id for user_id, _ in pairs))
+    publish_event_change("unshared", event_id, revoked)
+    return BulkShareResult(requested=len(grants), changed=len(revoked))
+
+async def revoke_all_event_permissions(
+    db: AsyncSession, event_id: int, owner_id: int
+) -> List[int]:
+    """Revoke every grant on an event being deleted, in the caller's
+    transaction. The owner and each grantee get a tombstone; returns them."""
+    recipients = await _record_revocations(db, event_id, notify=(owner_id,))
+    await db.execute(delete(UserPermission).where(UserPermission.event_id == event_id))
+    return recipients
+
+async def share_event(
+    db: AsyncSession, event_id: int, user_id: int, permission_name: str
+) -> PermissionOut:
+    # A bulk share of one: a single idempotent insert
+    await share_event_bulk(
+        db, event_id, [ShareGrant(user_id=user_id, permission=permission_name)]
+    )
+    return get_interned_permission(permission_name)
+
+async def get_event_permissions(
+    db: AsyncSession, event_id: int
+) -> List[PermissionOut]:
+    result = await db.execute(
+        select(Permission)
+        .join(UserPermission, Permission.id == UserPermission.permission_id)
+        .where(UserPermission.event_id == event_id)
+    )
+    permissions = result.scalars().all()
+    return [PermissionOut.from_orm(p) for p in permissions]
+
+async def revoke_event_permission(
+    db: AsyncSession, event_id: int, user_id: int, permission_name: str
+) -> None:
+    # A bulk revoke of one, so delta sync bookkeeping lives in one place
+    await revoke_event_permissions_bulk(
+        db, event_id, [ShareGrant(user_id=user_id, permission=permission_name)]
+    )
@@ -0,0 +1,204 @@
+import calendar
+import math
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_COUNT = 10000
+# Far enough for any calendar, early enough that date arithmetic can't overflow
+SERIES_HORIZON = datetime(9000, 1, 1)
+
+
+class RecurrenceRule(NamedTuple):
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    by_day: Tuple[int, ...] = ()
+
+
+def _invalid_rule(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unsupported recurrence rule: {detail}",
+    )
+
+
+def _parse_until(value: str) -> datetime:
+    value = value.rstrip("Z")
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise _invalid_rule(f"UNTIL={value}")
+
+
+def parse_rule(rule: str) -> RecurrenceRule:
+    """Parse the RFC 5545 RRULE subset we store: FREQ, INTERVAL, COUNT, UNTIL
+    and, for weekly rules, BYDAY."""
+    parts: Dict[str, str] = {}
+    for part in rule.upper().removeprefix("RRULE:").split(";"):
+        key, separator, value = part.partition("=")
+        if not separator or not value:
+            raise _invalid_rule(part or "empty")
+        parts[key] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise _invalid_rule(f"FREQ={freq}")
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+        count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+    except ValueError:
+        raise _invalid_rule("INTERVAL and COUNT must be integers")
+    if interval < 1 or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise _invalid_rule(f"INTERVAL must be positive and COUNT at most {MAX_COUNT}")
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if count is not None and until is not None:
+        raise _invalid_rule("COUNT and UNTIL are mutually exclusive")
+
+    by_day: Tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise _invalid_rule("BYDAY is only supported with FREQ=WEEKLY")
+        try:
+            by_day = tuple(sorted({WEEKDAYS.index(day) for day in parts.pop("BYDAY").split(",")}))
+        except ValueError:
+            raise _invalid_rule("BYDAY must list MO,TU,WE,TH,FR,SA,SU")
+    if parts:
+        raise _invalid_rule(", ".join(sorted(parts)))
+    return RecurrenceRule(freq, interval, count, until, by_day)
+
+
+def _add_months(moment: datetime, months: int) -> Optional[datetime]:
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    if moment.day > calendar.monthrange(year, month)[1]:
+        # RFC 5545: a 31st (or Feb 29th) that doesn't exist is skipped
+        return None
+    return moment.replace(year=year, month=month)
+
+
+def _occurrence_starts(
+    rule: RecurrenceRule, dtstart: datetime, after: datetime
+) -> Iterator[datetime]:
+    # Jumps straight to the period containing `after`, so the cost of reaching
+    # a window doesn't depend on how far the series already ran
+    if rule.freq == "DAILY" or (rule.freq == "WEEKLY" and not rule.by_day):
+        step = timedelta(days=rule.interval * (7 if rule.freq == "WEEKLY" else 1))
+        index = max(0, (after - dtstart) // step) if after > dtstart else 0
+        while True:
+            yield dtstart + index * step
+            index += 1
+
+    elif rule.freq == "WEEKLY":
+        week_start = dtstart - timedelta(days=dtstart.weekday())
+        step = timedelta(weeks=rule.interval)
+        index = max(0, (after - week_start) // step - 1) if after > week_start else 0
+        while True:
+            period = week_start + index * step
+            for weekday in rule.by_day:
+                moment = period + timedelta(days=weekday)
+                if moment >= dtstart:
+                    yield moment
+            index += 1
+
+    else:
+        months_per_period = rule.interval * (12 if rule.freq == "YEARLY" else 1)
+        index = 0
+        if after > dtstart:
+            elapsed = (after.year - dtstart.year) * 12 + after.month - dtstart.month
+            index = max(0, elapsed // months_per_period - 1)
+        while True:
+            moment = _add_months(dtstart, index * months_per_period)
+            if moment is not None:
+                yield moment
+            index += 1
+
+
+def common_period(*rules: RecurrenceRule) -> Optional[timedelta]:
+    """Span after which the rules' occurrences fall the same way again, or
+    None when one of them repeats by calendar months, whose lengths vary."""
+    days = 1
+    for rule in rules:
+        if rule.freq not in ("DAILY", "WEEKLY"):
+            return None
+        days = math.lcm(days, rule.interval * (7 if rule.freq == "WEEKLY" else 1))
+    return timedelta(days=days)
+
+
+def series_last_start(
+    rule: RecurrenceRule, dtstart: datetime
+) -> Optional[datetime]:
+    """Start of the final occurrence, or None for an unbounded series."""
+    if rule.count is not None:
+        starts = islice(_occurrence_starts(rule, dtstart, dtstart), rule.count)
+        last = None
+        for last in starts:
+            pass
+        return last
+    if rule.until is not None:
+        # Start just before UNTIL; fall back to a full walk only when that
+        # period happens to hold no occurrence (e.g. monthly on the 31st)
+        for after in (rule.until, dtstart):
+            last = None
+            for moment in _occurrence_starts(rule, dtstart, after):
+                if moment > rule.until:
+                    break
+                last = moment
+            if last is not None:
+                return last
+        return dtstart
+    return None
+
+
+def expand(
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+    last_start: Optional[datetime] = None,
+) -> Iterator[Tuple[datetime, datetime]]:
+    """Lazily yield the (start, end) of occurrences overlapping
+    [window_start, window_end), in order."""
+    earliest = window_start - duration
+    latest = min(window_end, SERIES_HORIZON)
+    for moment in _occurrence_starts(rule, dtstart, earliest):
+        if moment >= latest or (last_start is not None and moment > last_start):
+            return
+        if moment > earliest:
+            yield moment, moment + duration
+
+
+def occurs_between(
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+    last_start: Optional[datetime] = None,
+) -> bool:
+    occurrences = expand(rule, dtstart, duration, window_start, window_end, last_start)
+    return next(occurrences, None) is not None
+
+
+def occurrence_starts_between(
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+    last_start: Optional[datetime] = None,
+) -> List[datetime]:
+    return [
+        start_time
+        for start_time, _ in expand(
+            rule, dtstart, duration, window_start, window_end, last_start
+        )
+    ]
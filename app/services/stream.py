@@ -0,0 +1,69 @@
+import asyncio
+from typing import AsyncIterator, Iterable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.utils.pubsub import Hub, LocalBackend, PostgresBackend
+
+EVENT_CHANNEL = "event_changes"
+# How soon EventSource reconnects once a stream ends
+EVENT_STREAM_RETRY_MS = 2000
+
+
+def _backend():
+    if settings.EVENT_STREAM_BACKEND == "postgres":
+        # asyncpg wants a plain libpq URL, without SQLAlchemy's driver suffix
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        return PostgresBackend(dsn.render_as_string(hide_password=False), EVENT_CHANNEL)
+    if settings.EVENT_STREAM_BACKEND == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown EVENT_STREAM_BACKEND {settings.EVENT_STREAM_BACKEND!r}")
+
+
+# Change notifications keyed by the user who should see them
+event_hub = Hub(_backend(), queue_size=settings.EVENT_STREAM_QUEUE_SIZE)
+
+
+def publish_event_change(
+    kind: str, event_id: int, user_ids: Iterable[int], owner_id: Optional[int] = None
+) -> None:
+    event_hub.publish(user_ids, kind, {"id": event_id, "owner_id": owner_id})
+
+
+def open_event_stream(user_id: int) -> AsyncIterator[str]:
+    if event_hub.subscriber_count(user_id) >= settings.EVENT_STREAM_MAX_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.EVENT_STREAM_MAX_PER_USER} open streams per user",
+        )
+    return _server_sent_events(user_id)
+
+
+async def _server_sent_events(user_id: int) -> AsyncIterator[str]:
+    # Subscribed only once the body starts, so a client that goes away before
+    # then never holds a subscription. It is listening by the time the retry
+    # line arrives; anything earlier comes from GET /events/changes.
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + settings.EVENT_STREAM_MAX_SECONDS
+    with event_hub.subscribe(user_id) as subscription:
+        yield f"retry: {EVENT_STREAM_RETRY_MS}\n\n"
+        while True:
+            remaining = closes_at - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                message = await subscription.get(
+                    min(settings.EVENT_STREAM_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing the stream out
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                break
+            yield f"event: {message.event}\ndata: {message.data}\n\n"
+        if subscription.overflowed:
+            # Too slow to keep up; the client catches up through GET /events/changes
+            yield 'event: resync\ndata: {}\n\n'
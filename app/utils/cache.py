@@ -0,0 +1,214 @@
+import hashlib
+import itertools
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry and tag invalidation."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, but leaves the hit counts and recency alone."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return default
+            return entry[0]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[Hashable] = (),
+    ) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+
+class LocalResponseStore:
+    """Versions and bodies in this process. Writes made by other workers go
+    unseen here until the entries expire, so it only suits a single worker."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        # Versions are drawn from one counter, so a scope whose version was
+        # evicted gets a new number instead of restarting at one that bodies
+        # still in the cache were stored under
+        self._versions = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        self._next_version = itertools.count(1)
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def version(self, scope: Hashable) -> int:
+        version = self._versions.get(scope)
+        if version is None:
+            version = next(self._next_version)
+            self._versions.set(scope, version)
+        return version
+
+    async def bump(self, scope: Hashable) -> None:
+        self._versions.set(scope, next(self._next_version))
+
+    async def get(self, key: Tuple) -> Optional[CachedResponse]:
+        return self._responses.get(key)
+
+    async def set(self, key: Tuple, response: CachedResponse) -> None:
+        self._responses.set(key, response)
+
+    def stats(self) -> Dict[str, int]:
+        return self._responses.stats()
+
+
+class RedisResponseStore:
+    """Versions and bodies in Redis, shared by every worker. Bound its memory
+    with maxmemory and an LRU eviction policy on the server."""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "responses"):
+        # Only needed when this store is configured
+        from redis import asyncio as redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    def _key(self, *parts) -> str:
+        return ":".join(map(str, (self.prefix, *parts)))
+
+    async def version(self, scope: Hashable) -> int:
+        return int(await self._redis.get(self._key("version", scope)) or 0)
+
+    async def bump(self, scope: Hashable) -> None:
+        await self._redis.incr(self._key("version", scope))
+
+    async def get(self, key: Tuple) -> Optional[CachedResponse]:
+        raw = await self._redis.get(self._key("body", *key))
+        if raw is None:
+            return None
+        meta, body = raw.split(b"\n", 1)
+        etag, headers = json.loads(meta)
+        return CachedResponse(etag, body, headers)
+
+    async def set(self, key: Tuple, response: CachedResponse) -> None:
+        meta = json.dumps([response.etag, response.headers]).encode()
+        await self._redis.set(
+            self._key("body", *key), meta + b"\n" + response.body, ex=int(self.ttl)
+        )
+
+
+class ResponseCache:
+    """Serialized response bodies under a per-scope version.
+
+    A write bumps its scope's version, which moves every later lookup to new
+    keys; entries under older versions are never read again and age out of
+    the store, so invalidation never scans keys.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    async def version(self, scope: Hashable) -> int:
+        return await self.store.version(scope)
+
+    async def bump(self, scope: Hashable) -> None:
+        await self.store.bump(scope)
+
+    async def get(
+        self, scope: Hashable, version: int, key: Tuple
+    ) -> Optional[CachedResponse]:
+        return await self.store.get((scope, version, *key))
+
+    async def set(
+        self,
+        scope: Hashable,
+        version: int,
+        key: Tuple,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> CachedResponse:
+        # `version` must be the one read before the body was built: a write
+        # landing in between then files it under a version no longer current.
+        # The ETag hashes the body so it stays valid across workers.
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        response = CachedResponse(etag, body, headers or {})
+        await self.store.set((scope, version, *key), response)
+        return response
@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+from typing import Annotated
+
+from pydantic import AfterValidator
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Event times are stored as naive UTC; aware input is converted to match
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# A request datetime normalised by naive_utc as it is parsed
+UTCDateTime = Annotated[datetime, AfterValidator(naive_utc)]
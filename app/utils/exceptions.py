@@ -1,27 +1,47 @@
-from fastapi import HTTPException, status
-from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from typing import Any
-
-class UnauthorizedException(HTTPException):
-    def __init__(self, detail: str = "Unauthorized"):
-        super().__init__(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=detail,
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-async def http_exception_handler(request: Any, exc: HTTPException) -> JSONResponse:
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={"detail": exc.detail},
-        headers=exc.headers if hasattr(exc, "headers") else None,
-    )
-
-async def validation_exception_handler(
-    request: Any, exc: RequestValidationError
-) -> JSONResponse:
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"detail": exc.errors()},
+from fastapi import HTTPException, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from typing import Any, List
+
+class UnauthorizedException(HTTPException):
+    def __init__(self, detail: str = "Unauthorized"):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+class EventConflictException(HTTPException):
+    def __init__(self, conflicting_event_ids: List[int]):
+        # detail stays the string clients already match on; the ids ride
+        # alongside it as a top-level field
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Event time conflicts with existing event",
+        )
+        self.extra = {"conflicting_event_ids": conflicting_event_ids}
+
+class EventVersionConflictException(HTTPException):
+    def __init__(self, current_version: int):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Event was modified by another request",
+                "current_version": current_version,
+            },
+        )
+
+async def http_exception_handler(request: Any, exc: HTTPException) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, **getattr(exc, "extra", {})},
+        headers=exc.headers if hasattr(exc, "headers") else None,
+    )
+
+async def validation_exception_handler(
+    request: Any, exc: RequestValidationError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": exc.errors()},
     )
\ No newline at end of file
@@ -0,0 +1,231 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond to "something is stuck"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = running
+        return {"count": running, "sum": total, "buckets": cumulative}
+
+
+class LabeledHistogram:
+    """A family of histograms sharing a name, one per label combination."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for values, child in sorted(self._children.items()):
+            labels = [
+                f'{name}="{_escape_label(value)}"'
+                for name, value in zip(self.label_names, values)
+            ]
+            snapshot = child.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {snapshot['sum']}")
+            lines.append(f"{self.name}_count{suffix} {snapshot['count']}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestStats:
+    """SQL activity of the request being served, filled in by engine hooks."""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # (statement, parameters) -> executions, to spot repeated fetches
+        self.executions: Counter = Counter()
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append((context, time.perf_counter()))
+
+
+def _record_statement(started: float, statement, parameters, executemany: bool) -> None:
+    elapsed = time.perf_counter() - started
+    stats = current_request_stats.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    # Large bulk statements are never N+1 candidates; don't pay to key them
+    if not executemany and len(parameters or ()) <= 32:
+        stats.executions[(statement, repr(parameters))] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, started = conn.info["query_started"].pop()
+    _record_statement(started, statement, parameters, executemany)
+
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute, and conn.info
+    # outlives the checkout, so its start is popped here. Errors raised
+    # outside a statement, e.g. while fetching, have none of their own.
+    conn = exception_context.connection
+    in_flight = conn.info.get("query_started") if conn is not None else None
+    context = exception_context.execution_context
+    if not in_flight or in_flight[-1][0] is not context:
+        return
+    _, started = in_flight.pop()
+    _record_statement(
+        started,
+        exception_context.statement,
+        exception_context.parameters,
+        bool(context is not None and context.executemany),
+    )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+REQUEST_DURATION = LabeledHistogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, by route.",
+    ("method", "route", "status"),
+)
+REQUEST_DB_SECONDS = LabeledHistogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request, by route.",
+    ("method", "route"),
+)
+REQUEST_DB_STATEMENTS = LabeledHistogram(
+    "http_request_db_statements",
+    "SQL statements executed per request, by route.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+POOL_WAIT = LabeledHistogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+)
+
+
+def observe_request(
+    method: str, route: str, status_code: int, elapsed: float, stats: RequestStats
+) -> None:
+    REQUEST_DURATION.labels(method, route, f"{status_code // 100}xx").observe(elapsed)
+    REQUEST_DB_SECONDS.labels(method, route).observe(stats.db_seconds)
+    REQUEST_DB_STATEMENTS.labels(method, route).observe(stats.statements)
+
+    endpoint = f"{method} {route}"
+    budget = settings.SQL_QUERY_BUDGETS.get(endpoint, settings.SQL_QUERY_BUDGET)
+    if stats.statements > budget:
+        logger.warning(
+            "%s ran %d SQL statements (budget %d)", endpoint, stats.statements, budget
+        )
+    # The same statement with the same parameters twice is a fetch that
+    # should have been shared, e.g. a dependency and its handler both
+    # loading the event
+    for (statement, _), count in stats.executions.items():
+        if count > 1:
+            logger.warning(
+                "%s repeated an identical query %d times: %s",
+                endpoint, count, " ".join(statement.split())[:200],
+            )
+
+
+def server_timing(elapsed: float, stats: RequestStats) -> str:
+    return (
+        f"app;dur={elapsed * 1000:.2f}, "
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} SQL"'
+    )
+
+
+# Exported from TTLCache.stats(), per cache
+CACHE_FAMILIES = (
+    ("cache_hits_total", "counter", "hits", "Lookups answered from the cache."),
+    ("cache_misses_total", "counter", "misses", "Lookups not found or expired."),
+    ("cache_entries", "gauge", "size", "Entries held."),
+    ("cache_max_entries", "gauge", "maxsize", "Entries held at most."),
+)
+
+
+def _render_cache_stats(cache_stats: Dict[str, Dict[str, int]]) -> List[str]:
+    lines: List[str] = []
+    for name, kind, field, documentation in CACHE_FAMILIES:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+        for cache, stats in sorted(cache_stats.items()):
+            lines.append(f'{name}{{cache="{_escape_label(cache)}"}} {stats[field]}')
+    return lines
+
+
+def render_metrics(cache_stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+    lines: List[str] = []
+    for family in (REQUEST_DURATION, REQUEST_DB_SECONDS, REQUEST_DB_STATEMENTS, POOL_WAIT):
+        lines += family.render()
+    if cache_stats:
+        lines += _render_cache_stats(cache_stats)
+    return "\n".join(lines) + "\n"
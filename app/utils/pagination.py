@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(start_time: datetime, event_id: int) -> str:
+    raw = json.dumps([start_time.isoformat(), event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_time, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(start_time), int(event_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def encode_rank_cursor(rank: float, event_id: int) -> str:
+    # Search results are ordered by relevance, so they page on (rank, id)
+    raw = json.dumps([rank, event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(event_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def encode_change_token(change_version: int, event_id: int) -> str:
+    # Delta sync resumes after (change_version, event id)
+    raw = json.dumps([change_version, event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_change_token(token: str) -> Tuple[int, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        change_version, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(change_version), int(event_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token",
+        )
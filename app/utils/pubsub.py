@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class Message(NamedTuple):
+    event: str
+    # Encoded once at publish time, however many subscribers receive it
+    data: str
+
+
+# Subscriber keys a message is for, and the message
+Envelope = Tuple[List[Hashable], Message]
+
+
+class Subscription:
+    """One subscriber's bounded queue on a Hub.
+
+    Publishers never wait on a subscriber: one that falls more than the
+    queue size behind is dropped, with `overflowed` set so it knows it
+    missed messages.
+    """
+
+    def __init__(self, hub: "Hub", key: Hashable, maxsize: int):
+        self.key = key
+        self.overflowed = False
+        self.closed = False
+        self._hub = hub
+        self._queue: "asyncio.Queue[Optional[Message]]" = asyncio.Queue(maxsize)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """The next message, or None once the subscription is closed.
+
+        Raises asyncio.TimeoutError if nothing arrives within `timeout`.
+        """
+        if self.closed and self._queue.empty():
+            return None
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._hub._discard(self)
+        # Make room for the sentinel that wakes a waiting reader
+        while self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    def _offer(self, message: Message) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.close()
+
+
+class LocalBackend:
+    """Delivers messages within this process only."""
+
+    shared = False
+
+    async def start(self, deliver: Callable[[Envelope], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, envelope: Envelope) -> None:
+        self._deliver(envelope)
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresBackend:
+    """Shares messages between processes through LISTEN/NOTIFY.
+
+    Every process listens on one channel over a dedicated connection and
+    publishes through it as well, so its own messages come back the same
+    way. Delivery is at most once: messages sent while the connection is
+    down, or beyond the outbound queue, are lost.
+    """
+
+    shared = True
+    # NOTIFY payloads must stay under 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, dsn: str, channel: str, queue_size: int = 10000):
+        self.dsn = dsn
+        self.channel = channel
+        self._outbox: "asyncio.Queue[str]" = asyncio.Queue(queue_size)
+        self._connection: Optional[asyncpg.Connection] = None
+        self._sender: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[Envelope], None]) -> None:
+        self._deliver = deliver
+        await self._connect()
+        self._sender = asyncio.create_task(self._send())
+
+    async def _connect(self) -> None:
+        self._connection = await asyncpg.connect(self.dsn)
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        keys, event, data = json.loads(payload)
+        self._deliver((keys, Message(event, data)))
+
+    def publish(self, envelope: Envelope) -> None:
+        keys, message = envelope
+        for payload in self._payloads(keys, message):
+            try:
+                self._outbox.put_nowait(payload)
+            except asyncio.QueueFull:
+                logger.warning("Dropped %s notification: outbound queue full", message.event)
+                return
+
+    @staticmethod
+    def _encode(keys: List[Hashable], message: Message) -> str:
+        return json.dumps([keys, message.event, message.data], separators=(",", ":"))
+
+    def _payloads(self, keys: List[Hashable], message: Message) -> Iterator[str]:
+        # A message for more keys than one payload holds goes out as several
+        room = self.MAX_PAYLOAD - len(self._encode([], message).encode())
+        chunk: List[Hashable] = []
+        size = 0
+        for key in keys:
+            # The key and the comma before it
+            key_size = len(json.dumps(key).encode()) + 1
+            if key_size > room:
+                logger.warning("Dropped %s notification: payload too large", message.event)
+                return
+            if size + key_size > room:
+                yield self._encode(chunk, message)
+                chunk, size = [], 0
+            chunk.append(key)
+            size += key_size
+        if chunk:
+            yield self._encode(chunk, message)
+
+    async def _send(self) -> None:
+        while True:
+            payload = await self._outbox.get()
+            try:
+                if self._connection.is_closed():
+                    await self._connect()
+                await self._connection.execute(
+                    "SELECT pg_notify($1, $2)", self.channel, payload
+                )
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Could not publish notification")
+
+    async def stop(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+
+
+class Hub:
+    """Async publish/subscribe keyed by subscriber.
+
+    Each publish names the keys it is for, and only subscriptions under
+    those keys receive it. The backend carries messages between publishers
+    and hubs, possibly in other processes.
+    """
+
+    def __init__(self, backend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscriptions: Dict[Hashable, Set[Subscription]] = {}
+
+    @property
+    def listening(self) -> bool:
+        """Whether a publish may reach anyone; lets publishers skip the work."""
+        return self.backend.shared or bool(self._subscriptions)
+
+    async def start(self) -> None:
+        await self.backend.start(self._dispatch)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    def subscriber_count(self, key: Hashable) -> int:
+        return len(self._subscriptions.get(key, ()))
+
+    def subscribe(self, key: Hashable) -> Subscription:
+        subscription = Subscription(self, key, self.queue_size)
+        self._subscriptions.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def publish(self, keys: Iterable[Hashable], event: str, data: dict) -> None:
+        if not self.listening:
+            return
+        self.backend.publish((list(dict.fromkeys(keys)), Message(event, json.dumps(data))))
+
+    def _dispatch(self, envelope: Envelope) -> None:
+        keys, message = envelope
+        for key in keys:
+            for subscription in list(self._subscriptions.get(key, ())):
+                subscription._offer(message)
+
+    def _discard(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.key]
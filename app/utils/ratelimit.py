@@ -0,0 +1,124 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple, Union
+
+from app.config import settings
+
+
+class TokenBucketLimiter:
+    """Token buckets per key, held in this process.
+
+    Each key refills at `rate` tokens a second up to `burst`. Past `maxsize`
+    keys the least recently seen bucket is dropped, which only ever errs
+    towards letting a client through.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        """0 when admitted, otherwise seconds until `cost` tokens are available."""
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisTokenBucketLimiter:
+    """The same buckets kept in Redis, so every worker draws on them."""
+
+    # Refill and take in one step, on the server's clock
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str, rate: float, burst: float, prefix: str):
+        # Only needed when this limiter is configured
+        from redis import asyncio as redis
+
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        wait = await self._script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[self.rate, self.burst, min(cost, self.burst)],
+        )
+        return float(wait)
+
+
+def rate_limiter(
+    rate: float, burst: float, prefix: str
+) -> Optional[Union[TokenBucketLimiter, RedisTokenBucketLimiter]]:
+    """Buckets shared through RATE_LIMIT_URL when set; None when `rate` is 0."""
+    if rate <= 0:
+        return None
+    if settings.RATE_LIMIT_URL:
+        return RedisTokenBucketLimiter(settings.RATE_LIMIT_URL, rate, burst, prefix)
+    return TokenBucketLimiter(rate, burst, settings.RATE_LIMIT_MAX_CLIENTS)
+
+
+class ConcurrencyGate:
+    """At most `limit` holders at once, with up to `max_waiting` queued.
+
+    A caller that would queue beyond that, or can't get a slot within its
+    timeout, is turned away instead, so overload is shed early rather than
+    piling up behind the busy slots.
+    """
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self, timeout: float) -> bool:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.waiting >= self.max_waiting:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._slots.release()
@@ -0,0 +1,101 @@
+import re
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class TokenIndex:
+    """In-process inverted index over weighted text fields.
+
+    Each token maps to the documents containing it, scored by the weights of
+    the fields it appears in. Query terms match any token they are a prefix
+    of, found by bisecting a sorted vocabulary. Documents carry their owner
+    so callers can scope results without a query.
+    """
+
+    def __init__(self, weights: Mapping[str, float]):
+        self.weights = dict(weights)
+        self.enabled = True
+        self._postings: Dict[str, Dict[Hashable, float]] = {}
+        self._documents: Dict[Hashable, Tuple[int, Dict[str, float]]] = {}
+        self._vocabulary: List[str] = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(
+        self, doc_id: Hashable, owner_id: int, fields: Mapping[str, Optional[str]]
+    ) -> None:
+        # Replaces any earlier version of the document
+        if not self.enabled:
+            return
+        tokens: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = self.weights[field]
+            for token in tokenize(text):
+                tokens[token] = tokens.get(token, 0.0) + weight
+        with self._lock:
+            self._remove(doc_id)
+            self._documents[doc_id] = (owner_id, tokens)
+            for token, weight in tokens.items():
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                posting[doc_id] = weight
+
+    def remove(self, doc_id: Hashable) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable) -> None:
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        for token in document[1]:
+            posting = self._postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._vocabulary.clear()
+
+    def owner(self, doc_id: Hashable) -> Optional[int]:
+        document = self._documents.get(doc_id)
+        return document[0] if document is not None else None
+
+    def search(self, terms: Iterable[str]) -> Dict[Hashable, float]:
+        """Documents matching every term, with summed scores."""
+        scores: Optional[Dict[Hashable, float]] = None
+        with self._lock:
+            for term in terms:
+                matches: Dict[Hashable, float] = {}
+                position = bisect_left(self._vocabulary, term)
+                while (
+                    position < len(self._vocabulary)
+                    and self._vocabulary[position].startswith(term)
+                ):
+                    for doc_id, weight in self._postings[self._vocabulary[position]].items():
+                        if (scores is None or doc_id in scores) and weight > matches.get(doc_id, 0.0):
+                            matches[doc_id] = weight
+                    position += 1
+                if scores is not None:
+                    matches = {
+                        doc_id: scores[doc_id] + weight for doc_id, weight in matches.items()
+                    }
+                scores = matches
+                if not scores:
+                    break
+        return scores or {}
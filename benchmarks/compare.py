@@ -0,0 +1,80 @@
+"""Compare two benchmarks.suite result files.
+
+    python -m benchmarks.compare base.json head.json --threshold 0.15
+
+Prints every latency, throughput and statement-count change beyond the
+threshold and exits non-zero if any of them is a regression, so it can gate
+a CI job.
+"""
+import argparse
+import json
+import sys
+from typing import Iterator, Tuple
+
+# Metric name -> True when a larger value is worse
+METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "throughput_rps": False,
+    "statements_max": True,
+    "errors": True,
+    "lag_p99_ms": True,
+}
+# Below this, a relative change is timer noise rather than a result
+MIN_MS = 0.5
+
+
+def _cases(results: dict) -> Iterator[Tuple[str, dict]]:
+    for section in ("load", "micro"):
+        for profile, cases in results.get(section, {}).items():
+            for name, metrics in cases.items():
+                yield f"{section}/{profile}/{name}", metrics
+
+
+def compare(base: dict, head: dict, threshold: float) -> int:
+    base_cases = dict(_cases(base))
+    regressions = 0
+    for key, metrics in _cases(head):
+        previous = base_cases.get(key)
+        if previous is None:
+            print(f"new   {key}")
+            continue
+        for metric, larger_is_worse in METRICS.items():
+            before, after = previous.get(metric), metrics.get(metric)
+            if before is None or after is None or before == after:
+                continue
+            if metric.endswith("_ms") and max(before, after) < MIN_MS:
+                continue
+            if metric in ("statements_max", "errors"):
+                # Counts are exact: any increase is a regression
+                change = after - before
+                worse = change > 0
+            else:
+                change = (after - before) / before if before else float("inf")
+                if abs(change) < threshold:
+                    continue
+                worse = (change > 0) == larger_is_worse
+            regressions += worse
+            label = "WORSE" if worse else "better"
+            print(f"{label:6} {key} {metric}: {before} -> {after} ({change:+.2f})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.head) as head_file:
+        base, head = json.load(base_file), json.load(head_file)
+    print(f"{base.get('commit')} -> {head.get('commit')}")
+    regressions = compare(base, head, args.threshold)
+    print({"regressions": regressions})
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
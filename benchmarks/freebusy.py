@@ -0,0 +1,66 @@
+"""Free/busy merge cost for a large group.
+
+    python -m benchmarks.freebusy --users 500 --days 30
+
+Times the in-process part of POST /freebusy (sweep merge plus free-slot
+extraction) over synthetic calendars; the single range query is not
+included.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from app.services.freebusy import free_slots, merge_intervals  # noqa: E402
+
+
+def _synthetic_intervals(users: int, days: int, per_day: int, seed: int = 7):
+    rng = random.Random(seed)
+    window_start = datetime(2024, 1, 1)
+    intervals = []
+    for _ in range(users):
+        for day in range(days):
+            day_start = window_start + timedelta(days=day, hours=8)
+            slots = sorted(rng.sample(range(0, 20), per_day))
+            for slot in slots:
+                start_time = day_start + timedelta(minutes=30 * slot)
+                intervals.append((start_time, start_time + timedelta(minutes=30 * rng.randint(1, 2))))
+    # The database hands these over already ordered by start_time
+    intervals.sort()
+    return window_start, window_start + timedelta(days=days), intervals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    window_start, window_end, intervals = _synthetic_intervals(
+        args.users, args.days, args.per_day
+    )
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        busy = merge_intervals(intervals)
+        free_slots(busy, window_start, window_end, timedelta(minutes=30))
+        timings.append((time.perf_counter() - started) * 1000)
+    print({
+        "users": args.users,
+        "days": args.days,
+        "intervals": len(intervals),
+        "busy_blocks": len(busy),
+        "p50_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
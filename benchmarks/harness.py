@@ -0,0 +1,98 @@
+"""Shared plumbing for the benchmark suite: environment defaults, latency
+summaries, event-loop lag sampling and JSON result files."""
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# One client drives all the load, so the per-client limits would measure
+# themselves; admission control is left off for the same reason
+for _name in ("RATE_LIMIT_USER_PER_SECOND", "RATE_LIMIT_IP_PER_SECOND", "RATE_LIMIT_LOGIN_PER_SECOND", "ADMISSION_MAX_CONCURRENCY"):
+    os.environ.setdefault(_name, "0")
+os.environ.setdefault("ROUTE_CONCURRENCY_LIMITS", "{}")
+
+LAG_TICK_SECONDS = 0.005
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+class LagMonitor:
+    """Samples how late a short sleep wakes up while work runs on the loop."""
+
+    def __init__(self):
+        self.samples_ms: List[float] = []
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_TICK_SECONDS)
+            self.samples_ms.append(
+                (time.perf_counter() - started - LAG_TICK_SECONDS) * 1000
+            )
+
+    async def __aenter__(self) -> "LagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._stop.set()
+        await self._task
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples_ms)
+        return {
+            "lag_p99_ms": round(percentile(ordered, 0.99), 3),
+            "lag_max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**options) -> dict:
+    from app.config import settings
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": settings.DATABASE_URL.split("://", 1)[0],
+        "options": options,
+    }
+
+
+def write_results(path: str, results: dict) -> None:
+    with open(path, "w") as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+        output.write("\n")
+    print(f"results written to {path}")
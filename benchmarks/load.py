@@ -0,0 +1,340 @@
+"""Fixed-concurrency load run against every auth, events and shares route.
+
+    python -m benchmarks.load --sizes 10,1000,100000 --requests 200 --concurrency 16
+
+Seeds the database (see benchmarks.seed), starts the app in-process and
+drives each route as every seeded user in turn, so results are broken down
+by calendar size. Per route it reports throughput, latency percentiles, SQL
+statements per request (read back from the Server-Timing header) and how
+far the event loop fell behind while the route was under load; the app
+shares the loop with the client, so CPU-bound work shows up as lag.
+Needs httpx, which is not an application dependency.
+"""
+import argparse
+import asyncio
+import itertools
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.harness import LagMonitor, summarize
+from benchmarks.seed import (
+    EVENT_LENGTH,
+    PASSWORD,
+    SERIES_START,
+    SeededUser,
+    SeedResult,
+    event_slot,
+    parse_sizes,
+    seed,
+)
+
+import httpx  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app, on_startup  # noqa: E402
+from app.utils.pagination import encode_cursor  # noqa: E402
+
+STATEMENTS_PATTERN = re.compile(r'desc="(\d+) SQL"')
+BATCH_SIZE = 10
+
+
+class LoadContext:
+    """Per-user state the scenarios draw their requests from."""
+
+    def __init__(self, user: SeededUser, peers: List[SeededUser], series_id: int, token: str):
+        self.user = user
+        self.peers = peers
+        self.series_id = series_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.feed_token = ""
+        self.created_ids: List[int] = []
+        self.import_ids: List[str] = []
+        # New events go after the seeded ones so they never conflict
+        self._slots = itertools.count(user.events + 1)
+
+    def next_slot(self) -> dict:
+        start_time = event_slot(next(self._slots))
+        return {
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + EVENT_LENGTH).isoformat(),
+        }
+
+    def event_id(self, index: int) -> int:
+        return self.created_ids[index % len(self.created_ids)]
+
+    def peer(self, index: int) -> SeededUser:
+        return self.peers[index % len(self.peers)]
+
+    @property
+    def middle(self):
+        return event_slot(self.user.events // 2)
+
+
+Request = Tuple[str, str, dict]
+
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[LoadContext, int], Request]
+    after: Optional[Callable[[LoadContext, httpx.Response], None]] = None
+    # Routes whose cost grows with the whole calendar or that hash passwords
+    heavy: bool = False
+
+
+def _remember_event(ctx: LoadContext, response: httpx.Response) -> None:
+    if response.status_code == 201:
+        ctx.created_ids.append(response.json()["id"])
+
+
+def _remember_import(ctx: LoadContext, response: httpx.Response) -> None:
+    if response.status_code == 202:
+        ctx.import_ids.append(response.json()["id"])
+
+
+def _delete_created(ctx: LoadContext, index: int) -> Request:
+    event_id = ctx.created_ids.pop() if ctx.created_ids else 0
+    return "DELETE", f"/events/{event_id}", {"headers": ctx.headers}
+
+
+def _import_csv(ctx: LoadContext, index: int) -> Request:
+    slot = ctx.next_slot()
+    body = f"title,start_time,end_time\nImported {index},{slot['start_time']},{slot['end_time']}\n"
+    return "POST", "/events/import?format=csv", {
+        "headers": ctx.headers,
+        "files": {"file": ("events.csv", body.encode(), "text/csv")},
+    }
+
+
+def _grants(ctx: LoadContext) -> dict:
+    return {"grants": [{"user_id": peer.id, "permission": "read"} for peer in ctx.peers]}
+
+
+def _occurrence(index: int) -> str:
+    return (SERIES_START + timedelta(weeks=index % 520)).isoformat()
+
+
+SCENARIOS = [
+    Scenario("auth.token", lambda ctx, i: ("POST", "/auth/auth/token", {
+        "data": {"username": ctx.user.email, "password": PASSWORD},
+    }), heavy=True),
+    Scenario("auth.register", lambda ctx, i: ("POST", "/auth/auth/register", {
+        "json": {"email": f"load-{uuid.uuid4().hex[:12]}@example.com", "password": PASSWORD},
+    }), heavy=True),
+    Scenario("auth.me", lambda ctx, i: ("GET", "/auth/auth/me", {"headers": ctx.headers})),
+    Scenario("events.create", lambda ctx, i: ("POST", "/events/", {
+        "headers": ctx.headers,
+        "json": {"title": f"Load {i}", **ctx.next_slot()},
+    }), after=_remember_event),
+    Scenario("events.batch", lambda ctx, i: ("POST", "/events/batch", {
+        "headers": ctx.headers,
+        "json": [{"title": f"Batch {i}.{n}", **ctx.next_slot()} for n in range(BATCH_SIZE)],
+    })),
+    Scenario("events.get", lambda ctx, i: ("GET", f"/events/{ctx.event_id(i)}", {
+        "headers": ctx.headers,
+    })),
+    Scenario("events.update", lambda ctx, i: ("PUT", f"/events/{ctx.event_id(i)}", {
+        "headers": ctx.headers,
+        "json": {"title": f"Renamed {i}"},
+    })),
+    Scenario("events.list", lambda ctx, i: ("GET", "/events/?limit=50", {"headers": ctx.headers})),
+    Scenario("events.list.offset_deep", lambda ctx, i: ("GET", "/events/", {
+        "headers": ctx.headers,
+        "params": {"limit": 50, "skip": ctx.user.events // 2},
+    })),
+    Scenario("events.list.cursor_deep", lambda ctx, i: ("GET", "/events/", {
+        "headers": ctx.headers,
+        "params": {"limit": 50, "cursor": encode_cursor(ctx.middle, 0)},
+    })),
+    Scenario("events.list.shared", lambda ctx, i: ("GET", "/events/", {
+        "headers": ctx.headers,
+        "params": {"limit": 50, "include_shared": "true"},
+    })),
+    Scenario("events.range", lambda ctx, i: ("GET", "/events/range", {
+        "headers": ctx.headers,
+        "params": {
+            "from": ctx.middle.isoformat(),
+            "to": (ctx.middle + timedelta(days=7)).isoformat(),
+        },
+    })),
+    Scenario("events.search", lambda ctx, i: ("GET", "/events/search", {
+        "headers": ctx.headers,
+        "params": {"q": f"event {i % 1000}", "limit": 20},
+    })),
+    Scenario("events.changes", lambda ctx, i: ("GET", "/events/changes?limit=500", {
+        "headers": ctx.headers,
+    })),
+    Scenario("events.export", lambda ctx, i: ("GET", "/events/export?format=ndjson", {
+        "headers": ctx.headers,
+    }), heavy=True),
+    Scenario("events.feed", lambda ctx, i: ("GET", "/events/feed.ics", {
+        "params": {"token": ctx.feed_token},
+    }), heavy=True),
+    Scenario("events.exceptions.set", lambda ctx, i: ("POST", f"/events/{ctx.series_id}/exceptions", {
+        "headers": ctx.headers,
+        "json": {"original_start": _occurrence(i), "is_cancelled": True},
+    })),
+    Scenario("events.exceptions.delete", lambda ctx, i: ("DELETE", f"/events/{ctx.series_id}/exceptions", {
+        "headers": ctx.headers,
+        "params": {"original_start": _occurrence(i)},
+    })),
+    Scenario("events.import", _import_csv, after=_remember_import, heavy=True),
+    Scenario("events.import.status", lambda ctx, i: ("GET", f"/events/import/{ctx.import_ids[i % len(ctx.import_ids)]}", {
+        "headers": ctx.headers,
+    })),
+    Scenario("events.import.cancel", lambda ctx, i: ("DELETE", f"/events/import/{ctx.import_ids[i % len(ctx.import_ids)]}", {
+        "headers": ctx.headers,
+    })),
+    Scenario("freebusy", lambda ctx, i: ("POST", "/freebusy/", {
+        "headers": ctx.headers,
+        "json": {
+            "user_ids": [ctx.user.id] + [peer.id for peer in ctx.peers[:10]],
+            "start": ctx.middle.isoformat(),
+            "end": (ctx.middle + timedelta(days=7)).isoformat(),
+        },
+    })),
+    Scenario("shares.bulk", lambda ctx, i: ("POST", f"/events/{ctx.event_id(0)}/share/bulk", {
+        "headers": ctx.headers,
+        "json": _grants(ctx),
+    })),
+    Scenario("shares.list", lambda ctx, i: ("GET", f"/events/{ctx.event_id(0)}/share/", {
+        "headers": ctx.headers,
+    })),
+    Scenario("shares.bulk_revoke", lambda ctx, i: ("POST", f"/events/{ctx.event_id(0)}/share/bulk/revoke", {
+        "headers": ctx.headers,
+        "json": _grants(ctx),
+    })),
+    Scenario("shares.grant", lambda ctx, i: ("POST", f"/events/{ctx.event_id(0)}/share/{ctx.peer(i).id}/write", {
+        "headers": ctx.headers,
+    })),
+    Scenario("shares.revoke", lambda ctx, i: ("DELETE", f"/events/{ctx.event_id(0)}/share/{ctx.peer(i).id}/write", {
+        "headers": ctx.headers,
+    })),
+    # Last, so it consumes the events created above
+    Scenario("events.delete", _delete_created),
+]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: LoadContext,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    latencies: List[float] = []
+    statements: List[int] = []
+    statuses: Counter = Counter()
+    indexes = itertools.count()
+
+    async def worker() -> None:
+        for index in indexes:
+            if index >= requests:
+                return
+            method, url, options = scenario.build(ctx, index)
+            started = time.perf_counter()
+            response = await client.request(method, url, **options)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+            match = STATEMENTS_PATTERN.search(response.headers.get("server-timing", ""))
+            if match:
+                statements.append(int(match.group(1)))
+            if scenario.after is not None:
+                scenario.after(ctx, response)
+
+    async with LagMonitor() as lag:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        **summarize(latencies),
+        "statements_mean": round(sum(statements) / len(statements), 2) if statements else None,
+        "statements_max": max(statements) if statements else None,
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": sum(count for code, count in statuses.items() if code >= 500),
+        **lag.summary(),
+    }
+
+
+async def _login(client: httpx.AsyncClient, user: SeededUser) -> str:
+    response = await client.post(
+        "/auth/auth/token", data={"username": user.email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _feed_token(client: httpx.AsyncClient, ctx: LoadContext) -> str:
+    response = await client.post("/events/feed/token", headers=ctx.headers)
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def run_load(
+    seeded: SeedResult,
+    requests: int,
+    heavy_requests: int,
+    concurrency: int,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, dict]]:
+    await on_startup()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results: Dict[str, Dict[str, dict]] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size, user in seeded.users.items():
+            ctx = LoadContext(
+                user, seeded.peers, seeded.series_ids[user.id], await _login(client, user)
+            )
+            ctx.feed_token = await _feed_token(client, ctx)
+            profile = results[f"{size}_events"] = {}
+            for scenario in SCENARIOS:
+                if only and not any(scenario.name.startswith(prefix) for prefix in only):
+                    continue
+                profile[scenario.name] = await run_scenario(
+                    client,
+                    scenario,
+                    ctx,
+                    heavy_requests if scenario.heavy else requests,
+                    concurrency,
+                )
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sizes", type=parse_sizes, default=[10, 1000, 100000])
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--shares", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--heavy-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--only", type=lambda value: value.split(","), default=None,
+        help="comma-separated scenario name prefixes, e.g. events.list,shares",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    async def run():
+        seeded = await seed(args.sizes, args.peers, args.shares)
+        results = await run_load(
+            seeded, args.requests, args.heavy_requests, args.concurrency, args.only
+        )
+        await engine.dispose()
+        return results
+
+    for profile, scenarios in asyncio.run(run()).items():
+        for name, result in scenarios.items():
+            print({"profile": profile, "scenario": name, **result})
+
+
+if __name__ == "__main__":
+    main()
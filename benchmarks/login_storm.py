@@ -0,0 +1,73 @@
+"""Event-loop lag while a burst of password checks is in flight.
+
+    python -m benchmarks.login_storm --logins 64
+
+Compares calling bcrypt inline on the loop with the bounded hashing pool
+used by app.services.auth.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from app.services.auth import (  # noqa: E402
+    get_password_hash,
+    verify_password,
+    verify_password_async,
+)
+
+TICK_SECONDS = 0.005
+
+
+async def _measure_lag(stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+
+async def _inline_login(password: str, hashed: str) -> None:
+    verify_password(password, hashed)
+
+
+async def _run(mode: str, logins: int, password: str, hashed: str) -> dict:
+    stop = asyncio.Event()
+    samples: list = []
+    ticker = asyncio.create_task(_measure_lag(stop, samples))
+    await asyncio.sleep(TICK_SECONDS * 2)
+
+    login = verify_password_async if mode == "pool" else _inline_login
+    started = time.perf_counter()
+    await asyncio.gather(*(login(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    samples.sort()
+    return {
+        "mode": mode,
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "lag_p50_ms": round(statistics.median(samples), 2),
+        "lag_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2),
+        "lag_max_ms": round(samples[-1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+    for mode in ("inline", "pool"):
+        print(asyncio.run(_run(mode, args.logins, password, hashed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Micro-benchmarks for the hot service calls, without HTTP in the way.
+
+    python -m benchmarks.micro --sizes 10,1000,100000 --repeat 200
+
+Times check_event_conflict (free slot, busy slot, recurring probe),
+get_events (first page, deep offset, deep cursor), the get_events_page row
+fast path and its response cache (hit and miss), token validation (get_current_user with and without the
+principal cache, and the database-free token_subject) against each seeded
+calendar.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.harness import summarize
+from benchmarks.seed import EVENT_LENGTH, SeedResult, event_slot, parse_sizes, seed
+
+from app.database import async_session, engine  # noqa: E402
+from app.services.auth import (  # noqa: E402
+    create_access_token,
+    get_current_user,
+    principal_cache,
+    token_subject,
+)
+from app.services.event import (  # noqa: E402
+    check_event_conflict,
+    get_events,
+    get_events_page,
+    get_events_page_response,
+    response_cache,
+)
+from app.utils.pagination import encode_cursor  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+async def _time(call: Callable[[], Awaitable], repeat: int) -> Dict[str, float]:
+    await call()  # warm-up: compiled statements, pool checkout
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"repeat": repeat, **summarize(samples)}
+
+
+async def run_micro(seeded: SeedResult, repeat: int) -> Dict[str, Dict[str, dict]]:
+    results: Dict[str, Dict[str, dict]] = {}
+    async with async_session() as db:
+        for size, user in seeded.users.items():
+            middle = event_slot(user.events // 2)
+            free = event_slot(user.events + 1)
+            token = create_access_token({"sub": user.email})
+
+            async def uncached_principal():
+                principal_cache.clear()
+                await get_current_user(db, token)
+
+            async def token_only():
+                token_subject(token)
+
+            async def response_miss():
+                # A write elsewhere: the next lookup moves to a new version
+                await response_cache.bump(user.id)
+                await get_events_page_response(db, user.id, 0, PAGE_SIZE)
+
+            cases = {
+                "conflict.free_slot": lambda: check_event_conflict(
+                    db, user.id, free, free + EVENT_LENGTH
+                ),
+                "conflict.busy_slot": lambda: check_event_conflict(
+                    db, user.id, middle, middle + EVENT_LENGTH
+                ),
+                "conflict.weekly_series": lambda: check_event_conflict(
+                    db, user.id, free, free + EVENT_LENGTH,
+                    recurrence_rule="FREQ=WEEKLY;COUNT=52",
+                ),
+                "get_events.first_page": lambda: get_events(db, user.id, 0, PAGE_SIZE),
+                "get_events.offset_deep": lambda: get_events(
+                    db, user.id, user.events // 2, PAGE_SIZE
+                ),
+                "get_events.cursor_deep": lambda: get_events(
+                    db, user.id, 0, PAGE_SIZE, encode_cursor(middle, 0)
+                ),
+                # The row fast path GET /events serves from, for comparison
+                "get_events_page.first_page": lambda: get_events_page(
+                    db, user.id, 0, PAGE_SIZE
+                ),
+                "get_events_page_response.hit": lambda: get_events_page_response(
+                    db, user.id, 0, PAGE_SIZE
+                ),
+                "get_events_page_response.miss": response_miss,
+                "auth.current_user_cached": lambda: get_current_user(db, token),
+                "auth.current_user_uncached": uncached_principal,
+                "auth.token_subject": token_only,
+            }
+            profile = results[f"{size}_events"] = {}
+            for name, call in cases.items():
+                profile[name] = await _time(call, repeat)
+                # Keep the identity map from growing across thousands of reads
+                db.expunge_all()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=parse_sizes, default=[10, 1000, 100000])
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--shares", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    async def run():
+        seeded = await seed(args.sizes, args.peers, args.shares)
+        results = await run_micro(seeded, args.repeat)
+        await engine.dispose()
+        return results
+
+    for profile, cases in asyncio.run(run()).items():
+        for name, result in cases.items():
+            print({"profile": profile, "case": name, **result})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Seed the benchmark database with users, events and shares.
+
+    python -m benchmarks.seed --sizes 10,1000,100000 --peers 50
+
+Creates one user per calendar size (bench-<size>@example.com), plus
+--peers small users the big calendars are shared with and who share back.
+Every user also gets one weekly series far in the future. The schema is
+dropped and recreated, so point DATABASE_URL at a scratch database.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from benchmarks import harness  # noqa: F401  (environment defaults)
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.database import Base, async_session, engine  # noqa: E402
+from app.models.event import Event  # noqa: E402
+from app.models.permission import UserPermission  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.auth import get_password_hash  # noqa: E402
+from app.services.permission import intern_permissions, interned_permissions  # noqa: E402
+
+PASSWORD = "benchmark-password"
+CALENDAR_START = datetime(2020, 1, 6, 8, 0)
+# One event every two hours, an hour long: dense but never overlapping
+EVENT_STEP = timedelta(hours=2)
+EVENT_LENGTH = timedelta(hours=1)
+SERIES_START = datetime(2090, 1, 2, 9, 0)
+INSERT_CHUNK = 5000
+PEER_EVENTS = 10
+
+
+class SeededUser(NamedTuple):
+    id: int
+    email: str
+    events: int
+
+
+class SeedResult(NamedTuple):
+    users: Dict[int, SeededUser]  # keyed by calendar size
+    peers: List[SeededUser]
+    series_ids: Dict[int, int]  # user id -> series event id
+    seconds: float
+
+
+def event_slot(index: int) -> datetime:
+    return CALENDAR_START + index * EVENT_STEP
+
+
+async def _insert_events(db, owner_id: int, count: int) -> None:
+    for chunk_start in range(0, count, INSERT_CHUNK):
+        rows = [
+            {
+                "title": f"Event {index}",
+                "description": "Seeded for benchmarks",
+                "location": "Room 1",
+                "start_time": event_slot(index),
+                "end_time": event_slot(index) + EVENT_LENGTH,
+                "owner_id": owner_id,
+            }
+            for index in range(chunk_start, min(count, chunk_start + INSERT_CHUNK))
+        ]
+        await db.execute(insert(Event), rows)
+
+
+async def seed(sizes: List[int], peers: int, shares: int) -> SeedResult:
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    # One bcrypt hash reused for everyone; seeding shouldn't take minutes
+    hashed_password = get_password_hash(PASSWORD)
+    async with async_session() as db:
+        await intern_permissions(db)
+
+        emails = [f"bench-{size}@example.com" for size in sizes]
+        emails += [f"peer-{index}@example.com" for index in range(peers)]
+        result = await db.execute(
+            insert(User).returning(User.id, User.email),
+            [{"email": email, "hashed_password": hashed_password} for email in emails],
+        )
+        ids = {email: user_id for user_id, email in result.all()}
+
+        users = {
+            size: SeededUser(ids[f"bench-{size}@example.com"], f"bench-{size}@example.com", size)
+            for size in sizes
+        }
+        peer_users = [
+            SeededUser(ids[f"peer-{index}@example.com"], f"peer-{index}@example.com", PEER_EVENTS)
+            for index in range(peers)
+        ]
+        for user in list(users.values()) + peer_users:
+            await _insert_events(db, user.id, user.events)
+
+        series_ids = {}
+        for user in list(users.values()) + peer_users:
+            series_ids[user.id] = await db.scalar(
+                insert(Event)
+                .values(
+                    title="Weekly sync",
+                    start_time=SERIES_START,
+                    end_time=SERIES_START + EVENT_LENGTH,
+                    owner_id=user.id,
+                    recurrence_rule="FREQ=WEEKLY;COUNT=520",
+                    recurrence_end=SERIES_START + timedelta(weeks=519) + EVENT_LENGTH,
+                )
+                .returning(Event.id)
+            )
+
+        # Each big calendar is shared out to the peers, and every peer shares
+        # its events back, so "shared with me" has volume on both sides
+        read_id = interned_permissions["read"].id
+        grants = []
+        for user in users.values():
+            result = await db.execute(
+                select(Event.id)
+                .where(Event.owner_id == user.id, Event.recurrence_rule.is_(None))
+                .order_by(Event.id)
+                .limit(shares)
+            )
+            for position, event_id in enumerate(result.scalars().all()):
+                if peer_users:
+                    peer = peer_users[position % len(peer_users)]
+                    grants.append({"user_id": peer.id, "permission_id": read_id, "event_id": event_id})
+        for peer in peer_users:
+            result = await db.execute(select(Event.id).where(Event.owner_id == peer.id))
+            for event_id in result.scalars().all():
+                for user in users.values():
+                    grants.append({"user_id": user.id, "permission_id": read_id, "event_id": event_id})
+        for chunk_start in range(0, len(grants), INSERT_CHUNK):
+            await db.execute(insert(UserPermission), grants[chunk_start:chunk_start + INSERT_CHUNK])
+        await db.commit()
+
+    return SeedResult(users, peer_users, series_ids, time.perf_counter() - started)
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",") if size]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=parse_sizes, default=[10, 1000, 100000])
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--shares", type=int, default=1000)
+    args = parser.parse_args()
+
+    async def run():
+        result = await seed(args.sizes, args.peers, args.shares)
+        await engine.dispose()
+        return result
+
+    result = asyncio.run(run())
+    print({
+        "users": {size: user.id for size, user in result.users.items()},
+        "peers": len(result.peers),
+        "seconds": round(result.seconds, 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
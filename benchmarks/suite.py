@@ -0,0 +1,47 @@
+"""Seed, run the load and micro benchmarks, and write one JSON result file.
+
+    python -m benchmarks.suite --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.compare results/base.json results/head.json
+
+The file records the commit, options and database backend next to the
+numbers so two runs can be compared with benchmarks.compare.
+"""
+import argparse
+import asyncio
+
+from benchmarks.harness import run_metadata, write_results
+from benchmarks.load import add_arguments, run_load
+from benchmarks.micro import run_micro
+from benchmarks.seed import seed
+
+from app.database import engine  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args()
+
+    async def run():
+        seeded = await seed(args.sizes, args.peers, args.shares)
+        micro = await run_micro(seeded, args.repeat)
+        load = await run_load(
+            seeded, args.requests, args.heavy_requests, args.concurrency, args.only
+        )
+        await engine.dispose()
+        return seeded, load, micro
+
+    seeded, load, micro = asyncio.run(run())
+    options = {key: value for key, value in vars(args).items() if key != "output"}
+    write_results(args.output, {
+        **run_metadata(**options),
+        "seed_seconds": round(seeded.seconds, 2),
+        "load": load,
+        "micro": micro,
+    })
+
+
+if __name__ == "__main__":
+    main()
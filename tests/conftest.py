@@ -0,0 +1,80 @@
+import os
+import re
+import tempfile
+import uuid
+
+import pytest
+
+# Settings are read at import time, so the environment goes first. One
+# in-process app and database serve the whole session; every test registers
+# its own users, which keeps the id-keyed caches from leaking between tests.
+_db_dir = tempfile.mkdtemp(prefix="event-manager-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+for _name in ("RATE_LIMIT_USER_PER_SECOND", "RATE_LIMIT_IP_PER_SECOND", "ADMISSION_MAX_CONCURRENCY"):
+    os.environ[_name] = "0"
+os.environ["ROUTE_CONCURRENCY_LIMITS"] = "{}"
+
+import httpx
+
+from app.main import app, on_shutdown, on_startup
+
+PASSWORD = "password123"
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client(anyio_backend):
+    await on_startup()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    await on_shutdown()
+
+
+@pytest.fixture
+def make_user(client):
+    """Registers a fresh user and returns (user id, auth headers)."""
+
+    async def make_user():
+        email = f"{uuid.uuid4().hex}@example.com"
+        response = await client.post(
+            "/auth/auth/register", json={"email": email, "password": PASSWORD}
+        )
+        assert response.status_code == 201, response.text
+        user_id = response.json()["id"]
+        response = await client.post(
+            "/auth/auth/token", data={"username": email, "password": PASSWORD}
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        # Warm the principal cache so later requests count only their own SQL
+        await client.get("/auth/auth/me", headers=headers)
+        return user_id, headers
+
+    return make_user
+
+
+def statement_count(response: httpx.Response) -> int:
+    """SQL statements the request ran, from its Server-Timing header."""
+    return int(re.search(r'desc="(\d+) SQL"', response.headers["Server-Timing"]).group(1))
+
+
+async def create_event(client, headers, start, end, title="Event"):
+    response = await client.post(
+        "/events/",
+        json={"title": title, "start_time": start, "end_time": end},
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def feed_params(client, headers):
+    """Query params that authenticate a GET of the calendar feed."""
+    response = await client.post("/events/feed/token", headers=headers)
+    assert response.status_code == 201, response.text
+    return {"token": response.json()["token"]}
@@ -0,0 +1,97 @@
+import asyncio
+import gc
+
+import pytest
+
+import app.api.events as events_api
+import app.main as main
+import app.services.auth as auth_service
+from app.utils.ratelimit import ConcurrencyGate, TokenBucketLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+class StreamedResponse:
+    def __init__(self, chunks):
+        async def body():
+            for chunk in chunks:
+                yield chunk
+
+        self.body_iterator = body()
+
+
+async def test_gate_is_held_until_the_body_is_sent():
+    gate = ConcurrencyGate(1, 0)
+    assert await gate.acquire(0)
+    response = StreamedResponse([b"a", b"b"])
+    main._release_with_body(response, [gate])
+
+    assert await anext(response.body_iterator) == b"a"
+    assert not await gate.acquire(0)
+    assert [chunk async for chunk in response.body_iterator] == [b"b"]
+    assert await gate.acquire(0)
+
+
+async def test_gate_is_released_when_an_unsent_body_is_dropped():
+    gate = ConcurrencyGate(1, 0)
+    assert await gate.acquire(0)
+    response = StreamedResponse([b"a"])
+    main._release_with_body(response, [gate])
+
+    del response
+    gc.collect()
+
+    assert await gate.acquire(0)
+
+
+async def test_export_holds_its_route_gate_while_streaming(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    gate = ConcurrencyGate(1, 0)
+    monkeypatch.setattr(main, "route_gates", {"GET /events/export": gate})
+    monkeypatch.setattr(main, "_limited_routes", None)
+    held = []
+
+    async def export(owner_id):
+        for chunk in (b"first\n", b"last\n"):
+            await asyncio.sleep(0.01)
+            held.append(gate._slots.locked())
+            yield chunk
+
+    monkeypatch.setitem(events_api.EXPORTERS, "ndjson", export)
+
+    response = await client.get("/events/export", headers=headers)
+
+    assert response.content == b"first\nlast\n"
+    assert held == [True, True]
+    assert await gate.acquire(0)
+    gate.release()
+
+
+async def test_shed_responses_carry_cors_headers(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    monkeypatch.setattr(main, "user_limiter", TokenBucketLimiter(0.001, 1, 100))
+    headers = {**headers, "Origin": "https://calendar.example.com"}
+
+    assert (await client.get("/events/", headers=headers)).status_code == 200
+    response = await client.get("/events/", headers=headers)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"]
+    assert response.headers["Access-Control-Allow-Origin"]
+
+
+async def test_validated_tokens_are_not_decoded_again(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    monkeypatch.setattr(main, "user_limiter", TokenBucketLimiter(1000, 1000, 100))
+    decoded = []
+    decode = auth_service.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decoded.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth_service.jwt, "decode", counting_decode)
+
+    # make_user left the principal cached, which also names the rate-limit bucket
+    assert (await client.get("/events/", headers=headers)).status_code == 200
+    assert decoded == []
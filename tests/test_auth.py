@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+import app.api.auth as auth_api
+from app.database import async_session
+from app.models.user import User
+from app.utils.ratelimit import TokenBucketLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_me(client, headers) -> int:
+    response = await client.get("/auth/auth/me", headers=headers)
+    return response.status_code
+
+
+async def test_deactivation_takes_effect_at_commit(client, make_user):
+    user_id, headers = await make_user()
+    async with async_session() as db:
+        user = await db.get(User, user_id)
+        user.is_active = False
+        await db.flush()
+        # Not committed yet: a request in between still sees the old row, and
+        # must not leave it cached past the commit
+        assert await read_me(client, headers) == 200
+        await db.commit()
+    assert await read_me(client, headers) == 401
+
+
+async def test_rolled_back_change_keeps_principal(client, make_user):
+    user_id, headers = await make_user()
+    async with async_session() as db:
+        user = await db.get(User, user_id)
+        user.is_active = False
+        await db.flush()
+        await db.rollback()
+    assert await read_me(client, headers) == 200
+
+
+async def test_bulk_update_invalidates_principal(client, make_user):
+    user_id, headers = await make_user()
+    async with async_session() as db:
+        await db.execute(update(User).where(User.id == user_id).values(is_active=False))
+        await db.commit()
+    assert await read_me(client, headers) == 401
+
+
+async def test_login_storm_is_limited_per_email(client, monkeypatch):
+    assert auth_api.login_limiter is not None
+    monkeypatch.setattr(auth_api, "login_limiter", TokenBucketLimiter(0.001, 3, 100))
+    target = f"{uuid.uuid4().hex}@example.com"
+
+    statuses = [
+        (await client.post("/auth/auth/token", data={"username": email, "password": "guess"})).status_code
+        for email in [target] * 3 + [target.upper()]
+    ]
+    assert statuses == [401, 401, 401, 429]
+    response = await client.post(
+        "/auth/auth/token", data={"username": f"{uuid.uuid4().hex}@example.com", "password": "guess"}
+    )
+    assert response.status_code == 401
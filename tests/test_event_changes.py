@@ -0,0 +1,147 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.database import async_session
+from app.models.permission import UserPermission
+from tests.conftest import create_event
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_changes(client, headers, since=None, **params):
+    if since is not None:
+        params["since"] = since
+    response = await client.get("/events/changes", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def summary(changes):
+    return [(change["kind"], change["id"]) for change in changes["changes"]]
+
+
+async def test_snapshot_then_resume_with_tombstones(client, make_user):
+    _, headers = await make_user()
+    kept = await create_event(client, headers, "2033-01-01T09:00:00", "2033-01-01T10:00:00")
+    edited = await create_event(client, headers, "2033-01-02T09:00:00", "2033-01-02T10:00:00")
+    deleted = await create_event(client, headers, "2033-01-03T09:00:00", "2033-01-03T10:00:00")
+
+    snapshot = await read_changes(client, headers)
+    assert summary(snapshot) == [
+        ("upsert", kept["id"]),
+        ("upsert", edited["id"]),
+        ("upsert", deleted["id"]),
+    ]
+    assert not snapshot["has_more"]
+
+    await client.put(f"/events/{edited['id']}", json={"title": "Edited"}, headers=headers)
+    await client.delete(f"/events/{deleted['id']}", headers=headers)
+    created = await create_event(client, headers, "2033-01-04T09:00:00", "2033-01-04T10:00:00")
+
+    changes = await read_changes(client, headers, snapshot["next_token"])
+    assert summary(changes) == [
+        ("upsert", edited["id"]),
+        ("delete", deleted["id"]),
+        ("upsert", created["id"]),
+    ]
+    assert changes["changes"][0]["event"]["title"] == "Edited"
+    assert changes["changes"][1]["event"] is None
+
+    # Nothing new: the same token comes back with no changes
+    caught_up = await read_changes(client, headers, changes["next_token"])
+    assert caught_up["changes"] == []
+    assert caught_up["next_token"] == changes["next_token"]
+
+
+async def test_resume_across_pages(client, make_user):
+    _, headers = await make_user()
+    ids = [
+        (await create_event(client, headers, f"2033-02-01T{hour:02d}:00:00", f"2033-02-01T{hour:02d}:30:00"))["id"]
+        for hour in range(9, 14)
+    ]
+    await client.delete(f"/events/{ids[1]}", headers=headers)
+
+    seen, token = [], None
+    while True:
+        page = await read_changes(client, headers, token, limit=2)
+        seen += summary(page)
+        token = page["next_token"]
+        if not page["has_more"]:
+            break
+
+    # A first sync may also see deletes of events it never had
+    assert seen == [("upsert", event_id) for event_id in ids if event_id != ids[1]] + [
+        ("delete", ids[1])
+    ]
+
+
+async def test_grantee_sees_shares_and_their_removal(client, make_user):
+    _, owner_headers = await make_user()
+    reader_id, reader_headers = await make_user()
+    revoked = await create_event(client, owner_headers, "2033-03-01T09:00:00", "2033-03-01T10:00:00")
+    deleted = await create_event(client, owner_headers, "2033-03-02T09:00:00", "2033-03-02T10:00:00")
+    await create_event(client, owner_headers, "2033-03-03T09:00:00", "2033-03-03T10:00:00")
+    token = (await read_changes(client, reader_headers))["next_token"]
+
+    for event in (revoked, deleted):
+        response = await client.post(
+            f"/events/{event['id']}/share/{reader_id}/read", headers=owner_headers
+        )
+        assert response.status_code == 201, response.text
+    shared = await read_changes(client, reader_headers, token)
+    assert summary(shared) == [("upsert", revoked["id"]), ("upsert", deleted["id"])]
+    assert shared["changes"][0]["event"]["permissions"] == ["read"]
+
+    await client.delete(f"/events/{revoked['id']}/share/{reader_id}/read", headers=owner_headers)
+    await client.delete(f"/events/{deleted['id']}", headers=owner_headers)
+
+    removed = await read_changes(client, reader_headers, shared["next_token"])
+    assert summary(removed) == [("delete", revoked["id"]), ("delete", deleted["id"])]
+
+
+async def test_invalid_token_returns_400(client, make_user):
+    _, headers = await make_user()
+    response = await client.get("/events/changes", params={"since": "garbage!"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid sync token"}
+
+
+async def test_deleting_an_event_revokes_every_grant(client, make_user):
+    _, owner = await make_user()
+    grantee_id, grantee = await make_user()
+    event = await create_event(client, owner, "2033-04-01T09:00:00", "2033-04-01T10:00:00")
+    for permission in ("read", "write"):
+        response = await client.post(f"/events/{event['id']}/share/{grantee_id}/{permission}", headers=owner)
+        assert response.status_code == 201
+    snapshot = await read_changes(client, grantee)
+    owner_snapshot = await read_changes(client, owner)
+
+    await client.delete(f"/events/{event['id']}", headers=owner)
+
+    # One tombstone each, however many grants the grantee held
+    assert summary(await read_changes(client, grantee, snapshot["next_token"])) == [("delete", event["id"])]
+    assert summary(await read_changes(client, owner, owner_snapshot["next_token"])) == [("delete", event["id"])]
+    async with async_session() as db:
+        remaining = await db.scalar(
+            select(func.count()).select_from(UserPermission).where(UserPermission.event_id == event["id"])
+        )
+    assert remaining == 0
+
+
+async def test_revoking_the_newest_grant_reaches_the_grantee(client, make_user):
+    _, owner = await make_user()
+    grantee_id, grantee = await make_user()
+    event = await create_event(client, owner, "2033-05-01T09:00:00", "2033-05-01T10:00:00")
+    for permission in ("read", "write"):
+        await client.post(f"/events/{event['id']}/share/{grantee_id}/{permission}", headers=owner)
+    token = (await read_changes(client, grantee))["next_token"]
+
+    # The revoked grants hold the highest change versions stored
+    await client.delete(f"/events/{event['id']}/share/{grantee_id}/write", headers=owner)
+    changes = await read_changes(client, grantee, token)
+    assert summary(changes) == [("upsert", event["id"])]
+    assert changes["changes"][0]["event"]["permissions"] == ["read"]
+
+    await client.delete(f"/events/{event['id']}/share/{grantee_id}/read", headers=owner)
+    changes = await read_changes(client, grantee, changes["next_token"])
+    assert summary(changes) == [("delete", event["id"])]
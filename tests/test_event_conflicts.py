@@ -0,0 +1,269 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import async_session
+from app.services.event import find_conflicting_event_ids
+from tests.conftest import create_event, statement_count
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def calendar(client, make_user):
+    """An owner with events at 09:00-10:00, 10:00-11:00 and 13:00-15:00."""
+    user_id, headers = await make_user()
+    ids = [
+        (await create_event(client, headers, start, end))["id"]
+        for start, end in (
+            ("2031-05-01T09:00:00", "2031-05-01T10:00:00"),
+            ("2031-05-01T10:00:00", "2031-05-01T11:00:00"),
+            ("2031-05-01T13:00:00", "2031-05-01T15:00:00"),
+        )
+    ]
+    return user_id, headers, ids
+
+
+async def conflicts(owner_id, start, end, exclude_event_id=None):
+    async with async_session() as db:
+        return await find_conflicting_event_ids(
+            db,
+            owner_id,
+            datetime.fromisoformat(start),
+            datetime.fromisoformat(end),
+            exclude_event_id,
+        )
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        # Touching either end is not an overlap
+        ("2031-05-01T08:00:00", "2031-05-01T09:00:00", []),
+        ("2031-05-01T11:00:00", "2031-05-01T13:00:00", []),
+        # The predecessor reaching into the window
+        ("2031-05-01T14:00:00", "2031-05-01T16:00:00", [2]),
+        ("2031-05-01T09:30:00", "2031-05-01T09:45:00", [0]),
+        # Events starting inside the window, in start order
+        ("2031-05-01T08:00:00", "2031-05-01T10:30:00", [0, 1]),
+        ("2031-05-01T09:59:00", "2031-05-01T13:01:00", [0, 1, 2]),
+        ("2031-05-01T13:00:00", "2031-05-01T15:00:00", [2]),
+    ],
+)
+async def test_overlap_filter(calendar, start, end, expected):
+    user_id, _, ids = calendar
+    assert await conflicts(user_id, start, end) == [ids[i] for i in expected]
+
+
+async def test_overlap_filter_skips_excluded_event(calendar):
+    user_id, _, ids = calendar
+    assert await conflicts(
+        user_id, "2031-05-01T09:30:00", "2031-05-01T10:30:00", exclude_event_id=ids[0]
+    ) == [ids[1]]
+
+
+async def test_overlap_filter_is_scoped_to_owner(calendar, make_user):
+    other_id, _ = await make_user()
+    assert await conflicts(other_id, "2031-05-01T09:00:00", "2031-05-01T15:00:00") == []
+
+
+async def test_conflicting_occurrence_is_reported(client, make_user):
+    user_id, headers = await make_user()
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Standup",
+            "start_time": "2031-06-02T09:00:00",
+            "end_time": "2031-06-02T09:15:00",
+            "recurrence_rule": "FREQ=DAILY;COUNT=5",
+        },
+        headers=headers,
+    )
+    series_id = response.json()["id"]
+
+    assert await conflicts(user_id, "2031-06-04T09:10:00", "2031-06-04T10:00:00") == [series_id]
+    assert await conflicts(user_id, "2031-06-07T09:00:00", "2031-06-07T10:00:00") == []
+
+
+async def test_occurrence_conflict_expands_the_series_once(client, make_user):
+    _, headers = await make_user()
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Standup",
+            "start_time": "2031-07-01T09:00:00",
+            "end_time": "2031-07-01T09:15:00",
+            "recurrence_rule": "FREQ=DAILY;COUNT=5",
+        },
+        headers=headers,
+    )
+    series_id = response.json()["id"]
+
+    response = await client.post(
+        "/events/",
+        json={"title": "Clash", "start_time": "2031-07-03T09:00:00", "end_time": "2031-07-03T10:00:00"},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["conflicting_event_ids"] == [series_id]
+    # Series, their exceptions, then the stored events overlapping
+    assert statement_count(response) == 3
+
+
+async def test_create_conflict_response(client, calendar):
+    _, headers, ids = calendar
+
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Clash",
+            "start_time": "2031-05-01T09:30:00",
+            "end_time": "2031-05-01T10:30:00",
+        },
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {
+        "detail": "Event time conflicts with existing event",
+        "conflicting_event_ids": ids[:2],
+    }
+
+
+async def test_update_conflict_response(client, calendar):
+    _, headers, ids = calendar
+
+    response = await client.put(
+        f"/events/{ids[2]}",
+        json={"start_time": "2031-05-01T10:30:00", "end_time": "2031-05-01T13:30:00"},
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Event time conflicts with existing event"
+    assert response.json()["conflicting_event_ids"] == [ids[1]]
+
+
+async def create_series(client, headers, start, end, rule):
+    return await client.post(
+        "/events/",
+        json={"title": "Series", "start_time": start, "end_time": end, "recurrence_rule": rule},
+        headers=headers,
+    )
+
+
+async def test_cancelled_first_occurrence_frees_its_slot(client, make_user):
+    _, headers = await make_user()
+    response = await create_series(
+        client, headers, "2030-03-01T09:00:00", "2030-03-01T10:00:00", "FREQ=DAILY;COUNT=3"
+    )
+    series_id = response.json()["id"]
+    response = await client.post(
+        f"/events/{series_id}/exceptions",
+        json={"original_start": "2030-03-01T09:00:00", "is_cancelled": True},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+
+    await create_event(client, headers, "2030-03-01T09:00:00", "2030-03-01T10:00:00")
+
+
+async def test_moved_first_occurrence_conflicts_where_it_went(client, make_user):
+    user_id, headers = await make_user()
+    response = await create_series(
+        client, headers, "2030-03-01T09:00:00", "2030-03-01T10:00:00", "FREQ=DAILY;COUNT=3"
+    )
+    series_id = response.json()["id"]
+    await client.post(
+        f"/events/{series_id}/exceptions",
+        json={
+            "original_start": "2030-03-01T09:00:00",
+            "start_time": "2030-03-01T12:00:00",
+            "end_time": "2030-03-01T13:00:00",
+        },
+        headers=headers,
+    )
+
+    assert await conflicts(user_id, "2030-03-01T09:00:00", "2030-03-01T10:00:00") == []
+    assert await conflicts(user_id, "2030-03-01T12:30:00", "2030-03-01T14:00:00") == [series_id]
+    await create_event(client, headers, "2030-03-01T09:00:00", "2030-03-01T10:00:00")
+
+
+async def test_series_conflict_beyond_the_first_year(client, make_user):
+    _, headers = await make_user()
+    # Occurs on 2030-01-01 and again 500 days later, on 2031-05-16
+    response = await create_series(
+        client, headers, "2030-01-01T10:00:00", "2030-01-01T11:00:00", "FREQ=DAILY;INTERVAL=500;COUNT=2"
+    )
+    existing_id = response.json()["id"]
+
+    response = await create_series(
+        client, headers, "2030-01-02T09:30:00", "2030-01-02T10:30:00", "FREQ=DAILY;COUNT=600"
+    )
+
+    assert response.status_code == 400
+    assert response.json()["conflicting_event_ids"] == [existing_id]
+
+
+async def test_unbounded_series_are_compared_over_their_common_period(client, make_user):
+    _, headers = await make_user()
+    # Every third day from Tuesday 2030-01-01: first lands on a Monday on 01-07
+    response = await create_series(
+        client, headers, "2030-01-01T09:00:00", "2030-01-01T10:00:00", "FREQ=DAILY;INTERVAL=3"
+    )
+    existing_id = response.json()["id"]
+
+    response = await create_series(
+        client, headers, "2030-01-07T09:30:00", "2030-01-07T10:00:00", "FREQ=WEEKLY;BYDAY=MO"
+    )
+    assert response.status_code == 400
+    assert response.json()["conflicting_event_ids"] == [existing_id]
+
+    response = await create_series(
+        client, headers, "2030-01-07T10:00:00", "2030-01-07T11:00:00", "FREQ=WEEKLY;BYDAY=MO"
+    )
+    assert response.status_code == 201, response.text
+
+
+async def test_unbounded_series_conflict_with_a_moved_occurrence(client, make_user):
+    _, headers = await make_user()
+    response = await create_series(
+        client, headers, "2030-01-01T09:00:00", "2030-01-01T10:00:00", "FREQ=WEEKLY;BYDAY=TU"
+    )
+    existing_id = response.json()["id"]
+    # Years out, one Tuesday moves to the Monday before
+    await client.post(
+        f"/events/{existing_id}/exceptions",
+        json={
+            "original_start": "2035-06-05T09:00:00",
+            "start_time": "2035-06-04T09:00:00",
+            "end_time": "2035-06-04T10:00:00",
+        },
+        headers=headers,
+    )
+
+    response = await create_series(
+        client, headers, "2030-01-07T09:00:00", "2030-01-07T10:00:00", "FREQ=WEEKLY;BYDAY=MO"
+    )
+
+    assert response.status_code == 400
+    assert response.json()["conflicting_event_ids"] == [existing_id]
+
+
+async def test_unbounded_monthly_pairs_are_refused(client, make_user):
+    _, headers = await make_user()
+    response = await create_series(
+        client, headers, "2030-01-01T09:00:00", "2030-01-01T10:00:00", "FREQ=MONTHLY"
+    )
+    existing_id = response.json()["id"]
+
+    response = await create_series(
+        client, headers, "2030-01-02T09:00:00", "2030-01-02T10:00:00", "FREQ=WEEKLY"
+    )
+    assert response.status_code == 400
+    assert str(existing_id) in response.json()["detail"]
+
+    response = await create_series(
+        client, headers, "2030-01-02T11:00:00", "2030-01-02T12:00:00", "FREQ=WEEKLY;COUNT=52"
+    )
+    assert response.status_code == 201, response.text
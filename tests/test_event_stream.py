@@ -0,0 +1,64 @@
+import gc
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.stream import event_hub, open_event_stream, publish_event_change
+from app.utils.pubsub import Message, PostgresBackend
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unstarted_stream_holds_no_subscription(client):
+    stream = open_event_stream(-1)
+    assert event_hub.subscriber_count(-1) == 0
+
+    del stream
+    gc.collect()
+
+    assert event_hub.subscriber_count(-1) == 0
+
+
+async def test_stream_delivers_changes_until_closed(client):
+    stream = open_event_stream(-2)
+    assert (await anext(stream)).startswith("retry:")
+    assert event_hub.subscriber_count(-2) == 1
+
+    publish_event_change("updated", 7, [-2, -3], owner_id=-3)
+    assert await anext(stream) == 'event: updated\ndata: {"id": 7, "owner_id": -3}\n\n'
+
+    await stream.aclose()
+    assert event_hub.subscriber_count(-2) == 0
+
+
+async def test_streams_per_user_are_capped(client):
+    streams = [open_event_stream(-4) for _ in range(settings.EVENT_STREAM_MAX_PER_USER)]
+    for stream in streams:
+        await anext(stream)
+
+    with pytest.raises(HTTPException) as raised:
+        open_event_stream(-4)
+    assert raised.value.status_code == 429
+
+    for stream in streams:
+        await stream.aclose()
+    assert event_hub.subscriber_count(-4) == 0
+
+
+async def test_notifications_for_many_users_are_split_to_fit():
+    backend = PostgresBackend("postgresql://localhost/unused", "event_changes")
+    delivered = []
+    backend._deliver = delivered.append
+    keys = list(range(100_000, 103_000))
+    backend.publish((keys, Message("updated", '{"id": 1, "owner_id": 100000}')))
+
+    payloads = []
+    while not backend._outbox.empty():
+        payloads.append(backend._outbox.get_nowait())
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= PostgresBackend.MAX_PAYLOAD for payload in payloads)
+    for payload in payloads:
+        backend._on_notify(None, 0, "event_changes", payload)
+    assert [key for chunk, _ in delivered for key in chunk] == keys
+    assert {message for _, message in delivered} == {Message("updated", '{"id": 1, "owner_id": 100000}')}
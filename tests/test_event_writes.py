@@ -0,0 +1,165 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from app.database import async_session, engine
+from app.models.event import EventException
+from app.models.permission import UserPermission
+from app.services.event import delete_orphaned_event_rows
+from tests.conftest import create_event, feed_params, statement_count
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_runs_at_most_two_statements(client, make_user):
+    _, headers = await make_user()
+    event = await create_event(client, headers, "2030-01-01T09:00:00", "2030-01-01T10:00:00")
+
+    response = await client.put(
+        f"/events/{event['id']}",
+        json={
+            "start_time": "2030-01-01T11:00:00",
+            "end_time": "2030-01-01T12:00:00",
+            "version": event["version"],
+        },
+        headers=headers,
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["start_time"] == "2030-01-01T11:00:00"
+    assert response.json()["version"] == event["version"] + 1
+    assert statement_count(response) <= 2
+
+
+async def test_delete_runs_at_most_four_statements(client, make_user):
+    _, headers = await make_user()
+    event = await create_event(client, headers, "2030-01-02T09:00:00", "2030-01-02T10:00:00")
+
+    response = await client.delete(
+        f"/events/{event['id']}", params={"version": event["version"]}, headers=headers
+    )
+
+    assert response.status_code == 204
+    # Tombstones, grants, exceptions and the event row itself
+    assert statement_count(response) <= 4
+    response = await client.get(f"/events/{event['id']}", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_update_with_stale_version_is_rejected(client, make_user):
+    _, headers = await make_user()
+    event = await create_event(client, headers, "2030-01-03T09:00:00", "2030-01-03T10:00:00")
+    response = await client.put(
+        f"/events/{event['id']}",
+        json={"title": "First", "version": event["version"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.put(
+        f"/events/{event['id']}",
+        json={"title": "Second", "version": event["version"]},
+        headers=headers,
+    )
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["current_version"] == event["version"] + 1
+    response = await client.get(f"/events/{event['id']}", headers=headers)
+    assert response.json()["title"] == "First"
+
+
+async def test_delete_with_stale_version_is_rejected(client, make_user):
+    _, headers = await make_user()
+    event = await create_event(client, headers, "2030-01-04T09:00:00", "2030-01-04T10:00:00")
+    await client.put(
+        f"/events/{event['id']}", json={"title": "Renamed"}, headers=headers
+    )
+
+    response = await client.delete(
+        f"/events/{event['id']}", params={"version": event["version"]}, headers=headers
+    )
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["current_version"] == event["version"] + 1
+    response = await client.get(f"/events/{event['id']}", headers=headers)
+    assert response.status_code == 200
+
+
+async def test_deleted_event_leaves_no_grants_or_exceptions(client, make_user):
+    _, owner = await make_user()
+    grantee_id, grantee = await make_user()
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Shared",
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T10:00:00",
+            "recurrence_rule": "FREQ=DAILY;COUNT=3",
+        },
+        headers=owner,
+    )
+    shared = response.json()
+    response = await client.post(f"/events/{shared['id']}/share/{grantee_id}/read", headers=owner)
+    assert response.status_code == 201
+    response = await client.post(
+        f"/events/{shared['id']}/exceptions",
+        json={"original_start": "2030-01-08T09:00:00", "is_cancelled": True},
+        headers=owner,
+    )
+    assert response.status_code == 200
+    changes = await client.get("/events/changes", headers=grantee)
+    await client.delete(f"/events/{shared['id']}", headers=owner)
+
+    # SQLite hands the freed id to the next event
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Private",
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T10:00:00",
+            "recurrence_rule": "FREQ=DAILY;COUNT=3",
+        },
+        headers=owner,
+    )
+    private = response.json()
+    assert private["id"] == shared["id"]
+
+    response = await client.get("/events/", params={"include_shared": True}, headers=grantee)
+    assert response.json() == []
+    response = await client.get("/events/search", params={"q": "Private"}, headers=grantee)
+    assert response.json() == []
+    response = await client.get(
+        "/events/changes", params={"since": changes.json()["next_token"]}, headers=grantee
+    )
+    assert [change["kind"] for change in response.json()["changes"]] == ["delete"]
+    response = await client.get(f"/events/{private['id']}", headers=grantee)
+    assert response.status_code == 404
+    feed = await client.get("/events/feed.ics", params=await feed_params(client, owner))
+    assert "EXDATE" not in feed.text
+
+
+async def test_sqlite_connections_enforce_foreign_keys():
+    async with engine.connect() as conn:
+        assert await conn.scalar(text("PRAGMA foreign_keys")) == 1
+
+
+async def test_orphaned_grants_and_exceptions_are_purged():
+    async with engine.connect() as conn:
+        # As left behind by a database that never enforced the foreign key
+        await conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            await conn.execute(insert(UserPermission).values(
+                user_id=1, permission_id=1, event_id=999999
+            ))
+            await conn.execute(insert(EventException).values(
+                event_id=999999, original_start=datetime(2030, 1, 1, 9)
+            ))
+            await conn.commit()
+        finally:
+            await conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+    async with async_session() as db:
+        await delete_orphaned_event_rows(db)
+        for model in (UserPermission, EventException):
+            assert await db.scalar(select(model.id).where(model.event_id == 999999)) is None
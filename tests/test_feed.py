@@ -0,0 +1,61 @@
+import pytest
+
+from tests.conftest import create_event, feed_params
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_feed_times_are_utc(client, make_user):
+    _, headers = await make_user()
+    await create_event(client, headers, "2036-01-05T09:00:00+02:00", "2036-01-05T10:00:00+02:00")
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Series",
+            "start_time": "2036-01-06T12:00:00",
+            "end_time": "2036-01-06T13:00:00",
+            "recurrence_rule": "FREQ=DAILY;UNTIL=20360110",
+        },
+        headers=headers,
+    )
+    series = response.json()
+    response = await client.post(
+        f"/events/{series['id']}/exceptions",
+        json={"original_start": "2036-01-07T12:00:00", "is_cancelled": True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    feed = (await client.get("/events/feed.ics", params=await feed_params(client, headers))).text
+    assert "DTSTART:20360105T070000Z\r\nDTEND:20360105T080000Z\r\n" in feed
+    assert "RRULE:FREQ=DAILY;UNTIL=20360110T000000Z\r\n" in feed
+    assert "EXDATE:20360107T120000Z\r\n" in feed
+
+
+async def test_feed_takes_only_its_own_token(client, make_user):
+    _, headers = await make_user()
+    params = await feed_params(client, headers)
+    assert (await client.get("/events/feed.ics", params=params)).status_code == 200
+    assert (await client.get("/events/feed.ics", headers=headers)).status_code == 401
+    access_token = headers["Authorization"].split()[1]
+    response = await client.get("/events/feed.ics", params={"token": access_token})
+    assert response.status_code == 401
+
+    # And a feed token opens nothing else
+    feed_headers = {"Authorization": f"Bearer {params['token']}"}
+    assert (await client.get("/events/feed.ics", headers=feed_headers)).status_code == 200
+    assert (await client.get("/events/", headers=feed_headers)).status_code == 401
+
+
+async def test_feed_token_is_revocable(client, make_user):
+    _, headers = await make_user()
+    old = await feed_params(client, headers)
+    assert (await client.get("/events/feed.ics", params=old)).status_code == 200
+
+    new = await feed_params(client, headers)
+    assert (await client.get("/events/feed.ics", params=old)).status_code == 401
+    assert (await client.get("/events/feed.ics", params=new)).status_code == 200
+
+    assert (await client.delete("/events/feed/token", headers=headers)).status_code == 204
+    assert (await client.get("/events/feed.ics", params=new)).status_code == 401
+    assert (await client.delete("/events/feed/token", headers=headers)).status_code == 404
@@ -0,0 +1,99 @@
+import asyncio
+import re
+
+import pytest
+
+from tests.conftest import create_event, feed_params
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_series_with_exceptions(client, headers):
+    response = await client.post(
+        "/events/",
+        json={
+            "title": "Standup",
+            "start_time": "2034-03-06T09:00:00",
+            "end_time": "2034-03-06T09:30:00",
+            "recurrence_rule": "FREQ=DAILY;COUNT=5",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    series = response.json()
+    for exception in (
+        {"original_start": "2034-03-07T09:00:00", "start_time": "2034-03-07T11:00:00", "title": "Moved"},
+        {"original_start": "2034-03-08T09:00:00", "is_cancelled": True},
+    ):
+        response = await client.post(f"/events/{series['id']}/exceptions", json=exception, headers=headers)
+        assert response.status_code == 200, response.text
+    return series
+
+
+async def read_feed(client, headers) -> str:
+    response = await client.get("/events/feed.ics", params=await feed_params(client, headers))
+    assert response.status_code == 200, response.text
+    # UIDs and DTSTAMPs differ between accounts
+    return re.sub(r"(UID|DTSTAMP):[^\r\n]*\r\n", "", response.text)
+
+
+async def run_import(client, headers, body: bytes, filename: str) -> dict:
+    response = await client.post(
+        "/events/import", files={"file": (filename, body)}, headers=headers
+    )
+    assert response.status_code == 202, response.text
+    job_id = response.json()["id"]
+    for _ in range(200):
+        response = await client.get(f"/events/import/{job_id}", headers=headers)
+        job = response.json()
+        if job["status"] not in ("pending", "running"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Import {job_id} never finished")
+
+
+async def test_feed_round_trip_keeps_overrides_and_exdates(client, make_user):
+    _, source = await make_user()
+    await create_series_with_exceptions(client, source)
+    await create_event(client, source, "2034-03-20T09:00:00", "2034-03-20T10:00:00", title="One-off")
+    exported = await client.get("/events/feed.ics", params=await feed_params(client, source))
+
+    _, target = await make_user()
+    job = await run_import(client, target, exported.content, "feed.ics")
+    assert job["status"] == "completed"
+    assert (job["processed"], job["created"], job["conflicts"], job["invalid"]) == (3, 2, 0, 0)
+    assert await read_feed(client, target) == await read_feed(client, source)
+
+
+async def test_reimporting_own_feed_reports_conflicts(client, make_user):
+    _, headers = await make_user()
+    await create_series_with_exceptions(client, headers)
+    exported = await client.get("/events/feed.ics", params=await feed_params(client, headers))
+
+    job = await run_import(client, headers, exported.content, "feed.ics")
+    # The series clashes with itself; its override has nothing to attach to
+    assert (job["processed"], job["created"], job["conflicts"], job["invalid"]) == (2, 0, 1, 1)
+    assert job["errors"] == ["Entry 2: RECURRENCE-ID of a series this import didn't create"]
+
+
+async def test_override_before_its_series(client, make_user):
+    _, headers = await make_user()
+    body = (
+        "BEGIN:VCALENDAR\r\n"
+        "BEGIN:VEVENT\r\nUID:weekly\r\nRECURRENCE-ID:20340403T090000\r\n"
+        "DTSTART:20340403T150000\r\nDTEND:20340403T160000\r\nSUMMARY:Late\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nUID:weekly\r\nRRULE:FREQ=WEEKLY;COUNT=3\r\n"
+        "DTSTART:20340327T090000\r\nDTEND:20340327T100000\r\nSUMMARY:Weekly\r\n"
+        "EXDATE:20340410T090000\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nUID:other\r\nRECURRENCE-ID:20340403T090000\r\n"
+        "DTSTART:20340403T090000\r\nDTEND:20340403T100000\r\nEND:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    ).encode()
+    job = await run_import(client, headers, body, "calendar.ics")
+    assert (job["processed"], job["created"], job["conflicts"], job["invalid"]) == (3, 1, 0, 1)
+    assert "RECURRENCE-ID" in job["errors"][0]
+
+    feed = await read_feed(client, headers)
+    assert "EXDATE:20340410T090000Z" in feed
+    assert "RECURRENCE-ID:20340403T090000Z\r\nDTSTART:20340403T150000Z" in feed
+    assert "SUMMARY:Late" in feed
@@ -0,0 +1,20 @@
+import pytest
+
+from app.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_pool_status_needs_the_operator_token(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    assert (await client.get("/internal/pool")).status_code == 404
+
+    monkeypatch.setattr(settings, "OPERATOR_TOKEN", "operator-secret")
+    assert (await client.get("/internal/pool")).status_code == 401
+    # A user's access token is no operator token
+    assert (await client.get("/internal/pool", headers=headers)).status_code == 401
+    response = await client.get(
+        "/internal/pool", headers={"Authorization": "Bearer operator-secret"}
+    )
+    assert response.status_code == 200
+    assert "checked_out" in response.json()
@@ -0,0 +1,67 @@
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.database import engine
+from app.utils.metrics import RequestStats, current_request_stats
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_failed_statement_is_timed_and_popped():
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    try:
+        async with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM no_such_table"))
+            await conn.execute(text("SELECT 1"))
+            assert conn.sync_connection.info["query_started"] == []
+    finally:
+        current_request_stats.reset(token)
+    assert stats.statements == 4
+
+
+OPERATOR = {"Authorization": "Bearer operator-secret"}
+
+
+@pytest.fixture
+def operator_token(monkeypatch):
+    monkeypatch.setattr(settings, "OPERATOR_TOKEN", "operator-secret")
+
+
+async def principal_cache_metrics(client) -> dict:
+    response = await client.get("/metrics", headers=OPERATOR)
+    assert response.status_code == 200
+    return {
+        name: int(value)
+        for name, value in re.findall(r'^(cache_\w+)\{cache="principal"\} (\d+)$', response.text, re.M)
+    }
+
+
+async def test_principal_cache_stats_are_exported(client, make_user, operator_token):
+    before = await principal_cache_metrics(client)
+    # make_user's first /me misses and fills the cache; this one hits
+    _, headers = await make_user()
+    await client.get("/auth/auth/me", headers=headers)
+    after = await principal_cache_metrics(client)
+
+    assert after["cache_misses_total"] > before["cache_misses_total"]
+    assert after["cache_hits_total"] > before["cache_hits_total"]
+    assert 0 < after["cache_entries"] <= after["cache_max_entries"]
+
+
+async def test_metrics_need_the_operator_token(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    assert (await client.get("/metrics")).status_code == 404
+
+    monkeypatch.setattr(settings, "OPERATOR_TOKEN", "operator-secret")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers=headers)).status_code == 401
+    response = await client.get("/metrics", headers=OPERATOR)
+    assert response.status_code == 200
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
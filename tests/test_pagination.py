@@ -0,0 +1,133 @@
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pagination import (
+    decode_change_token,
+    decode_cursor,
+    decode_rank_cursor,
+    encode_change_token,
+    encode_cursor,
+    encode_rank_cursor,
+)
+from tests.conftest import create_event
+
+
+def test_cursor_round_trip():
+    start_time = datetime(2032, 2, 29, 23, 59, 59, 123456)
+    cursor = encode_cursor(start_time, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (start_time, 42)
+
+
+def test_rank_cursor_round_trip():
+    assert decode_rank_cursor(encode_rank_cursor(0.125, 7)) == (0.125, 7)
+
+
+def test_change_token_round_trip():
+    assert decode_change_token(encode_change_token(2**40, 3)) == (2**40, 3)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["garbage!", _b64(b"not json"), _b64(b"[1, 2, 3]"), _b64(b'["yesterday", 1]'), _b64(b"5")],
+)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("token", ["garbage!", _b64(b'["one", 1]'), _b64(b"[1]")])
+def test_invalid_change_token_is_rejected(token):
+    with pytest.raises(HTTPException) as raised:
+        decode_change_token(token)
+    assert raised.value.status_code == 400
+
+
+async def read_pages(client, headers, limit, **params):
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = await client.get("/events/", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        pages.append([event["id"] for event in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+async def five_events(client, make_user):
+    _, headers = await make_user()
+    # Created out of order; pages follow start time
+    ids = {}
+    for hour in (13, 9, 11, 10, 12):
+        event = await create_event(
+            client, headers, f"2032-03-01T{hour:02d}:00:00", f"2032-03-01T{hour:02d}:30:00"
+        )
+        ids[hour] = event["id"]
+    return headers, [ids[hour] for hour in sorted(ids)]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("limit, sizes", [(1, [1] * 5), (2, [2, 2, 1]), (4, [4, 1]), (5, [5]), (6, [5])])
+async def test_cursor_pages_cover_every_event_once(client, five_events, limit, sizes):
+    headers, ids = five_events
+    pages = await read_pages(client, headers, limit)
+    assert [len(page) for page in pages] == sizes
+    assert [event_id for page in pages for event_id in page] == ids
+
+
+@pytest.mark.anyio
+async def test_cursor_skips_events_written_before_it(client, five_events):
+    headers, ids = five_events
+    response = await client.get("/events/", params={"limit": 2}, headers=headers)
+    cursor = response.headers["X-Next-Cursor"]
+    # An event earlier than the cursor doesn't shift the pages after it
+    await create_event(client, headers, "2032-03-01T08:00:00", "2032-03-01T08:30:00")
+
+    response = await client.get(
+        "/events/", params={"limit": 2, "cursor": cursor}, headers=headers
+    )
+
+    assert [event["id"] for event in response.json()] == ids[2:4]
+
+
+@pytest.mark.anyio
+async def test_shared_pages_merge_owned_and_shared(client, make_user):
+    owner_id, owner_headers = await make_user()
+    reader_id, reader_headers = await make_user()
+    expected = []
+    for hour in range(9, 15):
+        headers = owner_headers if hour % 2 else reader_headers
+        event = await create_event(
+            client, headers, f"2032-04-01T{hour:02d}:00:00", f"2032-04-01T{hour:02d}:30:00"
+        )
+        if hour % 2:
+            response = await client.post(
+                f"/events/{event['id']}/share/{reader_id}/read", headers=owner_headers
+            )
+            assert response.status_code == 201, response.text
+        expected.append(event["id"])
+
+    pages = await read_pages(client, reader_headers, 4, include_shared=True)
+
+    assert [len(page) for page in pages] == [4, 2]
+    assert [event_id for page in pages for event_id in page] == expected
+
+
+@pytest.mark.anyio
+async def test_invalid_cursor_returns_400(client, make_user):
+    _, headers = await make_user()
+    response = await client.get("/events/", params={"cursor": "garbage!"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
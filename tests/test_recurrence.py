@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.recurrence import (
+    common_period,
+    expand,
+    occurrence_starts_between,
+    occurs_between,
+    parse_rule,
+    series_last_start,
+)
+
+HOUR = timedelta(hours=1)
+
+
+def starts(rule: str, dtstart: datetime, window_start: datetime, window_end: datetime, duration=HOUR):
+    parsed = parse_rule(rule)
+    return occurrence_starts_between(
+        parsed, dtstart, duration, window_start, window_end, series_last_start(parsed, dtstart)
+    )
+
+
+def test_parse_rule():
+    rule = parse_rule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=FR,MO;UNTIL=20300301T120000Z")
+    assert rule.freq == "WEEKLY"
+    assert rule.interval == 2
+    assert rule.count is None
+    assert rule.until == datetime(2030, 3, 1, 12)
+    assert rule.by_day == (0, 4)
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        "FREQ=HOURLY",
+        "FREQ=DAILY;COUNT=2;UNTIL=20300101",
+        "FREQ=DAILY;INTERVAL=0",
+        "FREQ=DAILY;COUNT=0",
+        "FREQ=MONTHLY;BYDAY=MO",
+        "FREQ=WEEKLY;BYDAY=XX",
+        "FREQ=DAILY;BYHOUR=9",
+        "FREQ=DAILY;UNTIL=tomorrow",
+    ],
+)
+def test_unsupported_rules_are_rejected(rule):
+    with pytest.raises(HTTPException) as raised:
+        parse_rule(rule)
+    assert raised.value.status_code == 400
+
+
+def test_daily_count_and_interval():
+    dtstart = datetime(2030, 1, 1, 9)
+    assert starts("FREQ=DAILY;INTERVAL=2;COUNT=4", dtstart, dtstart, datetime(2031, 1, 1)) == [
+        datetime(2030, 1, 1, 9),
+        datetime(2030, 1, 3, 9),
+        datetime(2030, 1, 5, 9),
+        datetime(2030, 1, 7, 9),
+    ]
+
+
+def test_until_is_inclusive():
+    dtstart = datetime(2030, 1, 1, 9)
+    assert series_last_start(parse_rule("FREQ=DAILY;UNTIL=20300105T090000"), dtstart) == datetime(2030, 1, 5, 9)
+    assert series_last_start(parse_rule("FREQ=DAILY;UNTIL=20300105T085959"), dtstart) == datetime(2030, 1, 4, 9)
+    assert series_last_start(parse_rule("FREQ=DAILY"), dtstart) is None
+
+
+def test_weekly_byday_with_interval():
+    # Tuesday 2030-01-01; every other week on Tuesday and Friday
+    dtstart = datetime(2030, 1, 1, 9)
+    assert starts("FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,FR;COUNT=5", dtstart, dtstart, datetime(2031, 1, 1)) == [
+        datetime(2030, 1, 1, 9),
+        datetime(2030, 1, 4, 9),
+        datetime(2030, 1, 15, 9),
+        datetime(2030, 1, 18, 9),
+        datetime(2030, 1, 29, 9),
+    ]
+
+
+def test_weekly_byday_skips_days_before_the_start():
+    # Starts on a Tuesday, so that week's Monday isn't an occurrence
+    dtstart = datetime(2030, 1, 1, 9)
+    assert starts("FREQ=WEEKLY;BYDAY=MO,TU;COUNT=3", dtstart, dtstart, datetime(2031, 1, 1)) == [
+        datetime(2030, 1, 1, 9),
+        datetime(2030, 1, 7, 9),
+        datetime(2030, 1, 8, 9),
+    ]
+
+
+def test_monthly_skips_missing_days():
+    dtstart = datetime(2030, 1, 31, 9)
+    assert starts("FREQ=MONTHLY;COUNT=3", dtstart, dtstart, datetime(2031, 1, 1)) == [
+        datetime(2030, 1, 31, 9),
+        datetime(2030, 3, 31, 9),
+        datetime(2030, 5, 31, 9),
+    ]
+
+
+def test_yearly_leap_day():
+    dtstart = datetime(2028, 2, 29, 9)
+    assert starts("FREQ=YEARLY;COUNT=2", dtstart, dtstart, datetime(2040, 1, 1)) == [
+        datetime(2028, 2, 29, 9),
+        datetime(2032, 2, 29, 9),
+    ]
+
+
+def test_expand_only_yields_the_window():
+    rule = parse_rule("FREQ=DAILY")
+    dtstart = datetime(2030, 1, 1, 9)
+    # Far from the start, without walking every day in between
+    assert list(expand(rule, dtstart, 2 * HOUR, datetime(2500, 6, 1, 10), datetime(2500, 6, 2, 10))) == [
+        (datetime(2500, 6, 1, 9), datetime(2500, 6, 1, 11)),
+        (datetime(2500, 6, 2, 9), datetime(2500, 6, 2, 11)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "window_start, window_end, expected",
+    [
+        # An occurrence already running at the window start counts
+        (datetime(2030, 1, 2, 10), datetime(2030, 1, 2, 10, 30), True),
+        # Touching either end doesn't
+        (datetime(2030, 1, 2, 11), datetime(2030, 1, 3, 9), False),
+        (datetime(2030, 1, 2, 7), datetime(2030, 1, 2, 9), False),
+        (datetime(2030, 1, 2, 8), datetime(2030, 1, 2, 9, 1), True),
+        # Before the series starts
+        (datetime(2029, 12, 31, 9), datetime(2029, 12, 31, 11), False),
+        # After COUNT runs out on the 3rd
+        (datetime(2030, 1, 4, 9), datetime(2030, 1, 4, 11), False),
+        (datetime(2030, 1, 3, 10), datetime(2030, 1, 4, 11), True),
+    ],
+)
+def test_occurs_between(window_start, window_end, expected):
+    rule = parse_rule("FREQ=DAILY;COUNT=3")
+    dtstart = datetime(2030, 1, 1, 9)
+    last_start = series_last_start(rule, dtstart)
+    assert occurs_between(rule, dtstart, 2 * HOUR, window_start, window_end, last_start) is expected
+
+
+def test_common_period():
+    assert common_period(parse_rule("FREQ=DAILY;INTERVAL=3"), parse_rule("FREQ=WEEKLY;INTERVAL=2")) == timedelta(days=42)
+    assert common_period(parse_rule("FREQ=WEEKLY;BYDAY=MO,TH"), parse_rule("FREQ=DAILY")) == timedelta(days=7)
+    assert common_period(parse_rule("FREQ=WEEKLY"), parse_rule("FREQ=MONTHLY")) is None
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import async_session
+from app.models.event import Event
+from app.services.event import response_cache
+from app.utils.cache import CachedResponse, LocalResponseStore
+from tests.conftest import feed_params
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_local_versions_are_bounded_and_never_reused():
+    store = LocalResponseStore(maxsize=2, ttl=60)
+    seen = set()
+    for scope in range(5):
+        await store.bump(scope)
+        seen.add(await store.version(scope))
+    assert len(store._versions) == 2
+    assert len(seen) == 5
+
+    old_version = await store.version(4)
+    await store.set((4, old_version, "list"), CachedResponse('"etag"', b"[]", {}))
+    # Scope 4 is evicted; its body under the old version must stay unreachable
+    for scope in range(5, 8):
+        await store.version(scope)
+    new_version = await store.version(4)
+    assert new_version not in seen | {old_version}
+    assert await store.get((4, new_version, "list")) is None
+
+
+async def test_feed_follows_shared_owner_version(client, make_user):
+    user_id, headers = await make_user()
+    params = await feed_params(client, headers)
+    first = await client.get("/events/feed.ics", params=params)
+    assert "SUMMARY" not in first.text
+
+    # A write committed by another worker, which reaches this one only
+    # through the shared version
+    async with async_session() as db:
+        db.add(Event(
+            title="Elsewhere",
+            start_time=datetime(2035, 1, 1, 9),
+            end_time=datetime(2035, 1, 1, 10),
+            owner_id=user_id,
+        ))
+        await db.commit()
+    await response_cache.bump(user_id)
+
+    second = await client.get("/events/feed.ics", params=params)
+    assert "SUMMARY:Elsewhere" in second.text
+    assert second.headers["ETag"] != first.headers["ETag"]